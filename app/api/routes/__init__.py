@@ -3,5 +3,6 @@ from .quests import router as quests_router
 from .checkins import router as checkins_router
 from .profile import router as profile_router
 from .ws import router as connection_router
+from .admin import router as admin_router
 
-__all__ = ["auth_router", "quests_router", "checkins_router", "profile_router", "connection_router"]
+__all__ = ["auth_router", "quests_router", "checkins_router", "profile_router", "connection_router", "admin_router"]
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from app.core.auth_context import require_admin
+from app.core.profiling import get_stored_profile, profile_event_loop
+from app.services.points_reconciliation import reconcile_points, record_report
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile_worker(
+    seconds: float = Query(10, gt=0, le=60),
+    interval_ms: float = Query(5, ge=1, le=100),
+):
+    """Sample this worker's event loop for a while and return folded stacks for a flamegraph"""
+    folded = await profile_event_loop(seconds, interval_ms / 1000)
+    if folded is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A profile is already running"
+        )
+    return folded
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_request_profile(profile_id: str):
+    """Get the folded stacks of a request profiled with the X-Profile header"""
+    folded = get_stored_profile(profile_id)
+    if folded is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return folded
+
+
+@router.post("/reconcile/points")
+async def reconcile_participant_points(dry_run: bool = Query(False)):
+    """Recompute every participant's total_points from their check-ins and correct drift.
+
+    With dry_run the drift is only reported. Runs in this worker; use
+    `python -m app.services.points_reconciliation --processes N` for large installations.
+    """
+    report = await reconcile_points(dry_run=dry_run)
+    record_report(report)
+    return report
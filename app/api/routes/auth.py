@@ -1,11 +1,15 @@
+import uuid
+
 from fastapi import APIRouter, Depends, HTTPException, status
-from supabase_auth.errors import AuthApiError
 
 from app.core.auth_context import CherriesUser, get_user
+from app.core.concurrency import run_sync
 from app.core.logging import logger
+from app.core.rate_limit import rate_limiter
 from app.core.supabase import SupabaseClient, get_supabase_client, get_anon_client
-from app.schemas import UserCreate, UserLogin, Token, UserResponse, RefreshTokenRequest
+from app.schemas import UserCreate, UserLogin, Token, UserResponse, RefreshTokenRequest, AccountDeletionJob
 from app.schemas.user import AvatarData
+from app.services.account_deletion import account_deletion_jobs
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -16,6 +20,7 @@ async def register(
     supabase: SupabaseClient = Depends(get_supabase_client)
 ):
     """Register a new user"""
+    await rate_limiter.check("register", user_data.email.lower())
     try:
         # Default avatar for new users
         default_avatar = {
@@ -24,7 +29,7 @@ async def register(
         }
 
         # Create user via Admin API (auto-confirms, skips confirmation email)
-        admin_response = supabase.auth.admin.create_user({
+        admin_response = await run_sync(supabase.auth.admin.create_user, {
             "email": user_data.email,
             "password": user_data.password,
             "email_confirm": True,
@@ -41,7 +46,7 @@ async def register(
 
         # Sign in to get a session with tokens
         anon = get_anon_client()
-        login_response = anon.auth.sign_in_with_password({
+        login_response = await run_sync(anon.auth.sign_in_with_password, {
             "email": user_data.email,
             "password": user_data.password
         })
@@ -78,8 +83,10 @@ async def login(
     supabase: SupabaseClient = Depends(get_anon_client)
 ):
     """Login user"""
+    # Keyed by account so a looping client cannot hammer one login
+    await rate_limiter.check("login", credentials.email.lower())
     try:
-        auth_response = supabase.auth.sign_in_with_password({
+        auth_response = await run_sync(supabase.auth.sign_in_with_password, {
             "email": credentials.email,
             "password": credentials.password
         })
@@ -112,6 +119,8 @@ async def login(
             user=user
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.warning("Login failed for %s", e)
         raise HTTPException(
@@ -126,9 +135,11 @@ async def refresh_token(
     supabase: SupabaseClient = Depends(get_anon_client)
 ):
     """Refresh access token using refresh token"""
+    from supabase_auth.errors import AuthApiError
+
     logger.debug("Token refresh requested")
     try:
-        auth_response = supabase.auth.refresh_session(request.refresh_token)
+        auth_response = await run_sync(supabase.auth.refresh_session, request.refresh_token)
 
         if not auth_response.user or not auth_response.session:
             raise HTTPException(
@@ -173,29 +184,20 @@ async def refresh_token(
         )
 
 
-@router.delete("/account", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_account(
-    user: CherriesUser = Depends(get_user),
-    supabase: SupabaseClient = Depends(get_supabase_client),
-):
-    """Delete the current user's account and all associated data."""
+@router.delete("/account", response_model=AccountDeletionJob, status_code=status.HTTP_202_ACCEPTED)
+async def delete_account(user: CherriesUser = Depends(get_user)):
+    """Start deleting the current user's account and all associated data.
+
+    Returns the deletion job; poll GET /auth/account/deletions/{job_id} for progress.
+    """
     logger.info("Delete account: user_id=%s", user.id)
     try:
-        # 1. Delete quests created by user (cascades to daily_tasks)
-        supabase.table("quests").delete().eq("creator_id", user.id).execute()
-
-        # 2. Delete quest participations for quests user joined but didn't create
-        supabase.table("quest_participants").delete().eq("user_id", user.id).execute()
-
-        # 3. Delete check-ins
-        supabase.table("check_ins").delete().eq("user_id", user.id).execute()
-
-        # 4. Delete user from Supabase auth
-        supabase.auth.admin.delete_user(user.id)
-
-        logger.info("Account deleted: user_id=%s", user.id)
-        return None
+        job = await account_deletion_jobs.start(user.id)
+        logger.info("Account deletion started: user_id=%s, job_id=%s", user.id, job["id"])
+        return job
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Delete account failed for user_id=%s: %s", user.id, e, exc_info=True)
         raise HTTPException(
@@ -204,6 +206,32 @@ async def delete_account(
         )
 
 
+@router.get("/account/deletions/{job_id}", response_model=AccountDeletionJob)
+async def get_account_deletion(job_id: uuid.UUID, user: CherriesUser = Depends(get_user)):
+    """Progress of the current user's account deletion.
+
+    The token stops working once the auth user is removed, the job's last
+    stage, so a 401 while polling means the deletion has gone through.
+    """
+    try:
+        job = await account_deletion_jobs.get(str(job_id))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Get account deletion failed for job_id=%s: %s", job_id, e)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    # Someone else's job is reported as missing rather than forbidden
+    if job is None or job["user_id"] != user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Deletion job not found"
+        )
+    return job
+
+
 @router.post("/logout")
 async def logout(
     user: CherriesUser = Depends(get_user),
@@ -212,8 +240,10 @@ async def logout(
     """Logout user"""
     logger.info("Logout: user_id=%s", user.id)
     try:
-        supabase.auth.sign_out()
+        await run_sync(supabase.auth.sign_out)
         return {"message": "Successfully logged out"}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Logout failed for user_id=%s: %s", user.id, e)
         raise HTTPException(
@@ -1,88 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from typing import List, Optional
 from datetime import date
 
+import orjson
+
 from app.core.auth_context import CherriesUser, get_user
+from app.core.concurrency import gather, run_sync
+from app.core.idempotency import idempotent
 from app.core.logging import logger
+from app.core.rate_limit import limit_per_user
+from app.core.response_cache import analytics_cache
+from app.core.responses import encode_response, trusted_response
 from app.core.supabase import SupabaseClient, get_supabase_client
-from app.core.connection_manager import manager as connection_manager
-from app.schemas import CheckInCreate, CheckInResponse, CheckInStats
+from app.repositories import Repository, get_repository
+from app.schemas import CheckInAnalytics, CheckInCreate, CheckInResponse, CheckInStats
+from app.services import checkins as checkin_service
+from app.services.checkins import checkin_streaks
+from app.services.quest_snapshots import quest_snapshots, snapshot_reads, snapshot_response
 
 router = APIRouter(prefix="/checkins", tags=["Check-ins"])
 
 
-@router.post("/increment", response_model=CheckInResponse)
+@router.post("/increment", response_model=CheckInResponse, dependencies=[Depends(limit_per_user("checkin"))])
 async def increment_checkin(
     checkin_data: CheckInCreate,
     user: CherriesUser = Depends(get_user),
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    repo: Repository = Depends(get_repository),
+    idempotency_key: Optional[str] = Header(None)
 ):
-    """Increment check-in count. Creates new record if not exists, otherwise increments count."""
-    logger.info("Checkin increment: user_id=%s, quest=%s, task=%s, date=%s",
-                user.id, checkin_data.quest_id, checkin_data.daily_task_id, checkin_data.check_in_date)
-    try:
-        # Verify user is a participant of the quest
-        participant = supabase.table("quest_participants")\
-            .select("*")\
-            .eq("quest_id", checkin_data.quest_id)\
-            .eq("user_id", user.id)\
-            .execute()
-        if not participant.data:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not a participant of this quest"
-            )
-
-        # Get task points
-        task = supabase.table("daily_tasks")\
-            .select("points")\
-            .eq("id", checkin_data.daily_task_id)\
-            .single()\
-            .execute()
-
-        points_to_add = task.data["points"]
+    """Increment check-in count. Creates new record if not exists, otherwise increments count.
 
-        # Check if check-in already exists for this user/task/date
-        existing = supabase.table("check_ins")\
-            .select("*")\
-            .eq("user_id", user.id)\
-            .eq("daily_task_id", checkin_data.daily_task_id)\
-            .eq("check_in_date", checkin_data.check_in_date.isoformat())\
-            .execute()
-
-        if existing.data:
-            # Increment existing check-in count
-            current_count = existing.data[0]["count"]
-            checkin = supabase.table("check_ins")\
-                .update({"count": current_count + 1})\
-                .eq("id", existing.data[0]["id"])\
-                .execute()
-        else:
-            # Create new check-in with count=1
-            checkin = supabase.table("check_ins").insert({
-                "user_id": user.id,
-                "quest_id": checkin_data.quest_id,
-                "daily_task_id": checkin_data.daily_task_id,
-                "check_in_date": checkin_data.check_in_date.isoformat(),
-                "count": 1,
-                "notes": checkin_data.notes
-            }).execute()
-
-        # Update participant's total points
-        current_points = participant.data[0]["total_points"]
-        supabase.table("quest_participants")\
-            .update({"total_points": current_points + points_to_add})\
-            .eq("quest_id", checkin_data.quest_id)\
-            .eq("user_id", user.id)\
-            .execute()
-
-        await connection_manager.broadcast(
-            checkin_data.quest_id,
-            {"type": "scoreboard_update", "quest_id": checkin_data.quest_id},
+    Retries that send the same `Idempotency-Key` get the first response back
+    instead of incrementing again.
+    """
+    try:
+        return await idempotent(
+            idempotency_key, user.id, "checkin.increment", checkin_data,
+            lambda: checkin_service.increment_checkin(repo, user.id, checkin_data),
+            CheckInResponse,
         )
 
-        return checkin.data[0]
-
     except HTTPException:
         raise
     except Exception as e:
@@ -93,85 +50,28 @@ async def increment_checkin(
         )
 
 
-@router.post("/decrement", response_model=Optional[CheckInResponse])
+@router.post(
+    "/decrement",
+    response_model=Optional[CheckInResponse],
+    dependencies=[Depends(limit_per_user("checkin"))],
+)
 async def decrement_checkin(
     checkin_data: CheckInCreate,
     user: CherriesUser = Depends(get_user),
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    repo: Repository = Depends(get_repository),
+    idempotency_key: Optional[str] = Header(None)
 ):
-    """Decrement check-in count. If count becomes 0, deletes the record. Returns null if deleted."""
-    logger.info("Checkin decrement: user_id=%s, quest=%s, task=%s, date=%s",
-                user.id, checkin_data.quest_id, checkin_data.daily_task_id, checkin_data.check_in_date)
-    try:
-        # Verify user is a participant of the quest
-        participant = supabase.table("quest_participants")\
-            .select("*")\
-            .eq("quest_id", checkin_data.quest_id)\
-            .eq("user_id", user.id)\
-            .execute()
-        if not participant.data:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not a participant of this quest"
-            )
+    """Decrement check-in count. If count becomes 0, deletes the record. Returns null if deleted.
 
-        # Get task points
-        task = supabase.table("daily_tasks")\
-            .select("points")\
-            .eq("id", checkin_data.daily_task_id)\
-            .single()\
-            .execute()
-
-        points_to_subtract = task.data["points"]
-
-        # Check if check-in exists for this user/task/date
-        existing = supabase.table("check_ins")\
-            .select("*")\
-            .eq("user_id", user.id)\
-            .eq("daily_task_id", checkin_data.daily_task_id)\
-            .eq("check_in_date", checkin_data.check_in_date.isoformat())\
-            .execute()
-
-        if not existing.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Check-in not found"
-            )
-
-        current_count = existing.data[0]["count"]
-        checkin_id = existing.data[0]["id"]
-
-        if current_count > 1:
-            # Decrement count
-            checkin = supabase.table("check_ins")\
-                .update({"count": current_count - 1})\
-                .eq("id", checkin_id)\
-                .execute()
-            result = checkin.data[0]
-        else:
-            # Delete the record when count would become 0
-            supabase.table("check_ins")\
-                .delete()\
-                .eq("id", checkin_id)\
-                .execute()
-            result = None
-
-        # Subtract points from participant's total
-        current_points = participant.data[0]["total_points"]
-        new_points = max(0, current_points - points_to_subtract)
-        supabase.table("quest_participants")\
-            .update({"total_points": new_points})\
-            .eq("quest_id", checkin_data.quest_id)\
-            .eq("user_id", user.id)\
-            .execute()
-
-        await connection_manager.broadcast(
-            checkin_data.quest_id,
-            {"type": "scoreboard_update", "quest_id": checkin_data.quest_id},
+    Honours `Idempotency-Key` like increment.
+    """
+    try:
+        return await idempotent(
+            idempotency_key, user.id, "checkin.decrement", checkin_data,
+            lambda: checkin_service.decrement_checkin(repo, user.id, checkin_data),
+            CheckInResponse,
         )
 
-        return result
-
     except HTTPException:
         raise
     except Exception as e:
@@ -187,23 +87,33 @@ async def get_quest_checkins(
     quest_id: str,
     date: Optional[date] = None,
     user: CherriesUser = Depends(get_user),
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    repo: Repository = Depends(get_repository),
+    supabase: SupabaseClient = Depends(get_supabase_client),
+    if_none_match: Optional[str] = Header(None)
 ):
     """Get check-ins for a quest. If date is provided, returns check-ins for that month only."""
     try:
         # Verify user is a participant
-        participant = supabase.table("quest_participants")\
-            .select("*")\
-            .eq("quest_id", quest_id)\
-            .eq("user_id", user.id)\
-            .execute()
+        participant, snapshot = await gather(
+            repo.get_participant(quest_id, user.id),
+            quest_snapshots.get(quest_id),
+        )
 
-        if not participant.data:
+        if participant is None:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not a participant of this quest"
             )
 
+        # Finished quest: serve the frozen calendar
+        if snapshot is not None and user.id in snapshot.calendar:
+            checkins = snapshot.calendar[user.id]
+            if date:
+                month = date.isoformat()[:7]
+                checkins = [c for c in checkins if c["check_in_date"].startswith(month)]
+            snapshot_reads.inc("checkins")
+            return snapshot_response(orjson.dumps(checkins), if_none_match)
+
         # Build query
         query = supabase.table("check_ins")\
             .select("*")\
@@ -221,9 +131,87 @@ async def get_quest_checkins(
             query = query.gte("check_in_date", first_day.isoformat())\
                          .lt("check_in_date", last_day.isoformat())
 
-        checkins = query.order("check_in_date", desc=True).execute()
+        checkins = await run_sync(query.order("check_in_date", desc=True).execute)
 
-        return checkins.data
+        return trusted_response(checkins.data, CheckInResponse)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+async def _load_analytics_body(
+    supabase: SupabaseClient,
+    quest_id: str,
+    user_id: str,
+    from_date: Optional[date],
+    to_date: Optional[date],
+) -> bytes:
+    """Aggregate in the database (checkin_analytics), then encode and cache the body."""
+    generation = analytics_cache.begin(quest_id, user_id)
+    try:
+        params = {"p_quest_id": quest_id, "p_user_id": user_id}
+        if from_date:
+            params["p_from"] = from_date.isoformat()
+        if to_date:
+            params["p_to"] = to_date.isoformat()
+        analytics = (await run_sync(supabase.rpc("checkin_analytics", params).execute)).data
+        if analytics is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Quest not found"
+            )
+
+        days = analytics["days"]
+        for task in analytics["tasks"]:
+            task["completion_rate"] = round(task["days_completed"] / days, 4) if days else 0.0
+        weekdays = analytics["weekdays"]
+        analytics["best_day_of_week"] = max(weekdays, key=lambda d: d["check_ins"])["day_of_week"] if weekdays else None
+        analytics["quest_id"] = quest_id
+        analytics["user_id"] = user_id
+
+        body = encode_response(analytics, CheckInAnalytics)
+        analytics_cache.put((quest_id, user_id, from_date, to_date), body, generation)
+        return body
+    finally:
+        analytics_cache.end(quest_id, user_id)
+
+
+@router.get("/analytics/{quest_id}", response_model=CheckInAnalytics)
+async def get_checkin_analytics(
+    quest_id: str,
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    user: CherriesUser = Depends(get_user),
+    repo: Repository = Depends(get_repository),
+    supabase: SupabaseClient = Depends(get_supabase_client)
+):
+    """Per-task completion rates and check-ins per day of week and per week for the current user.
+
+    The range defaults to the quest's start date through the earlier of its end date and today.
+    """
+    if from_date and to_date and from_date > to_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'from' must not be after 'to'"
+        )
+    try:
+        # The aggregate is the expensive part, so it only runs once membership is confirmed
+        participant = await repo.get_participant(quest_id, user.id)
+        if participant is None:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not a participant of this quest"
+            )
+        body = analytics_cache.get((quest_id, user.id, from_date, to_date))
+        if body is None:
+            body = await _load_analytics_body(supabase, quest_id, user.id, from_date, to_date)
+
+        return Response(content=body, media_type="application/json")
 
     except HTTPException:
         raise
@@ -238,60 +226,44 @@ async def get_quest_checkins(
 async def get_checkin_stats(
     quest_id: str,
     user: CherriesUser = Depends(get_user),
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    repo: Repository = Depends(get_repository),
+    supabase: SupabaseClient = Depends(get_supabase_client),
+    if_none_match: Optional[str] = Header(None)
 ):
     """Get check-in statistics for a quest"""
     try:
         # Verify user is a participant
-        participant = supabase.table("quest_participants")\
-            .select("*")\
-            .eq("quest_id", quest_id)\
-            .eq("user_id", user.id)\
-            .execute()
+        participant, snapshot = await gather(
+            repo.get_participant(quest_id, user.id),
+            quest_snapshots.get(quest_id),
+        )
 
-        if not participant.data:
+        if participant is None:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not a participant of this quest"
             )
 
+        # Finished quest: serve the final stats
+        if snapshot is not None and user.id in snapshot.stats:
+            snapshot_reads.inc("stats")
+            return snapshot_response(orjson.dumps(snapshot.stats[user.id]), if_none_match)
+
         # Get all check-ins
-        checkins = supabase.table("check_ins")\
-            .select("*")\
-            .eq("quest_id", quest_id)\
-            .eq("user_id", user.id)\
-            .order("check_in_date", desc=False)\
-            .execute()
+        checkins = await run_sync(supabase.table("check_ins")
+            .select("*")
+            .eq("quest_id", quest_id)
+            .eq("user_id", user.id)
+            .order("check_in_date", desc=False)
+            .execute)
 
         total_check_ins = sum(c.get("count", 1) for c in checkins.data)
-        total_points = participant.data[0]["total_points"]
+        total_points = participant["total_points"]
 
         # Calculate streaks
-        current_streak = 0
-        longest_streak = 0
-        temp_streak = 0
-
-        if checkins.data:
-            from datetime import datetime, timedelta
-            today = date.today()
-            last_date = None
-
-            for checkin in checkins.data:
-                checkin_date = datetime.fromisoformat(checkin["check_in_date"]).date()
-
-                if last_date is None:
-                    temp_streak = 1
-                elif (checkin_date - last_date).days == 1:
-                    temp_streak += 1
-                else:
-                    temp_streak = 1
-
-                longest_streak = max(longest_streak, temp_streak)
-                last_date = checkin_date
-
-            # Check current streak
-            if last_date == today or last_date == today - timedelta(days=1):
-                current_streak = temp_streak
+        current_streak, longest_streak = checkin_streaks(
+            (date.fromisoformat(c["check_in_date"]) for c in checkins.data), date.today()
+        )
 
         return CheckInStats(
             quest_id=quest_id,
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 
 from app.core.auth_context import CherriesUser, get_user
+from app.core.concurrency import run_sync
 from app.core.logging import logger
+from app.core.response_cache import quest_cache
 from app.core.supabase import SupabaseClient, get_supabase_client
 from app.schemas.user import UserResponse, UserUpdate, AvatarData
 
@@ -27,6 +29,8 @@ async def get_profile(user: CherriesUser = Depends(get_user)):
             updated_at=user.updated_at
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -55,10 +59,13 @@ async def update_profile(
             user_metadata["avatar"] = update_data.avatar.model_dump()
 
         # Update user metadata using service client (admin privileges)
-        updated_user = supabase.auth.admin.update_user_by_id(
+        updated_user = await run_sync(
+            supabase.auth.admin.update_user_by_id,
             user.id,
             {"user_metadata": user_metadata}
         )
+        # Quest bodies embed each participant's username and avatar
+        quest_cache.invalidate_user(user.id)
 
         # Extract avatar from updated metadata
         avatar_data = updated_user.user.user_metadata.get("avatar") if updated_user.user.user_metadata else None
@@ -75,6 +82,8 @@ async def update_profile(
             updated_at=updated_user.user.updated_at
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Update profile failed for user_id=%s: %s", user.id, e)
         raise HTTPException(
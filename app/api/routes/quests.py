@@ -1,111 +1,146 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
-from datetime import datetime
+import base64
+import uuid
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from typing import List, Literal, Optional, Tuple, Union
+from datetime import date, datetime
 
 from app.core.auth_context import CherriesUser, get_user
+from app.core.concurrency import gather, run_sync
+from app.core.config import settings
+from app.core.idempotency import idempotent
 from app.core.logging import logger
+from app.core.rate_limit import limit_per_user
+from app.core.response_cache import quest_cache
+from app.core.responses import encode_response, trusted_response
+from app.core.share_codes import share_code_index
+from app.core.singleflight import upstream_reads
 from app.core.supabase import SupabaseClient, get_supabase_client
-from app.core.utils import generate_share_code, get_share_code_expiry, is_share_code_valid
+from app.core.utils import get_share_code_expiry, is_share_code_valid
+from app.repositories import Repository, get_repository
+from app.services.checkins import archive_cutoff
+from app.services.quest_snapshots import quest_snapshots, snapshot_reads, snapshot_response
 from app.schemas import (
     QuestCreate,
     QuestResponse,
+    QuestSummary,
     QuestJoinRequest,
     QuestParticipantResponse,
-    ParticipantUserResponse
 )
 
 router = APIRouter(prefix="/quests", tags=["Quests"])
 
 
-async def get_quest_participants(supabase: SupabaseClient, quest_id: str) -> List[ParticipantUserResponse]:
-    """Fetch participants for a quest with user metadata (username, avatar)"""
-    # Get participants for this quest
-    participants_response = supabase.table("quest_participants")\
-        .select("user_id, joined_at, total_points")\
-        .eq("quest_id", quest_id)\
-        .execute()
-
-    if not participants_response.data:
-        return []
-
-    participants = []
-    for p in participants_response.data:
-        # Get user metadata from auth.users
-        user_response = supabase.rpc(
-            "get_user_metadata",
-            {"p_user_id": p["user_id"]}
-        ).execute()
-
-        username = None
-        avatar = None
-        if user_response.data and len(user_response.data) > 0:
-            user_meta = user_response.data[0]
-            if user_meta.get("raw_user_meta_data"):
-                metadata = user_meta["raw_user_meta_data"]
-                username = metadata.get("username")
-                avatar = metadata.get("avatar")
-
-        participants.append(ParticipantUserResponse(
-            user_id=p["user_id"],
-            username=username,
-            avatar=avatar,
-            joined_at=p["joined_at"],
-            total_points=p.get("total_points", 0)
-        ))
-
-    return participants
+async def get_quest_participants(repo: Repository, quest_id: str) -> List[dict]:
+    """Fetch participants for a quest with user metadata (username, avatar).
+
+    Rows are plain dicts shaped like ParticipantUserResponse so they can be
+    served without re-validation (see trusted_response). Concurrent calls for
+    the same quest share one upstream load, so treat the result as read-only.
+    """
+    return await upstream_reads.do(
+        ("participants", quest_id),
+        lambda: repo.load_quest_participants(quest_id),
+    )
+
+
+async def _load_quest_body(repo: Repository, quest_id: str) -> bytes:
+    """Build, encode and cache the GET /quests/{quest_id} body."""
+    token = quest_cache.begin(quest_id)
+    try:
+        # Quest with daily tasks and its participants are independent reads
+        quest_data, participants = await gather(
+            repo.get_quest(quest_id),
+            get_quest_participants(repo, quest_id),
+        )
+        if quest_data is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Quest not found"
+            )
+        quest_snapshots.note_quest(quest_data)
+        if quest_data.get("archived_at"):
+            snapshot = await quest_snapshots.get(quest_id)
+            if snapshot is not None:
+                return snapshot.quest_body
+
+        quest_data["participants"] = participants
+
+        body = encode_response(quest_data, QuestResponse)
+        quest_cache.put(quest_id, body, [p["user_id"] for p in quest_data["participants"]], token)
+        return body
+    finally:
+        quest_cache.end(quest_id)
+
+
+async def _create_quest(
+    quest_data: QuestCreate,
+    user_id: str,
+    repo: Repository,
+    supabase: SupabaseClient,
+) -> dict:
+    # Generate a share code not already handed out
+    share_code = share_code_index.generate()
+    share_code_expires_at = get_share_code_expiry()
+    # Create quest
+    quest_response = await run_sync(supabase.table("quests").insert({
+        "name": quest_data.name,
+        "description": quest_data.description,
+        "start_date": quest_data.start_date.isoformat(),
+        "end_date": quest_data.end_date.isoformat(),
+        "creator_id": user_id,
+        "share_code": share_code,
+        "share_code_expires_at": share_code_expires_at.isoformat()
+    }).execute)
+
+    quest = quest_response.data[0]
+    share_code_index.put(share_code, quest["id"], share_code_expires_at)
+
+    # Create daily tasks
+    daily_tasks = []
+    if quest_data.daily_tasks:
+        for task in quest_data.daily_tasks:
+            task_response = await run_sync(supabase.table("daily_tasks").insert({
+                "quest_id": quest["id"],
+                "title": task.title,
+                "description": task.description,
+                "points": task.points
+            }).execute)
+            daily_tasks.append(task_response.data[0])
+
+    # Add creator as participant
+    await run_sync(supabase.table("quest_participants").insert({
+        "quest_id": quest["id"],
+        "user_id": user_id
+    }).execute)
+
+    quest["daily_tasks"] = daily_tasks
+
+    # Fetch participants with user info, bypassing single-flight so the
+    # insert above is always visible
+    quest["participants"] = await repo.load_quest_participants(quest["id"])
+
+    return quest
 
 
 @router.post("", response_model=QuestResponse, status_code=status.HTTP_201_CREATED)
 async def create_quest(
     quest_data: QuestCreate,
     user: CherriesUser = Depends(get_user),
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    repo: Repository = Depends(get_repository),
+    supabase: SupabaseClient = Depends(get_supabase_client),
+    idempotency_key: Optional[str] = Header(None)
 ):
-    """Create a new quest"""
+    """Create a new quest. A retry with the same `Idempotency-Key` returns the quest already created."""
     logger.info("Create quest: user_id=%s, name=%s", user.id, quest_data.name)
     try:
-        # Generate unique share code
-        share_code = generate_share_code()
-        share_code_expires_at = get_share_code_expiry()
-        # Create quest
-        quest_response = supabase.table("quests").insert({
-            "name": quest_data.name,
-            "description": quest_data.description,
-            "start_date": quest_data.start_date.isoformat(),
-            "end_date": quest_data.end_date.isoformat(),
-            "creator_id": user.id,
-            "share_code": share_code,
-            "share_code_expires_at": share_code_expires_at.isoformat()
-        }).execute()
-
-        quest = quest_response.data[0]
-
-        # Create daily tasks
-        daily_tasks = []
-        if quest_data.daily_tasks:
-            for task in quest_data.daily_tasks:
-                task_response = supabase.table("daily_tasks").insert({
-                    "quest_id": quest["id"],
-                    "title": task.title,
-                    "description": task.description,
-                    "points": task.points
-                }).execute()
-                daily_tasks.append(task_response.data[0])
-
-        # Add creator as participant
-        supabase.table("quest_participants").insert({
-            "quest_id": quest["id"],
-            "user_id": user.id
-        }).execute()
-
-        quest["daily_tasks"] = daily_tasks
-
-        # Fetch participants with user info
-        quest["participants"] = await get_quest_participants(supabase, quest["id"])
-
-        return quest
+        return await idempotent(
+            idempotency_key, user.id, "quests.create", quest_data,
+            lambda: _create_quest(quest_data, user.id, repo, supabase),
+            QuestResponse, status.HTTP_201_CREATED,
+        )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Create quest failed for user_id=%s: %s", user.id, e, exc_info=True)
         raise HTTPException(
@@ -114,40 +149,100 @@ async def create_quest(
         )
 
 
-@router.get("", response_model=List[QuestResponse])
+def _encode_cursor(last_activity_at: Union[datetime, str], quest_id: str) -> str:
+    """An opaque GET /quests cursor for the page after this quest."""
+    if isinstance(last_activity_at, datetime):
+        last_activity_at = last_activity_at.isoformat()
+    return base64.urlsafe_b64encode(f"{last_activity_at}|{quest_id}".encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        last_activity_at, quest_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split("|")
+        return datetime.fromisoformat(last_activity_at), str(uuid.UUID(quest_id))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+async def _with_participants(repo: Repository, quests: List[dict]) -> List[dict]:
+    """Full quest bodies: finished quests come whole from their snapshots, the rest get their participants."""
+    for quest in quests:
+        quest_snapshots.note_quest(quest)
+
+    # Hydrate every live quest's participants in one batch
+    live = [quest for quest in quests if not quest.get("archived_at")]
+    snapshots, participants = await gather(
+        quest_snapshots.get_many(quest["id"] for quest in quests if quest.get("archived_at")),
+        repo.load_participants([quest["id"] for quest in live]),
+    )
+    for quest in live:
+        quest["participants"] = participants.get(quest["id"], [])
+    result = []
+    for quest in quests:
+        snapshot = snapshots.get(quest["id"])
+        if snapshot is not None:
+            result.append(snapshot.quest)
+        elif quest.get("archived_at"):
+            # Archived, but the snapshot row is gone; serve it live
+            quest["participants"] = await get_quest_participants(repo, quest["id"])
+            result.append(quest)
+        else:
+            result.append(quest)
+    return result
+
+
+@router.get("", response_model=Union[List[QuestResponse], List[QuestSummary]])
 async def get_user_quests(
+    response: Response,
     user: CherriesUser = Depends(get_user),
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    repo: Repository = Depends(get_repository),
+    limit: Optional[int] = Query(None, ge=1, le=settings.QUEST_LIST_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    quest_status: Optional[Literal["active", "finished"]] = Query(None, alias="status"),
+    view: Literal["full", "summary"] = "full",
 ):
-    """Get all quests for the current user"""
-    logger.debug("Get quests: user_id=%s", user.id)
+    """Get the current user's quests, most recently active first.
+
+    Without `limit` or `cursor` every quest is returned, as before paging
+    existed. Otherwise returns one page of up to `limit` quests
+    (QUEST_LIST_PAGE_SIZE when only `cursor` is given); the `X-Next-Cursor`
+    response header holds the `cursor` for the next one (absent on the last
+    page). Pages are ordered by last activity, which a check-in moves, so a
+    quest checked into between page fetches can be skipped or repeated;
+    clients that need an exact listing should dedupe by id or fetch
+    unpaged. `status=active|finished` filters on end_date. `view=summary`
+    returns QuestSummary cards (participant count, the user's points, the top
+    three participants) instead of full quests.
+    """
+    logger.debug("Get quests: user_id=%s, view=%s, status=%s, limit=%s", user.id, view, quest_status, limit)
     try:
-        # Get quest IDs for user
-        participants = supabase.table("quest_participants")\
-            .select("quest_id")\
-            .eq("user_id", user.id)\
-            .execute()
-
-        quest_ids = [p["quest_id"] for p in participants.data]
-
-        if not quest_ids:
-            return []
-
-        # Get quests with daily tasks
-        quests = supabase.table("quests")\
-            .select("*, daily_tasks(*)")\
-            .in_("id", quest_ids)\
-            .execute()
-
-        # Add participants to each quest
-        result = []
-        for quest in quests.data:
-            quest["participants"] = await get_quest_participants(supabase, quest["id"])
-            result.append(quest)
+        after = _decode_cursor(cursor) if cursor else None
+        if limit is None and after is not None:
+            limit = settings.QUEST_LIST_PAGE_SIZE
+        if view == "summary":
+            page = await repo.list_quest_summaries(user.id, quest_status, after, limit)
+        else:
+            page = await repo.list_user_quests(user.id, quest_status, after, limit)
+
+        # A full page may be followed by more; the next one starts after its last quest
+        if limit is not None and len(page) == limit:
+            response.headers["X-Next-Cursor"] = _encode_cursor(page[-1]["last_activity_at"], page[-1]["id"])
+
+        if view == "summary":
+            result = page
+        else:
+            for quest in page:
+                quest.pop("last_activity_at", None)
+            result = await _with_participants(repo, page)
 
         logger.debug("Returning %d quests for user_id=%s", len(result), user.id)
-        return result
+        return trusted_response(result, QuestSummary if view == "summary" else QuestResponse, response.headers)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Get quests failed for user_id=%s: %s", user.id, e)
         raise HTTPException(
@@ -160,34 +255,41 @@ async def get_user_quests(
 async def get_quest(
     quest_id: str,
     user: CherriesUser = Depends(get_user),
-    supabase: SupabaseClient = Depends(get_supabase_client)
+    repo: Repository = Depends(get_repository),
+    if_none_match: Optional[str] = Header(None)
 ):
-    """Get a specific quest"""
+    """Get a specific quest. Finished quests are served from their snapshot with long-lived cache headers."""
     try:
-        # Verify user is a participant
-        participant = supabase.table("quest_participants")\
-            .select("*")\
-            .eq("quest_id", quest_id)\
-            .eq("user_id", user.id)\
-            .execute()
+        # The body is the same for every participant, so serve it pre-encoded and
+        # let concurrent misses share a single load. A load costs several upstream
+        # calls, so on a miss it only starts once membership is confirmed. A cached
+        # live body may predate archiving, so the snapshot is looked up alongside
+        # the membership check (remembered per quest, so this rarely costs a query).
+        snapshot = quest_snapshots.cached(quest_id)
+        body = quest_cache.get(quest_id) if snapshot is None else None
+        if body is not None:
+            participant, snapshot = await gather(
+                repo.get_participant(quest_id, user.id),
+                quest_snapshots.get(quest_id),
+            )
+        else:
+            participant = await repo.get_participant(quest_id, user.id)
 
-        if not participant.data:
+        # Verify user is a participant
+        if participant is None:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not a participant of this quest"
             )
+        if snapshot is None and body is None:
+            body = await upstream_reads.do(("quest", quest_id), lambda: _load_quest_body(repo, quest_id))
 
-        # Get quest with daily tasks
-        quest = supabase.table("quests")\
-            .select("*, daily_tasks(*)")\
-            .eq("id", quest_id)\
-            .single()\
-            .execute()
-
-        quest_data = quest.data
-        quest_data["participants"] = await get_quest_participants(supabase, quest_id)
-
-        return quest_data
+        # Also set when the load above found the quest archived
+        snapshot = quest_snapshots.cached(quest_id)
+        if snapshot is not None:
+            snapshot_reads.inc("quest")
+            return snapshot_response(snapshot.quest_body, if_none_match)
+        return Response(content=body, media_type="application/json")
 
     except HTTPException:
         raise
@@ -198,21 +300,25 @@ async def get_quest(
         )
 
 
-@router.post("/join", response_model=QuestResponse)
+@router.post("/join", response_model=QuestResponse, dependencies=[Depends(limit_per_user("join"))])
 async def join_quest(
     join_data: QuestJoinRequest,
     user: CherriesUser = Depends(get_user),
+    repo: Repository = Depends(get_repository),
     supabase: SupabaseClient = Depends(get_supabase_client)
 ):
     """Join a quest using share code"""
     logger.info("Join quest: user_id=%s, share_code=%s", user.id, join_data.share_code)
     try:
+        # Unknown and expired codes are rejected from memory without a query
+        await share_code_index.check(join_data.share_code)
+
         # Find quest by share code with daily tasks
-        quest = supabase.table("quests")\
-            .select("*, daily_tasks(*)")\
-            .eq("share_code", join_data.share_code)\
-            .single()\
-            .execute()
+        quest = await run_sync(supabase.table("quests")
+            .select("*, daily_tasks(*)")
+            .eq("share_code", join_data.share_code)
+            .single()
+            .execute)
 
         if not quest.data:
             raise HTTPException(
@@ -228,12 +334,19 @@ async def join_quest(
                 detail="Share code has expired"
             )
 
+        # An archived quest (or one due to be) is frozen in its snapshot, which would never show the joiner
+        if quest.data.get("archived_at") or date.fromisoformat(quest.data["end_date"]) < archive_cutoff():
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Quest has ended"
+            )
+
         # Check if user is already a participant
-        existing = supabase.table("quest_participants")\
-            .select("*")\
-            .eq("quest_id", quest.data["id"])\
-            .eq("user_id", user.id)\
-            .execute()
+        existing = await run_sync(supabase.table("quest_participants")
+            .select("*")
+            .eq("quest_id", quest.data["id"])
+            .eq("user_id", user.id)
+            .execute)
 
         if existing.data:
             raise HTTPException(
@@ -242,14 +355,15 @@ async def join_quest(
             )
 
         # Add user as participant
-        supabase.table("quest_participants").insert({
+        await run_sync(supabase.table("quest_participants").insert({
             "quest_id": quest.data["id"],
             "user_id": user.id
-        }).execute()
+        }).execute)
+        quest_cache.invalidate(quest.data["id"])
 
-        # Return full quest with participants
+        # Return full quest with participants, loaded fresh so the joiner is included
         quest_data = quest.data
-        quest_data["participants"] = await get_quest_participants(supabase, quest_data["id"])
+        quest_data["participants"] = await repo.load_quest_participants(quest_data["id"])
 
         logger.info("User %s joined quest %s", user.id, quest_data["id"])
         return quest_data
@@ -274,12 +388,12 @@ async def leave_quest(
     logger.info("Leave quest: user_id=%s, quest_id=%s", user.id, quest_id)
     try:
         # Verify the user is a participant of this quest
-        participant = supabase.table("quest_participants")\
-            .select("quest_id, user_id")\
-            .eq("quest_id", quest_id)\
-            .eq("user_id", user.id)\
-            .maybe_single()\
-            .execute()
+        participant = await run_sync(supabase.table("quest_participants")
+            .select("quest_id, user_id")
+            .eq("quest_id", quest_id)
+            .eq("user_id", user.id)
+            .maybe_single()
+            .execute)
 
         if not participant.data:
             raise HTTPException(
@@ -287,12 +401,16 @@ async def leave_quest(
                 detail="You are not a participant of this quest"
             )
 
+        # Take the user off the quest's snapshot first, so a failure leaves them in the quest to retry
+        await quest_snapshots.remove_participant([quest_id], user.id)
+
         # Remove the user from quest_participants
-        supabase.table("quest_participants")\
-            .delete()\
-            .eq("quest_id", quest_id)\
-            .eq("user_id", user.id)\
-            .execute()
+        await run_sync(supabase.table("quest_participants")
+            .delete()
+            .eq("quest_id", quest_id)
+            .eq("user_id", user.id)
+            .execute)
+        quest_cache.invalidate(quest_id)
 
         return None
 
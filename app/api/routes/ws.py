@@ -1,49 +1,162 @@
-from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+import json
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+
+from app.core.concurrency import run_sync
 from app.core.logging import logger
 from app.core.supabase import get_supabase_client
 from app.core.connection_manager import manager
+from app.core.metrics import ws_connections_opened, ws_requests
+from app.core.rate_limit import rate_limiter
+from app.core.resilience import UpstreamUnavailable
+from app.repositories import Repository, get_repository
+from app.schemas import CheckInCreate, CheckInResponse
+from app.services import checkins as checkin_service
 
 router = APIRouter(tags=["WebSocket"])
 
+# Client -> server request types and the check-in service call that handles each.
+# A request looks like {"id": "<correlation id>", "type": "checkin.increment",
+# "data": {"daily_task_id": ..., "check_in_date": ..., "notes": ...}} and is
+# answered with {"type": "response", "id": ..., "status": ..., "data"|"detail": ...}.
+_CHECKIN_HANDLERS = {
+    "checkin.increment": checkin_service.increment_checkin,
+    "checkin.decrement": checkin_service.decrement_checkin,
+}
+
+
+async def _handle_request(
+    repo: Repository,
+    quest_id: str,
+    user_id: str,
+    raw: str,
+) -> tuple[str, dict]:
+    """Run a single request frame and build the correlated response.
+
+    Returns the request type (for metrics; "invalid" if unrecognized) with the response.
+    """
+    try:
+        message = json.loads(raw)
+    except ValueError:
+        return "invalid", {"type": "response", "id": None, "status": 400, "detail": "Invalid JSON"}
+    if not isinstance(message, dict):
+        return "invalid", {"type": "response", "id": None, "status": 400, "detail": "Invalid message"}
+
+    request_id = message.get("id")
+    request_type = message.get("type")
+    handler = _CHECKIN_HANDLERS.get(request_type)
+    if handler is None:
+        return "invalid", {"type": "response", "id": request_id, "status": 400, "detail": "Unknown message type"}
+
+    try:
+        # The socket is bound to one quest, so quest_id always comes from the path
+        checkin_data = CheckInCreate(**{**(message.get("data") or {}), "quest_id": quest_id})
+    except (TypeError, ValidationError) as e:
+        detail = e.errors(include_url=False, include_context=False) if isinstance(e, ValidationError) else str(e)
+        return request_type, {"type": "response", "id": request_id, "status": 422, "detail": detail}
+
+    try:
+        # The requester learns about the change from this response, so it is
+        # left out of the scoreboard broadcast.
+        await rate_limiter.check("checkin", user_id)
+        result = await handler(repo, user_id, checkin_data, exclude_user_id=user_id)
+    except HTTPException as e:
+        return request_type, {"type": "response", "id": request_id, "status": e.status_code, "detail": e.detail}
+    except Exception as e:
+        logger.error("WebSocket %s failed: user_id=%s, %s", request_type, user_id, e)
+        return request_type, {"type": "response", "id": request_id, "status": status.HTTP_400_BAD_REQUEST, "detail": str(e)}
+
+    data = CheckInResponse.model_validate(result).model_dump(mode="json") if result is not None else None
+    return request_type, {"type": "response", "id": request_id, "status": 200, "data": data}
+
 
 @router.websocket("/ws/quests/{quest_id}")
 async def quest_websocket(
     websocket: WebSocket,
     quest_id: str,
     token: str = Query(...),
+    since: Optional[int] = Query(None),
 ):
+    """Quest scoreboard socket.
+
+    On connect the client receives either the events it missed after `since`
+    followed by a `resumed` frame, or, when `since` is absent or no longer in
+    the per-quest event buffer, a `snapshot` frame with the scoreboard. Every
+    broadcast carries a `seq`; clients should ignore events with a `seq` they
+    have already seen and reconnect with the highest one.
+    """
     await websocket.accept()
     logger.debug("WebSocket connection attempt: quest_id=%s", quest_id)
 
     # Authenticate via JWT
     supabase = get_supabase_client()
     try:
-        user_response = supabase.auth.get_user(token)
+        user_response = await run_sync(supabase.auth.get_user, token)
         if not user_response or not user_response.user:
             logger.warning("WebSocket auth failed: invalid token, quest_id=%s", quest_id)
             await websocket.close(code=4001, reason="Invalid token")
             return
         user = user_response.user
+    except UpstreamUnavailable:
+        logger.warning("WebSocket auth unavailable: quest_id=%s", quest_id)
+        await websocket.close(code=1013, reason="Try again later")
+        return
     except Exception:
         logger.warning("WebSocket auth error: quest_id=%s", quest_id)
         await websocket.close(code=4001, reason="Invalid token")
         return
 
-    # Verify user is a participant
-    participant = supabase.table("quest_participants")\
-        .select("user_id")\
-        .eq("quest_id", quest_id)\
-        .eq("user_id", user.id)\
-        .execute()
-    if not participant.data:
+    # Taken before the scoreboard query so no broadcast can fall between the two
+    seq_before = manager.current_seq(quest_id)
+
+    # Verify user is a participant; the same rows make up the snapshot
+    participants = await run_sync(supabase.table("quest_participants")
+        .select("user_id, total_points")
+        .eq("quest_id", quest_id)
+        .execute)
+    if not any(p["user_id"] == user.id for p in participants.data):
         await websocket.close(code=4003, reason="Not a participant")
         return
+    snapshot_seq = manager.snapshot_seq(quest_id, seq_before)
+
+    missed = manager.events_since(quest_id, since) if since is not None else None
+    if missed is None:
+        initial_frames = [{
+            "type": "snapshot",
+            "quest_id": quest_id,
+            "seq": snapshot_seq,
+            "scoreboard": participants.data,
+        }]
+        initial_frames.extend(manager.events_since(quest_id, snapshot_seq) or [])
+    else:
+        initial_frames = missed + [{
+            "type": "resumed",
+            "quest_id": quest_id,
+            "seq": manager.current_seq(quest_id),
+        }]
 
-    logger.info("WebSocket connected: user_id=%s, quest_id=%s", user.id, quest_id)
-    manager.connect(quest_id, user.id, websocket)
+    repo = get_repository(supabase)
+    logger.info("WebSocket connected: user_id=%s, quest_id=%s, resumed=%s", user.id, quest_id, missed is not None)
+    ws_connections_opened.inc("resume" if missed is not None else "snapshot")
     try:
+        # Broadcasts only reach the socket once it is registered, after the initial
+        # frames, so they cannot interleave; events sent meanwhile are caught up here
+        frames = initial_frames
+        while frames:
+            for frame in frames:
+                await websocket.send_json(frame)
+            try:
+                frames = manager.connect(quest_id, user.id, websocket, frames[-1]["seq"])
+            except LookupError:
+                await websocket.close(code=1013, reason="Try again later")
+                return
         while True:
-            await websocket.receive_text()
+            raw = await websocket.receive_text()
+            request_type, response = await _handle_request(repo, quest_id, user.id, raw)
+            ws_requests.inc(request_type, str(response["status"]))
+            await websocket.send_json(response)
     except WebSocketDisconnect:
         logger.info("WebSocket disconnected: user_id=%s, quest_id=%s", user.id, quest_id)
-        manager.disconnect(quest_id, user.id)
+        manager.disconnect(quest_id, user.id, websocket)
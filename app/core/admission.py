@@ -0,0 +1,105 @@
+from starlette.routing import Match, Router
+
+from app.core.config import settings
+from app.core.loop_monitor import loop_monitor
+from app.core.metrics import registry
+
+CRITICAL, NORMAL, LOW = "critical", "normal", "low"
+
+# (method, route path without API_PREFIX) -> priority; anything not listed is NORMAL.
+# Check-in writes and operational endpoints are never shed; expensive list reads go first.
+ROUTE_PRIORITIES = {
+    ("POST", "/checkins/increment"): CRITICAL,
+    ("POST", "/checkins/decrement"): CRITICAL,
+    ("GET", "/admin/profile"): CRITICAL,
+    ("GET", "/admin/profiles/{profile_id}"): CRITICAL,
+    ("GET", "/quests"): LOW,
+    ("GET", "/checkins/quest/{quest_id}"): LOW,
+    ("GET", "/checkins/stats/{quest_id}"): LOW,
+    ("GET", "/checkins/analytics/{quest_id}"): LOW,
+    ("GET", "/profile"): LOW,
+}
+_UNPREFIXED_CRITICAL = {"/", "/health", "/metrics"}
+
+requests_shed = registry.counter(
+    "http_requests_shed_total",
+    "Requests rejected with 503 by admission control before reaching a handler",
+    ("method", "route", "priority", "reason"),
+)
+requests_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests currently being served")
+
+
+class AdmissionControlMiddleware:
+    """Sheds low-priority HTTP requests with 503 while the worker is overloaded.
+
+    Load is the number of requests in flight and the event loop lag reported
+    by loop_monitor. LOW routes are rejected once either passes the LOAD_SHED_LOW_*
+    thresholds, NORMAL routes at the higher LOAD_SHED_NORMAL_* ones, and
+    CRITICAL routes (check-in writes, health, metrics, admin) are always
+    admitted. WebSockets are not touched. Shedding happens before routing,
+    so rejected requests never authenticate or reach Supabase.
+    """
+
+    def __init__(self, app, router: Router):
+        self.app = app
+        self.router = router
+        self.in_flight = 0
+
+    def _route(self, scope) -> str:
+        partial = None
+        for route in self.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+            if match == Match.PARTIAL and partial is None:
+                partial = route.path
+        return partial or "unmatched"
+
+    def _priority(self, method: str, route: str) -> str:
+        if route in _UNPREFIXED_CRITICAL:
+            return CRITICAL
+        return ROUTE_PRIORITIES.get((method, route.removeprefix(settings.API_PREFIX)), NORMAL)
+
+    def _overload(self, priority: str) -> str | None:
+        """Why a request of this priority should be shed right now, or None to admit it."""
+        if priority == CRITICAL:
+            return None
+        if priority == LOW:
+            max_in_flight, max_lag_ms = settings.LOAD_SHED_LOW_IN_FLIGHT, settings.LOAD_SHED_LOW_LAG_MS
+        else:
+            max_in_flight, max_lag_ms = settings.LOAD_SHED_NORMAL_IN_FLIGHT, settings.LOAD_SHED_NORMAL_LAG_MS
+        if self.in_flight >= max_in_flight:
+            return "in_flight"
+        if loop_monitor.current_lag() * 1000 >= max_lag_ms:
+            return "loop_lag"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.LOAD_SHED_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route(scope)
+        priority = self._priority(method, route)
+        reason = self._overload(priority)
+        if reason is not None:
+            requests_shed.inc(method, route, priority, reason)
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"retry-after", str(settings.LOAD_SHED_RETRY_AFTER).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Server is overloaded, retry later"}'})
+            return
+
+        self.in_flight += 1
+        requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            requests_in_flight.dec()
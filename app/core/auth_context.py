@@ -1,9 +1,19 @@
+from typing import TYPE_CHECKING, Any, Optional
+
 from fastapi import Header, HTTPException, status
-from supabase_auth.types import User as _SupabaseUser
 
+from app.core.concurrency import run_sync
+from app.core.config import settings
 from app.core.logging import logger
+from app.core.profiling import is_admin_token
 from app.core.supabase import get_supabase_client
 
+if TYPE_CHECKING:
+    from supabase_auth.types import User as _SupabaseUser
+else:
+    # The SDK is imported when the clients are built (app lifespan) so importing the app stays fast
+    _SupabaseUser = Any
+
 # Type alias for Supabase User - import this instead of supabase_auth.types.User
 CherriesUser = _SupabaseUser
 
@@ -22,7 +32,7 @@ async def get_user(authorization: str = Header(...)) -> CherriesUser:
     supabase = get_supabase_client()
 
     try:
-        user_response = supabase.auth.get_user(token)
+        user_response = await run_sync(supabase.auth.get_user, token)
 
         if not user_response or not user_response.user:
             raise HTTPException(
@@ -40,3 +50,16 @@ async def get_user(authorization: str = Header(...)) -> CherriesUser:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Invalid or expired token: {str(e)}"
         )
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    Guard for operational endpoints. They do not exist unless ADMIN_TOKEN is set.
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin token"
+        )
@@ -0,0 +1,48 @@
+import asyncio
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, List, Optional, TypeVar
+
+from fastapi.concurrency import run_in_threadpool
+
+T = TypeVar("T")
+
+_request_slots: ContextVar[Optional[asyncio.Semaphore]] = ContextVar("request_slots", default=None)
+
+
+def limit_request_concurrency(limit: int):
+    """Cap how many blocking upstream calls the current request may run at once."""
+    _request_slots.set(asyncio.Semaphore(limit))
+
+
+async def run_sync(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Run a blocking (sync SDK) call in the threadpool, within the request's cap.
+
+    Only leaf calls take a slot, so helpers that fan out can nest without
+    starving each other. Outside a request (WebSocket frames, startup) the
+    call is not capped.
+    """
+    slots = _request_slots.get()
+    if slots is None:
+        return await run_in_threadpool(fn, *args, **kwargs)
+    async with slots:
+        return await run_in_threadpool(fn, *args, **kwargs)
+
+
+async def gather(*aws: Awaitable[Any], return_exceptions: bool = False) -> List[Any]:
+    """Await independent calls concurrently and return their results in order.
+
+    Like asyncio.gather, except that when one call fails (and exceptions are
+    not being returned) the others are cancelled before the error propagates,
+    so a failed request does not leave work running behind it.
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    if return_exceptions:
+        return await asyncio.gather(*tasks, return_exceptions=True)
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        # Let the cancelled calls unwind before reporting the failure
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
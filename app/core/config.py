@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -10,20 +10,144 @@ class Settings(BaseSettings):
     APP_VERSION: str = "0.1.0"
     DEBUG: bool = True
     API_PREFIX: str = "/api/v1"
+    # Serve hot read endpoints without re-validating database rows against the response model
+    SKIP_RESPONSE_VALIDATION: bool = False
+    # Upper bound for encoded GET /quests/{quest_id} bodies kept in memory (0 disables), and
+    # for how long (writes on other workers or outside the API are only picked up after the TTL)
+    QUEST_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    QUEST_CACHE_TTL_SECONDS: float = 30.0
+    # Encoded GET /checkins/analytics bodies kept per worker, and for how long (writes on
+    # other workers are only picked up after the TTL)
+    ANALYTICS_CACHE_MAX_ENTRIES: int = 10000
+    ANALYTICS_CACHE_TTL_SECONDS: float = 300.0
+
+    # Finished quests are archived into quest_snapshots this many days after end_date
+    # (covering participants in later timezones) by a sweep every interval, and served
+    # from the snapshot with an ETag. Snapshots are rewritten when a participant leaves or
+    # deletes their account, so clients revalidate (no-cache) unless QUEST_SNAPSHOT_MAX_AGE
+    # (seconds) is set; keep it at most QUEST_SNAPSHOT_SYNC_SECONDS
+    QUEST_ARCHIVE_ENABLED: bool = True
+    QUEST_ARCHIVE_GRACE_DAYS: int = 1
+    QUEST_ARCHIVE_INTERVAL_SECONDS: float = 3600.0
+    QUEST_ARCHIVE_BATCH_SIZE: int = 50
+    QUEST_SNAPSHOT_CACHE_SIZE: int = 1000
+    QUEST_SNAPSHOT_MISS_TTL_SECONDS: float = 300.0
+    QUEST_SNAPSHOT_MAX_AGE: int = 0
+    # How often each worker drops in-memory snapshots rewritten elsewhere (a participant
+    # left or deleted their account)
+    QUEST_SNAPSHOT_SYNC_SECONDS: float = 30.0
+    # GET /quests page size for a `cursor` without `limit`, and the largest `limit` accepted
+    # (no `limit` and no `cursor` returns every quest)
+    QUEST_LIST_PAGE_SIZE: int = 20
+    QUEST_LIST_MAX_PAGE_SIZE: int = 100
 
     # Supabase
     SUPABASE_URL: str
     SUPABASE_KEY: str
     SUPABASE_SERVICE_KEY: str
+    # Open the service client's connections at startup instead of on the first request
+    SUPABASE_WARMUP: bool = False
+    # Warn when a single request makes more Supabase calls than this
+    SUPABASE_CALL_BUDGET: int = 15
+    # Blocking Supabase calls one request may run in parallel when it fans out
+    REQUEST_CONCURRENCY_LIMIT: int = 4
+    # Per-operation timeouts (seconds); a timeout fails the request with 503
+    SUPABASE_READ_TIMEOUT: float = 5.0
+    SUPABASE_WRITE_TIMEOUT: float = 10.0
+    SUPABASE_AUTH_TIMEOUT: float = 10.0
+    # Bulkheads: concurrent Supabase calls per kind, and how long a call waits for a slot
+    SUPABASE_READ_CONCURRENCY: int = 20
+    SUPABASE_WRITE_CONCURRENCY: int = 10
+    SUPABASE_AUTH_CONCURRENCY: int = 10
+    SUPABASE_BULKHEAD_WAIT_MS: int = 500
+    # Circuit breaker: consecutive upstream failures that open it, and how long it stays open
+    SUPABASE_BREAKER_FAILURES: int = 5
+    SUPABASE_BREAKER_RESET_SECONDS: float = 30.0
+    # Extra attempts for idempotent reads after a transient failure (full-jitter backoff)
+    SUPABASE_READ_RETRIES: int = 2
+    SUPABASE_RETRY_BASE_MS: int = 50
+
+    # Data backend for the hot paths: "supabase" (PostgREST) or "postgres" (direct, needs asyncpg)
+    DATA_BACKEND: str = "supabase"
+    DATABASE_URL: Optional[str] = None
+    DATABASE_POOL_MIN_SIZE: int = 1
+    DATABASE_POOL_MAX_SIZE: int = 10
+    # Set to 0 behind a transaction-mode pooler (e.g. Supabase's on port 6543)
+    DATABASE_STATEMENT_CACHE_SIZE: int = 100
 
     # Security
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Enables the /admin endpoints (profiling etc.); sent as the X-Admin-Token header
+    ADMIN_TOKEN: Optional[str] = None
 
     # CORS
     ALLOWED_ORIGINS: str = "http://localhost:3000,http://localhost:8000"
 
+    # Event loop monitoring (seconds)
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_LAG_INTERVAL: float = 0.25
+    LOOP_LAG_THRESHOLD: float = 0.1  # stalls longer than this are logged with a stack
+
+    # Load shedding: reject low/normal priority requests with 503 once in-flight
+    # requests or event loop lag reach these limits (check-in writes are never shed)
+    LOAD_SHED_ENABLED: bool = True
+    LOAD_SHED_LOW_IN_FLIGHT: int = 50
+    LOAD_SHED_LOW_LAG_MS: float = 100
+    LOAD_SHED_NORMAL_IN_FLIGHT: int = 100
+    LOAD_SHED_NORMAL_LAG_MS: float = 250
+    LOAD_SHED_RETRY_AFTER: int = 1
+
+    # Per-user rate limits (token buckets): sustained requests per minute and burst size.
+    # "memory" keeps buckets per worker; "redis" shares them (needs the redis package).
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_STORE: str = "memory"
+    RATE_LIMIT_REDIS_URL: Optional[str] = None
+    RATE_LIMIT_EVICT_INTERVAL: float = 60.0
+    RATE_LIMIT_CHECKIN_PER_MINUTE: int = 120
+    RATE_LIMIT_CHECKIN_BURST: int = 30
+    RATE_LIMIT_JOIN_PER_MINUTE: int = 10
+    RATE_LIMIT_JOIN_BURST: int = 5
+    RATE_LIMIT_REGISTER_PER_MINUTE: int = 5
+    RATE_LIMIT_REGISTER_BURST: int = 3
+    RATE_LIMIT_LOGIN_PER_MINUTE: int = 10
+    RATE_LIMIT_LOGIN_BURST: int = 5
+
+    # Responses kept for Idempotency-Key retries of check-ins and quest creation (per worker)
+    IDEMPOTENCY_TTL_SECONDS: float = 600.0
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
+
+    # In-memory share code index for rejecting unknown/expired join codes without a query.
+    # A miss re-syncs from the database at most once per interval (seconds).
+    SHARE_CODE_INDEX_ENABLED: bool = True
+    SHARE_CODE_INDEX_SYNC_INTERVAL: float = 0.5
+    SHARE_CODE_INDEX_RETENTION_HOURS: int = 24
+    # Each sync re-reads quests updated this long before the last one seen, for rows
+    # whose transaction committed after the watermark had already moved past them
+    SHARE_CODE_INDEX_SYNC_OVERLAP_SECONDS: float = 60.0
+
+    # Background account deletion: rows per delete statement (quests cascade, so fewer),
+    # how often each worker looks for jobs to resume, and when a running job counts as abandoned
+    ACCOUNT_DELETION_BATCH_SIZE: int = 500
+    ACCOUNT_DELETION_QUEST_BATCH_SIZE: int = 20
+    ACCOUNT_DELETION_SWEEP_SECONDS: float = 60.0
+    ACCOUNT_DELETION_STALE_SECONDS: float = 120.0
+    ACCOUNT_DELETION_MAX_ATTEMPTS: int = 5
+
+    # Quests per points_drift query in the total_points reconciliation job
+    POINTS_RECONCILE_BATCH_SIZE: int = 200
+
+    # Logging
+    LOG_FORMAT: str = "text"  # "text" or "json"
+    LOG_QUEUE: bool = True  # write log records from a background thread
+    LOG_QUEUE_SIZE: int = 10000  # records beyond this are dropped, not waited on
+    LOG_ACCESS_SAMPLE_RATE: float = 1.0  # fraction of access lines kept; errors and slow requests always are
+    LOG_SLOW_REQUEST_MS: float = 1000
+
+    # WebSocket
+    WS_EVENT_BUFFER_SIZE: int = 64  # recent events kept per quest for `since` resume
+
     model_config = SettingsConfigDict(
         env_file=".env",
         case_sensitive=True
@@ -1,36 +1,161 @@
 from fastapi import WebSocket
-from collections import defaultdict
+from collections import OrderedDict, defaultdict, deque
+from typing import Optional
+import asyncio
 import json
+import time
+
+from app.core.config import settings
+from app.core.metrics import registry, ws_broadcasts, ws_messages_sent
+
+
+class _EventLog:
+    """Sequence counter and ring buffer of recent broadcasts for one quest."""
+
+    def __init__(self, maxlen: int):
+        # Start from a millisecond timestamp so sequences keep increasing across
+        # restarts and a `since` from a previous process never looks resumable.
+        self.seq = self.start = time.time_ns() // 1_000_000
+        self.events: deque[dict] = deque(maxlen=maxlen)
+
+    def append(self, message: dict) -> dict:
+        self.seq += 1
+        event = {**message, "seq": self.seq}
+        self.events.append(event)
+        return event
+
+    def since(self, seq: int) -> Optional[list[dict]]:
+        """Events after `seq`, or None if the buffer no longer covers that range."""
+        if seq > self.seq:
+            return None
+        if seq == self.seq:
+            return []
+        if not self.events or self.events[0]["seq"] > seq + 1:
+            return None
+        return [event for event in self.events if event["seq"] > seq]
 
 
 class ConnectionManager:
     """Manages WebSocket connections per quest."""
 
-    def __init__(self):
+    def __init__(self, buffer_size: int = 64, max_buffered_quests: int = 1024):
         # {quest_id: {user_id: WebSocket}}
         self.active_connections: dict[str, dict[str, WebSocket]] = defaultdict(dict)
+        # {quest_id: _EventLog}, least recently used first
+        self._event_logs: OrderedDict[str, _EventLog] = OrderedDict()
+        self._buffer_size = buffer_size
+        self._max_buffered_quests = max_buffered_quests
+
+    def _event_log(self, quest_id: str) -> _EventLog:
+        log = self._event_logs.get(quest_id)
+        if log is None:
+            log = self._event_logs[quest_id] = _EventLog(self._buffer_size)
+            if len(self._event_logs) > self._max_buffered_quests:
+                self._event_logs.popitem(last=False)
+        else:
+            self._event_logs.move_to_end(quest_id)
+        return log
+
+    def current_seq(self, quest_id: str) -> Optional[int]:
+        """Sequence number of the latest event broadcast for a quest, or None if it has no event log.
+
+        Never creates a log, so callers that have not checked membership cannot
+        evict real quests' buffers.
+        """
+        log = self._event_logs.get(quest_id)
+        return log.seq if log is not None else None
 
-    def connect(self, quest_id: str, user_id: str, websocket: WebSocket):
+    def snapshot_seq(self, quest_id: str, seq_before: Optional[int]) -> int:
+        """The seq for a snapshot read after current_seq returned `seq_before`.
+
+        If the quest had no log then, every event in it now came after the
+        read, so the snapshot starts at the log's first seq. Opens the log, so
+        only call this for a confirmed participant.
+        """
+        log = self._event_log(quest_id)
+        return seq_before if seq_before is not None else log.start
+
+    def events_since(self, quest_id: str, seq: int) -> Optional[list[dict]]:
+        """Buffered events after `seq`, or None if the client has to resync from a snapshot."""
+        log = self._event_logs.get(quest_id)
+        if log is None:
+            return None
+        return log.since(seq)
+
+    def connect(self, quest_id: str, user_id: str, websocket: WebSocket, after_seq: int) -> Optional[list[dict]]:
+        """Register a socket that has been sent everything up to `after_seq`.
+
+        Returns the events broadcast since then, which the caller must send
+        before registering again, or None once the socket is registered. The
+        check and the registration happen without yielding, so no broadcast can
+        fall between them. Raises LookupError if the buffer no longer covers
+        `after_seq`.
+        """
+        missed = self.events_since(quest_id, after_seq)
+        if missed is None:
+            raise LookupError("Event buffer overran while priming the socket")
+        if missed:
+            return missed
         self.active_connections[quest_id][user_id] = websocket
+        return None
 
-    def disconnect(self, quest_id: str, user_id: str):
-        self.active_connections[quest_id].pop(user_id, None)
-        if not self.active_connections[quest_id]:
+    def disconnect(self, quest_id: str, user_id: str, websocket: Optional[WebSocket] = None):
+        """Drop the user's socket; given `websocket`, only while it is still the registered one."""
+        connections = self.active_connections.get(quest_id)
+        if connections is None:
+            return
+        if websocket is not None and connections.get(user_id) is not websocket:
+            # A reconnect already replaced it
+            return
+        connections.pop(user_id, None)
+        if not connections:
             del self.active_connections[quest_id]
 
     async def broadcast(self, quest_id: str, message: dict, exclude_user_id: str | None = None):
+        event = self._event_log(quest_id).append(message)
         connections = self.active_connections.get(quest_id, {})
-        payload = json.dumps(message)
+        payload = json.dumps(event)
         disconnected = []
-        for user_id, ws in connections.items():
+        sent = 0
+        for user_id, ws in list(connections.items()):
             if user_id == exclude_user_id:
                 continue
             try:
                 await ws.send_text(payload)
+                sent += 1
             except Exception:
-                disconnected.append(user_id)
-        for user_id in disconnected:
-            self.disconnect(quest_id, user_id)
+                disconnected.append((user_id, ws))
+        for user_id, ws in disconnected:
+            self.disconnect(quest_id, user_id, ws)
+        ws_broadcasts.inc()
+        ws_messages_sent.inc(amount=sent)
+
+    async def close_user(self, user_id: str, code: int = 1008, reason: str = "Account deleted"):
+        """Close a user's connections on every quest."""
+        connections = []
+        for quest_id in list(self.active_connections):
+            ws = self.active_connections[quest_id].get(user_id)
+            if ws is not None:
+                connections.append(ws)
+                self.disconnect(quest_id, user_id)
+        await asyncio.gather(*(ws.close(code=code, reason=reason) for ws in connections), return_exceptions=True)
+
+    async def close_quest(self, quest_id: str, code: int = 1000, reason: str = "Quest deleted"):
+        """Close every connection to a quest that no longer exists."""
+        connections = list(self.active_connections.pop(quest_id, {}).values())
+        self._event_logs.pop(quest_id, None)
+        await asyncio.gather(*(ws.close(code=code, reason=reason) for ws in connections), return_exceptions=True)
+
+    async def close_all(self, code: int = 1012, reason: str = "Server restarting"):
+        """Close every connection, e.g. on shutdown; 1012 tells clients to reconnect with `since`."""
+        connections = [ws for conns in self.active_connections.values() for ws in conns.values()]
+        self.active_connections.clear()
+        await asyncio.gather(*(ws.close(code=code, reason=reason) for ws in connections), return_exceptions=True)
+
+    def connection_count(self) -> int:
+        return sum(len(connections) for connections in self.active_connections.values())
+
 
+manager = ConnectionManager(buffer_size=settings.WS_EVENT_BUFFER_SIZE)
 
-manager = ConnectionManager()
+registry.gauge("ws_connections", "Open quest WebSocket connections", fn=manager.connection_count)
@@ -0,0 +1,135 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional, Tuple
+
+import orjson
+from fastapi import HTTPException, Response, status
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.responses import encode_response
+
+# Longer keys are rejected rather than stored
+MAX_KEY_LENGTH = 255
+
+idempotent_replays = registry.counter(
+    "idempotent_replays_total",
+    "Requests answered from a stored or in-flight response for the same Idempotency-Key",
+    ("operation",),
+)
+
+
+class IdempotencyCache:
+    """First responses for idempotency keys, kept for `ttl` seconds (at most `max_entries`).
+
+    A key seen again within the TTL gets the stored response; a key whose first
+    request is still running waits for it. Only successful responses are
+    stored, so a request that failed can be retried with the same key.
+    Entries are per worker.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> (expires_at, fingerprint, status_code, body), oldest first
+        self._entries: OrderedDict[Hashable, Tuple[float, bytes, int, bytes]] = OrderedDict()
+        self._inflight: dict[Hashable, Tuple[bytes, asyncio.Future]] = {}
+
+    async def run(
+        self, key: Hashable, fingerprint: bytes, fn: Callable[[], Awaitable[Tuple[int, bytes]]]
+    ) -> Tuple[int, bytes, bool]:
+        """Return (status_code, body, replayed) for `key`, running `fn` only for its first request."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, stored_fingerprint, status_code, body = entry
+            if expires_at > time.monotonic():
+                _check_fingerprint(stored_fingerprint, fingerprint)
+                return status_code, body, True
+            del self._entries[key]
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            stored_fingerprint, future = inflight
+            _check_fingerprint(stored_fingerprint, fingerprint)
+            status_code, body = await asyncio.shield(future)
+            return status_code, body, True
+
+        future = asyncio.ensure_future(fn())
+        self._inflight[key] = (fingerprint, future)
+        future.add_done_callback(lambda f: self._done(key, fingerprint, f))
+        # Shielded so a client that gives up does not cancel a write its retry will wait for
+        status_code, body = await asyncio.shield(future)
+        return status_code, body, False
+
+    def _done(self, key: Hashable, fingerprint: bytes, future: asyncio.Future):
+        self._inflight.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        status_code, body = future.result()
+        now = time.monotonic()
+        self._entries[key] = (now + self.ttl, fingerprint, status_code, body)
+        self._entries.move_to_end(key)
+        while self._entries:
+            oldest_key, (expires_at, *_) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[oldest_key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _check_fingerprint(stored: bytes, fingerprint: bytes):
+    if stored != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used for a different request"
+        )
+
+
+def _fingerprint(payload: BaseModel) -> bytes:
+    return hashlib.sha256(orjson.dumps(payload.model_dump(mode="json"), option=orjson.OPT_SORT_KEYS)).digest()
+
+
+idempotency_cache = IdempotencyCache(settings.IDEMPOTENCY_CACHE_SIZE, settings.IDEMPOTENCY_TTL_SECONDS)
+
+
+async def idempotent(
+    idempotency_key: Optional[str],
+    user_id: str,
+    operation: str,
+    payload: BaseModel,
+    fn: Callable[[], Awaitable[Any]],
+    model: type[BaseModel],
+    status_code: int = status.HTTP_200_OK,
+) -> Any:
+    """Run a write at most once per (user, operation, Idempotency-Key).
+
+    Without a key this is just `await fn()`. With one, the result is encoded
+    with `model` (None encodes as null) and the same bytes are returned for
+    retries, marked with an `Idempotent-Replayed: true` header. Reusing a key
+    with a different payload is a 422.
+    """
+    if idempotency_key is None:
+        return await fn()
+    if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"
+        )
+
+    async def execute() -> Tuple[int, bytes]:
+        result = await fn()
+        return status_code, b"null" if result is None else encode_response(result, model)
+
+    code, body, replayed = await idempotency_cache.run(
+        (user_id, operation, idempotency_key), _fingerprint(payload), execute
+    )
+    headers = None
+    if replayed:
+        idempotent_replays.inc(operation)
+        headers = {"Idempotent-Replayed": "true"}
+    return Response(content=body, status_code=code, media_type="application/json", headers=headers)
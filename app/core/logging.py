@@ -1,25 +1,138 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
+import random
 import sys
+from datetime import datetime, timezone
+from typing import Optional
 
 from app.core.config import settings
+from app.core.metrics import registry
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+dropped_records = registry.counter(
+    "log_records_dropped_total",
+    "Log records dropped because the logging queue was full",
+)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra` fields are included as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS})
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Passes a `rate` fraction of routine records; warnings and errors always pass.
+
+    Access records (with `status` / `duration_ms` extras) for 5xx responses or
+    requests slower than `slow_ms` are always kept too.
+    """
+
+    def __init__(self, rate: float, slow_ms: float):
+        super().__init__()
+        self.rate = rate
+        self.slow_ms = slow_ms
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1 or record.levelno >= logging.WARNING:
+            return True
+        if getattr(record, "status", 0) >= 500 or getattr(record, "duration_ms", 0) >= self.slow_ms:
+            return True
+        return random.random() < self.rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks the caller: records are dropped when the queue is full."""
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records.inc()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge args into the message now (they may be mutated later) but leave
+        # formatting, including tracebacks, to the listener thread's handler.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _build_formatter() -> logging.Formatter:
+    if settings.LOG_FORMAT == "json":
+        return JsonFormatter()
+    return logging.Formatter(
+        "%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
 
 
 def setup_logging() -> logging.Logger:
-    """Configure and return the application logger."""
+    """Configure and return the application logger.
+
+    With LOG_QUEUE enabled, records go through a bounded queue and are written
+    to stdout by a background listener thread, so a slow stdout cannot block
+    the event loop.
+    """
+    global _listener
+
     logger = logging.getLogger("cherries")
     logger.setLevel(logging.DEBUG if settings.DEBUG else logging.INFO)
 
     if not logger.handlers:
         handler = logging.StreamHandler(sys.stdout)
         handler.setLevel(logging.DEBUG if settings.DEBUG else logging.INFO)
-        formatter = logging.Formatter(
-            "%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S",
-        )
-        handler.setFormatter(formatter)
+        handler.setFormatter(_build_formatter())
+        if settings.LOG_QUEUE:
+            _listener = logging.handlers.QueueListener(
+                queue.Queue(maxsize=settings.LOG_QUEUE_SIZE), handler, respect_handler_level=True
+            )
+            _listener.start()
+            atexit.register(shutdown_logging)
+            handler = DroppingQueueHandler(_listener.queue)
         logger.addHandler(handler)
 
+    # Per-request access lines are high-volume; sample them
+    access = logging.getLogger("cherries.access")
+    if not access.filters:
+        access.addFilter(SamplingFilter(settings.LOG_ACCESS_SAMPLE_RATE, settings.LOG_SLOW_REQUEST_MS))
+
     return logger
 
 
+def shutdown_logging():
+    """Flush queued records and stop the listener thread.
+
+    Anything logged afterwards is written directly by the stream handler.
+    """
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    logger = logging.getLogger("cherries")
+    for handler in listener.handlers:
+        logger.addHandler(handler)
+    for handler in [h for h in logger.handlers if isinstance(h, DroppingQueueHandler)]:
+        logger.removeHandler(handler)
+    listener.stop()
+
+
 logger = setup_logging()
+access_logger = logging.getLogger("cherries.access")
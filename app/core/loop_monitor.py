@@ -0,0 +1,116 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from starlette.requests import HTTPConnection
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.metrics import registry
+
+loop_lag = registry.histogram(
+    "event_loop_lag_seconds",
+    "Delay between when the loop-lag probe should have woken up and when it did",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+loop_blocked = registry.counter(
+    "event_loop_blocked_total",
+    "Stalls longer than LOOP_LAG_THRESHOLD caught by the watchdog, by route",
+    ("route",),
+)
+
+# Frames shown in the warning for a blocked loop
+_STACK_LIMIT = 20
+
+
+def _describe_request(frame) -> str:
+    """Find the request being handled by walking up from the blocking frame."""
+    handler = None
+    while frame is not None:
+        request = frame.f_locals.get("request") or frame.f_locals.get("websocket")
+        if isinstance(request, HTTPConnection):
+            route = request.scope.get("route")
+            method = request.scope.get("method", "WS")
+            return f"{method} {route.path if route is not None else request.url.path}"
+        if handler is None and "/app/api/routes/" in frame.f_code.co_filename:
+            handler = frame.f_code.co_name
+        frame = frame.f_back
+    return handler or "unknown"
+
+
+class LoopLagMonitor:
+    """Measures event loop scheduling delay and reports what blocked it.
+
+    A probe task sleeps for `interval` and records how late it wakes up. A
+    watchdog thread notices when the probe has not run for `interval +
+    threshold`, which means the loop is stuck in a blocking call, and logs the
+    loop thread's stack and the request it is serving.
+    """
+
+    def __init__(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self._heartbeat = time.monotonic()
+        # Most recent probe delay (seconds)
+        self.lag = 0.0
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._probe())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            self._watchdog.join()
+
+    async def _probe(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, loop.time() - expected)
+            loop_lag.observe(self.lag)
+            self._heartbeat = time.monotonic()
+
+    def current_lag(self) -> float:
+        """Recent loop lag, including a stall the probe has not finished measuring yet."""
+        if self._task is None:
+            return 0.0
+        return max(self.lag, time.monotonic() - self._heartbeat - self.interval)
+
+    def _watch(self):
+        reported_heartbeat = None
+        while not self._stop.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled < self.threshold or heartbeat == reported_heartbeat:
+                continue
+            # Report each stall once, with the stack as it is right now
+            reported_heartbeat = heartbeat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            route = _describe_request(frame)
+            loop_blocked.inc(route)
+            stack = "".join(traceback.format_stack(frame, limit=_STACK_LIMIT))
+            logger.warning("Event loop blocked for %.0fms+ serving %s:\n%s", stalled * 1000, route, stack)
+
+
+loop_monitor = LoopLagMonitor(settings.LOOP_LAG_INTERVAL, settings.LOOP_LAG_THRESHOLD)
@@ -0,0 +1,134 @@
+import asyncio
+import hmac
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logging import logger
+
+# Sampling interval for header-triggered per-request profiles
+REQUEST_PROFILE_INTERVAL = 0.002
+# Finished per-request profiles kept for GET /admin/profiles/{profile_id}
+MAX_STORED_PROFILES = 20
+
+# Only one sampler runs at a time, whether time-boxed or per-request
+_session_lock = threading.Lock()
+_stored_profiles: OrderedDict[str, str] = OrderedDict()
+
+
+class StackSampler:
+    """Periodically samples one thread's Python stack from a background thread.
+
+    Output is in the folded format ("outer;inner;leaf count" per line) read by
+    flamegraph.pl, speedscope and most other flamegraph tools.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self._stacks.most_common()) + "\n"
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """True if profiling is enabled (ADMIN_TOKEN set) and `token` matches it."""
+    if not settings.ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), settings.ADMIN_TOKEN.encode())
+
+
+async def profile_event_loop(seconds: float, interval: float) -> Optional[str]:
+    """Sample the event loop thread for `seconds`; None if another profile is running."""
+    if not _session_lock.acquire(blocking=False):
+        return None
+    try:
+        sampler = StackSampler(threading.get_ident(), interval)
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.stop()
+        logger.info("Profiled event loop for %.1fs: %d samples", seconds, sampler.samples)
+        return sampler.folded()
+    finally:
+        _session_lock.release()
+
+
+def get_stored_profile(profile_id: str) -> Optional[str]:
+    return _stored_profiles.get(profile_id)
+
+
+class RequestProfilingMiddleware:
+    """Profiles a single request when it carries `X-Profile: 1` and a valid `X-Admin-Token`.
+
+    The profile samples the event loop thread while the request runs (so
+    concurrent requests show up too); its id is returned in `X-Profile-Id`
+    and the folded stacks are served from GET /admin/profiles/{profile_id}.
+    With ADMIN_TOKEN unset this is a pass-through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.ADMIN_TOKEN:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        if headers.get(b"x-profile") != b"1" or not is_admin_token(headers.get(b"x-admin-token", b"").decode()):
+            await self.app(scope, receive, send)
+            return
+        if not _session_lock.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex[:12]
+        sampler = StackSampler(threading.get_ident(), REQUEST_PROFILE_INTERVAL)
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            sampler.stop()
+            _session_lock.release()
+            _stored_profiles[profile_id] = sampler.folded()
+            while len(_stored_profiles) > MAX_STORED_PROFILES:
+                _stored_profiles.popitem(last=False)
+            logger.info("Profiled %s %s as %s: %d samples in %.1fms",
+                        scope["method"], scope["path"], profile_id, sampler.samples,
+                        (time.perf_counter() - start) * 1000)
@@ -0,0 +1,160 @@
+import math
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Tuple
+
+from fastapi import Depends, HTTPException, status
+
+from app.core.auth_context import CherriesUser, get_user
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.metrics import registry
+
+rate_limited = registry.counter(
+    "rate_limited_requests_total",
+    "Requests rejected with 429 by the per-user rate limiter",
+    ("limit",),
+)
+
+
+class RateLimitExceeded(HTTPException):
+    """Too many requests for this user and limit (429)."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, slow down",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+class RateLimitStore(ABC):
+    """Token buckets keyed by string. Implementations decide where the buckets live."""
+
+    @abstractmethod
+    async def hit(self, key: str, rate: float, burst: int) -> float:
+        """Take one token from `key`'s bucket (refilled at `rate`/s, holding up to `burst`).
+
+        Returns 0 if a token was taken, otherwise the seconds until one is available.
+        """
+
+    async def close(self):
+        pass
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """Per-process buckets; limits are per worker. Idle buckets are evicted periodically."""
+
+    def __init__(self, evict_interval: float, clock: Callable[[], float] = time.monotonic):
+        self.evict_interval = evict_interval
+        self._clock = clock
+        # key -> (tokens, updated_at, refill_seconds); refill_seconds is how long an
+        # idle bucket takes to fill up, after which it can be dropped
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+        self._last_eviction = clock()
+
+    async def hit(self, key: str, rate: float, burst: int) -> float:
+        now = self._clock()
+        if now - self._last_eviction >= self.evict_interval:
+            self._evict(now)
+        tokens, updated_at, _ = self._buckets.get(key, (burst, now, 0.0))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now, burst / rate)
+        return retry_after
+
+    def _evict(self, now: float):
+        # A bucket idle long enough to be full again is the same as no bucket
+        idle = [key for key, (_, updated_at, refill) in self._buckets.items() if now - updated_at >= refill]
+        for key in idle:
+            del self._buckets[key]
+        self._last_eviction = now
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+# Token bucket evaluated inside Redis so every worker shares it; uses the Redis clock
+_REDIS_TOKEN_BUCKET = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return tostring(retry_after)
+"""
+
+
+class RedisRateLimitStore(RateLimitStore):
+    """Buckets in Redis, so limits hold across workers (RATE_LIMIT_STORE=redis, needs `redis`)."""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(_REDIS_TOKEN_BUCKET)
+
+    async def hit(self, key: str, rate: float, burst: int) -> float:
+        return float(await self._script(keys=[f"ratelimit:{key}"], args=[rate, burst]))
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+class RateLimiter:
+    """Named per-user limits (RATE_LIMIT_<NAME>_PER_MINUTE / _BURST) over a store."""
+
+    def __init__(self, store: RateLimitStore):
+        self.store = store
+
+    async def check(self, name: str, key: str):
+        """Count one request for `key` against limit `name`; raise RateLimitExceeded if over it."""
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        per_minute = getattr(settings, f"RATE_LIMIT_{name.upper()}_PER_MINUTE")
+        burst = getattr(settings, f"RATE_LIMIT_{name.upper()}_BURST")
+        try:
+            retry_after = await self.store.hit(f"{name}:{key}", per_minute / 60, burst)
+        except Exception as e:
+            # A shared store being down should not take the write paths with it
+            logger.warning("Rate limit store failed, allowing request: %s", e)
+            return
+        if retry_after > 0:
+            rate_limited.inc(name)
+            logger.info("Rate limited: limit=%s, key=%s, retry_after=%.1fs", name, key, retry_after)
+            raise RateLimitExceeded(retry_after)
+
+
+def _create_store() -> RateLimitStore:
+    if settings.RATE_LIMIT_STORE == "redis":
+        if not settings.RATE_LIMIT_REDIS_URL:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL must be set when RATE_LIMIT_STORE=redis")
+        return RedisRateLimitStore(settings.RATE_LIMIT_REDIS_URL)
+    return MemoryRateLimitStore(settings.RATE_LIMIT_EVICT_INTERVAL)
+
+
+rate_limiter = RateLimiter(_create_store())
+
+
+def limit_per_user(name: str):
+    """Route dependency applying limit `name` to the authenticated user."""
+
+    async def dependency(user: CherriesUser = Depends(get_user)):
+        await rate_limiter.check(name, user.id)
+
+    return dependency
@@ -0,0 +1,270 @@
+import asyncio
+import math
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.metrics import registry
+
+T = TypeVar("T")
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# PostgREST errors that mean the database, not the request, is the problem
+_UPSTREAM_ERROR_CODES = {"PGRST000", "PGRST001", "PGRST002", "PGRST003", "57014"}
+
+circuit_state = registry.gauge(
+    "supabase_circuit_state",
+    "Circuit breaker state per Supabase service (0 closed, 1 half-open, 2 open)",
+    ("service",),
+)
+circuit_rejections = registry.counter(
+    "supabase_circuit_rejections_total",
+    "Supabase calls failed fast because the circuit was open",
+    ("service",),
+)
+bulkhead_rejections = registry.counter(
+    "supabase_bulkhead_rejections_total",
+    "Supabase calls rejected because their bulkhead was full",
+    ("kind",),
+)
+bulkhead_in_use = registry.gauge(
+    "supabase_bulkhead_in_use",
+    "Supabase calls currently holding a bulkhead slot",
+    ("kind",),
+)
+read_retries = registry.counter(
+    "supabase_read_retries_total",
+    "Idempotent reads retried after a transient upstream failure",
+)
+
+# Timeout for the Supabase call running in this context, applied by the httpx request hook
+_operation_timeout: ContextVar[Optional[float]] = ContextVar("supabase_operation_timeout", default=None)
+
+
+class UpstreamUnavailable(HTTPException):
+    """Supabase is failing, overloaded or too slow; the client should retry later (503)."""
+
+    def __init__(self, detail: str, retry_after: float = 1, retryable: bool = False):
+        # Only timeouts are worth retrying within the request; fast-fail rejections are not
+        self.retryable = retryable
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """Whether an exception from a Supabase call says Supabase itself is unhealthy.
+
+    Timeouts, connection errors and 5xx-style errors count; 4xx errors (bad
+    input, not found, constraint violations) do not.
+    """
+    import httpx
+    from postgrest.exceptions import APIError
+    from supabase_auth.errors import AuthApiError, AuthRetryableError
+
+    if isinstance(error, (httpx.TransportError, AuthRetryableError)):
+        return True
+    if isinstance(error, AuthApiError):
+        return error.status >= 500
+    if isinstance(error, APIError):
+        # Non-JSON error bodies (gateway errors) come back without a code
+        return error.code is None or error.code in _UPSTREAM_ERROR_CODES
+    return False
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class CircuitBreaker:
+    """Fails calls fast after repeated upstream failures, then probes for recovery.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    are rejected for `reset_seconds`. The first call after that is let through
+    as a probe (half-open): success closes the circuit, failure reopens it.
+    Thread-safe, since Supabase calls run in threadpool workers.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        circuit_state.set(_STATE_VALUES[CLOSED], name)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning("Supabase %s circuit %s -> %s", self.name, self.state, state)
+            self.state = state
+            circuit_state.set(_STATE_VALUES[state], self.name)
+
+    def before_call(self):
+        """Raise UpstreamUnavailable if the call should not be attempted."""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            remaining = self._opened_at + self.reset_seconds - time.monotonic()
+            if self.state == OPEN and remaining <= 0:
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+        circuit_rejections.inc(self.name)
+        raise UpstreamUnavailable(
+            f"Supabase {self.name} is unavailable", retry_after=max(remaining, 1)
+        )
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    def record_ignored(self):
+        """The call was never made, so it says nothing about upstream health."""
+        with self._lock:
+            self._probing = False
+
+
+class Bulkhead:
+    """Caps concurrent Supabase calls of one kind so a slow kind cannot take every thread."""
+
+    def __init__(self, kind: str, limit: int, wait_seconds: float):
+        self.kind = kind
+        self.limit = limit
+        self.wait_seconds = wait_seconds
+        self._slots = threading.BoundedSemaphore(limit)
+
+    def acquire(self):
+        # Handlers make their calls through run_sync, so they wait in a worker thread. A call
+        # made on the event loop anyway must not block it, so it only takes a free slot.
+        if _on_event_loop():
+            acquired = self._slots.acquire(blocking=False)
+        else:
+            acquired = self._slots.acquire(timeout=self.wait_seconds)
+        if not acquired:
+            bulkhead_rejections.inc(self.kind)
+            raise UpstreamUnavailable(f"Too many concurrent Supabase {self.kind} calls")
+        bulkhead_in_use.inc(self.kind)
+
+    def release(self):
+        bulkhead_in_use.dec(self.kind)
+        self._slots.release()
+
+
+class SupabaseGuard:
+    """Timeouts, bulkheads and circuit breakers around every Supabase call.
+
+    Calls are classified as `read`, `write` or `auth`. Each kind has its own
+    timeout and bulkhead; PostgREST (reads and writes) and Auth each have a
+    circuit breaker. Rejections and timeouts surface as UpstreamUnavailable.
+    """
+
+    def __init__(self):
+        self.timeouts = {
+            "read": settings.SUPABASE_READ_TIMEOUT,
+            "write": settings.SUPABASE_WRITE_TIMEOUT,
+            "auth": settings.SUPABASE_AUTH_TIMEOUT,
+        }
+        wait = settings.SUPABASE_BULKHEAD_WAIT_MS / 1000
+        self.bulkheads = {
+            "read": Bulkhead("read", settings.SUPABASE_READ_CONCURRENCY, wait),
+            "write": Bulkhead("write", settings.SUPABASE_WRITE_CONCURRENCY, wait),
+            "auth": Bulkhead("auth", settings.SUPABASE_AUTH_CONCURRENCY, wait),
+        }
+        rest = CircuitBreaker(
+            "rest", settings.SUPABASE_BREAKER_FAILURES, settings.SUPABASE_BREAKER_RESET_SECONDS
+        )
+        auth = CircuitBreaker(
+            "auth", settings.SUPABASE_BREAKER_FAILURES, settings.SUPABASE_BREAKER_RESET_SECONDS
+        )
+        self.breakers = {"read": rest, "write": rest, "auth": auth}
+
+    def call(self, kind: str, fn: Callable[[], T]) -> T:
+        import httpx
+
+        breaker = self.breakers[kind]
+        bulkhead = self.bulkheads[kind]
+        breaker.before_call()
+        try:
+            bulkhead.acquire()
+        except UpstreamUnavailable:
+            breaker.record_ignored()
+            raise
+        token = _operation_timeout.set(self.timeouts[kind])
+        try:
+            result = fn()
+        except Exception as e:
+            if is_upstream_failure(e):
+                breaker.record_failure()
+            else:
+                # Supabase answered, it just did not like the request
+                breaker.record_success()
+            if isinstance(e, httpx.TimeoutException):
+                raise UpstreamUnavailable(f"Supabase {kind} timed out", retryable=True) from e
+            raise
+        else:
+            breaker.record_success()
+            return result
+        finally:
+            _operation_timeout.reset(token)
+            bulkhead.release()
+
+
+def apply_operation_timeout(request: Any):
+    """httpx request hook: use the timeout of the Supabase call being made."""
+    timeout = _operation_timeout.get()
+    if timeout is not None:
+        request.extensions["timeout"] = {
+            "connect": timeout, "read": timeout, "write": timeout, "pool": timeout
+        }
+
+
+async def retry_read(fn: Callable[[], Awaitable[T]]) -> T:
+    """Run an idempotent read, retrying transient upstream failures with full jitter.
+
+    Makes at most SUPABASE_READ_RETRIES extra attempts. Open circuits and full
+    bulkheads are not retried; that is what they are there to prevent.
+    """
+    attempt = 0
+    while True:
+        try:
+            return await fn()
+        except UpstreamUnavailable as e:
+            if attempt >= settings.SUPABASE_READ_RETRIES or not e.retryable:
+                raise
+        except Exception as e:
+            if attempt >= settings.SUPABASE_READ_RETRIES or not is_upstream_failure(e):
+                raise
+        attempt += 1
+        read_retries.inc()
+        await asyncio.sleep(random.uniform(0, settings.SUPABASE_RETRY_BASE_MS / 1000 * 2 ** attempt))
+
+
+supabase_guard = SupabaseGuard()
@@ -0,0 +1,216 @@
+import time
+from collections import OrderedDict, defaultdict
+from typing import Hashable, Iterable, Optional
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.singleflight import upstream_reads
+
+# Single-flight namespaces whose loads go stale when a quest is invalidated
+_QUEST_FLIGHTS = ("quest", "participants")
+
+
+class QuestResponseCache:
+    """Encoded GET /quests/{quest_id} bodies, shared by every participant.
+
+    Entries expire after `ttl` seconds, which bounds how long writes this
+    worker does not see (other workers, admin or direct-Postgres paths) stay
+    hidden, and are evicted least-recently-used once the bodies exceed
+    `max_bytes`. Each entry remembers the quest's participants so a profile change can
+    drop every quest that shows that user. Fills are bracketed by begin/end,
+    and a fill is not stored if its quest, or one of the participants it
+    lists, was invalidated while it was loading; writes to other quests do
+    not affect it. Invalidation also detaches the quest's in-flight loads
+    from single-flight, so reads after a write never join one that started
+    before it.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # {quest_id: (expires_at, body, participant user_ids)}, least recently used first
+        self._entries: OrderedDict[str, tuple[float, bytes, frozenset[str]]] = OrderedDict()
+        # {user_id: {quest_id}} for cached quests only
+        self._quests_by_user: dict[str, set[str]] = defaultdict(set)
+        # {quest_id: [generation, fills in progress]} while fills are running
+        self._fills: dict[str, list[int]] = {}
+        # Counts invalidate_user calls; {user_id: count at its latest call}, kept
+        # only while fills are running
+        self._user_invalidations = 0
+        self._invalidated_users: dict[str, int] = {}
+        self.bytes_held = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, quest_id: str) -> Optional[bytes]:
+        entry = self._entries.get(quest_id)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                self._remove(quest_id)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(quest_id)
+        self.hits += 1
+        return entry[1]
+
+    def begin(self, quest_id: str) -> tuple[int, int]:
+        """Start a fill for the quest; pass the returned token to put."""
+        fill = self._fills.setdefault(quest_id, [0, 0])
+        fill[1] += 1
+        return fill[0], self._user_invalidations
+
+    def end(self, quest_id: str):
+        fill = self._fills[quest_id]
+        fill[1] -= 1
+        if not fill[1]:
+            del self._fills[quest_id]
+            if not self._fills:
+                self._invalidated_users.clear()
+
+    def put(self, quest_id: str, body: bytes, user_ids: Iterable[str], token: tuple[int, int]):
+        """Store a body loaded since begin() returned `token`, unless it was invalidated meanwhile."""
+        generation, user_invalidations = token
+        fill = self._fills.get(quest_id)
+        if fill is None or fill[0] != generation or len(body) > self.max_bytes or self.ttl <= 0:
+            return
+        users = frozenset(user_ids)
+        if any(self._invalidated_users.get(user_id, 0) > user_invalidations for user_id in users):
+            return
+        self._remove(quest_id)
+        self._entries[quest_id] = (time.monotonic() + self.ttl, body, users)
+        self.bytes_held += len(body)
+        for user_id in users:
+            self._quests_by_user[user_id].add(quest_id)
+        while self.bytes_held > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, quest_id: str):
+        fill = self._fills.get(quest_id)
+        if fill is not None:
+            fill[0] += 1
+        self._remove(quest_id)
+        upstream_reads.forget((namespace, quest_id) for namespace in _QUEST_FLIGHTS)
+
+    def invalidate_user(self, user_id: str):
+        """Drop every cached quest that lists this user as a participant."""
+        self._user_invalidations += 1
+        if self._fills:
+            self._invalidated_users[user_id] = self._user_invalidations
+        # Which quests the user is in is only known for cached ones, and profile
+        # changes are rare: detach every in-flight quest load
+        upstream_reads.forget_matching(lambda key: key[0] in _QUEST_FLIGHTS)
+        for quest_id in list(self._quests_by_user.get(user_id, ())):
+            self._remove(quest_id)
+
+    def _remove(self, quest_id: str):
+        entry = self._entries.pop(quest_id, None)
+        if entry is None:
+            return
+        _, body, users = entry
+        self.bytes_held -= len(body)
+        for user_id in users:
+            quests = self._quests_by_user.get(user_id)
+            if quests is not None:
+                quests.discard(quest_id)
+                if not quests:
+                    del self._quests_by_user[user_id]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes_held": self.bytes_held,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+class AnalyticsCache:
+    """Encoded analytics bodies keyed by (quest_id, user_id, *range), for `ttl` seconds.
+
+    A check-in write invalidates every range cached for that quest and user.
+    Fills are bracketed by begin/end so a write that lands while one is
+    loading keeps it from being stored.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # {key: (expires_at, body)}, least recently used first
+        self._entries: OrderedDict[tuple, tuple[float, bytes]] = OrderedDict()
+        # {(quest_id, user_id): {key}} for cached keys only
+        self._keys_by_pair: dict[tuple[str, str], set[tuple]] = defaultdict(set)
+        # {(quest_id, user_id): [generation, fills in progress]} while fills are running
+        self._fills: dict[tuple[str, str], list[int]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def begin(self, quest_id: str, user_id: str) -> int:
+        """Start a fill for the pair; pass the returned generation to put."""
+        fill = self._fills.setdefault((quest_id, user_id), [0, 0])
+        fill[1] += 1
+        return fill[0]
+
+    def end(self, quest_id: str, user_id: str):
+        fill = self._fills[(quest_id, user_id)]
+        fill[1] -= 1
+        if not fill[1]:
+            del self._fills[(quest_id, user_id)]
+
+    def put(self, key: tuple, body: bytes, generation: int):
+        """Store a body loaded since begin() returned `generation`, unless the pair was invalidated."""
+        fill = self._fills.get(key[:2])
+        if fill is None or fill[0] != generation or self.max_entries <= 0:
+            return
+        self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, body)
+        self._keys_by_pair[key[:2]].add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, quest_id: str, user_id: str):
+        fill = self._fills.get((quest_id, user_id))
+        if fill is not None:
+            fill[0] += 1
+        for key in list(self._keys_by_pair.get((quest_id, user_id), ())):
+            self._remove(key)
+
+    def _remove(self, key: Hashable):
+        if self._entries.pop(key, None) is None:
+            return
+        keys = self._keys_by_pair.get(key[:2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_pair[key[:2]]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+quest_cache = QuestResponseCache(max_bytes=settings.QUEST_CACHE_MAX_BYTES, ttl=settings.QUEST_CACHE_TTL_SECONDS)
+analytics_cache = AnalyticsCache(settings.ANALYTICS_CACHE_MAX_ENTRIES, settings.ANALYTICS_CACHE_TTL_SECONDS)
+
+registry.gauge("quest_cache_bytes", "Bytes held by the quest response cache", fn=lambda: quest_cache.bytes_held)
+registry.gauge("quest_cache_entries", "Quests held by the quest response cache", fn=lambda: len(quest_cache._entries))
+registry.counter_func("quest_cache_hits_total", "Quest response cache hits", lambda: quest_cache.hits)
+registry.counter_func("quest_cache_misses_total", "Quest response cache misses", lambda: quest_cache.misses)
+registry.counter_func("quest_cache_evictions_total", "Quest response cache size evictions", lambda: quest_cache.evictions)
+registry.gauge("analytics_cache_entries", "Check-in analytics bodies held in memory", fn=lambda: len(analytics_cache))
+registry.counter_func("analytics_cache_hits_total", "Check-in analytics cache hits", lambda: analytics_cache.hits)
+registry.counter_func("analytics_cache_misses_total", "Check-in analytics cache misses", lambda: analytics_cache.misses)
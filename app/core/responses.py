@@ -0,0 +1,62 @@
+from functools import lru_cache
+from typing import Any, Mapping, Optional, get_args
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+from app.core.config import settings
+
+
+def _nested_model(annotation: Any) -> Optional[type[BaseModel]]:
+    """The model inside a field annotation like `Model`, `Optional[Model]` or `List[Model]`."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in get_args(annotation):
+        model = _nested_model(arg)
+        if model is not None:
+            return model
+    return None
+
+
+@lru_cache(maxsize=None)
+def _fields(model: type[BaseModel]) -> tuple[tuple[str, Optional[type[BaseModel]]], ...]:
+    return tuple((name, _nested_model(field.annotation)) for name, field in model.model_fields.items())
+
+
+def project(content: Any, model: type[BaseModel]) -> Any:
+    """Keep only `model`'s fields (recursively) in a row or list of rows, like response_model filtering does."""
+    if isinstance(content, list):
+        return [project(item, model) for item in content]
+    if not isinstance(content, dict):
+        return content
+    return {
+        name: content[name] if nested is None else project(content[name], nested)
+        for name, nested in _fields(model)
+        if name in content
+    }
+
+
+def trusted_response(content: Any, model: type[BaseModel], headers: Optional[Mapping[str, str]] = None) -> Any:
+    """Return rows read from our own database, optionally skipping response_model validation.
+
+    With SKIP_RESPONSE_VALIDATION enabled the content is projected to
+    `model`'s fields (the model of each item, for lists) and encoded straight
+    to an ORJSONResponse, so FastAPI does not re-validate it against the
+    route's response_model. Only use this for plain dicts/lists already
+    shaped like the response model. Pass the route's injected Response
+    headers as `headers` so they are kept either way.
+    """
+    if settings.SKIP_RESPONSE_VALIDATION:
+        return ORJSONResponse(project(content, model), headers=headers)
+    return content
+
+
+def encode_response(content: Any, model: type[BaseModel]) -> bytes:
+    """Encode content to the same JSON bytes the route would send for it.
+
+    Follows SKIP_RESPONSE_VALIDATION the same way trusted_response does.
+    """
+    if settings.SKIP_RESPONSE_VALIDATION:
+        return orjson.dumps(project(content, model))
+    return orjson.dumps(model.model_validate(content).model_dump(mode="json"))
@@ -0,0 +1,168 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from app.core.concurrency import run_sync
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.metrics import registry
+from app.core.supabase import get_supabase_client
+from app.core.utils import generate_share_code, is_share_code_valid
+
+# Rows per PostgREST page when loading the index
+_PAGE_SIZE = 1000
+# Attempts at drawing a code that is not already taken
+_GENERATE_ATTEMPTS = 10
+
+share_code_rejections = registry.counter(
+    "share_code_rejections_total",
+    "Join attempts rejected from the in-memory share code index",
+    ("reason",),
+)
+share_code_syncs = registry.counter(
+    "share_code_index_syncs_total",
+    "Share code index refreshes from the database",
+    ("kind",),
+)
+
+
+class ShareCodeIndex:
+    """In-process map of share codes to (quest id, expiry) for rejecting bad join codes.
+
+    Loaded at startup and kept current by create_quest. Other workers create
+    codes too, so a miss triggers an incremental sync (quests updated since
+    the last one) before the code is rejected. Syncs are coalesced and spaced
+    at least SHARE_CODE_INDEX_SYNC_INTERVAL apart, so guessing codes costs at
+    most one small query per interval. updated_at is set when a write's
+    transaction starts, so a row can commit after the watermark has passed
+    it; each sync re-reads the last SHARE_CODE_INDEX_SYNC_OVERLAP before the
+    watermark to pick those up. Codes expired for longer than
+    SHARE_CODE_INDEX_RETENTION are forgotten, so they get 404 "Invalid share
+    code" rather than 400 "Share code has expired".
+    """
+
+    def __init__(self, sync_interval: float, retention: timedelta, overlap: timedelta):
+        self.sync_interval = sync_interval
+        self.retention = retention
+        self.overlap = overlap
+        self.ready = False
+        self._codes: Dict[str, Tuple[str, datetime]] = {}
+        # Highest quests.updated_at seen
+        self._watermark: Optional[datetime] = None
+        self._last_sync = 0.0
+        self._sync: Optional[asyncio.Future] = None
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def put(self, share_code: str, quest_id: str, expires_at: datetime):
+        """Record a new or refreshed code."""
+        self._codes[share_code] = (quest_id, expires_at)
+
+    def discard(self, share_code: str):
+        self._codes.pop(share_code, None)
+
+    def generate(self) -> str:
+        """A share code not already in the index."""
+        for _ in range(_GENERATE_ATTEMPTS):
+            share_code = generate_share_code()
+            if share_code not in self._codes:
+                return share_code
+        # Only reachable with an almost full code space; the unique constraint still applies
+        return share_code
+
+    def start(self):
+        """Begin loading in the background; joins use the database until it is ready."""
+        if self._sync is None:
+            self._sync = asyncio.ensure_future(self._run_sync())
+
+    async def check(self, share_code: str):
+        """Raise the join error for a code that is unknown or expired.
+
+        Returns without deciding when the index is disabled or could not be
+        loaded; the database lookup then stays authoritative.
+        """
+        if not settings.SHARE_CODE_INDEX_ENABLED:
+            return
+        entry = self._codes.get(share_code)
+        if entry is None:
+            await self.sync()
+            if not self.ready:
+                return
+            entry = self._codes.get(share_code)
+        if entry is None:
+            share_code_rejections.inc("unknown")
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Invalid share code"
+            )
+        if not is_share_code_valid(entry[1]):
+            share_code_rejections.inc("expired")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Share code has expired"
+            )
+
+    async def sync(self):
+        """Pull codes created or changed since the last sync (everything, until loaded once)."""
+        if self._sync is None:
+            self._sync = asyncio.ensure_future(self._run_sync())
+        await asyncio.shield(self._sync)
+
+    async def _run_sync(self):
+        try:
+            wait = self._last_sync + self.sync_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            kind = "incremental" if self.ready else "full"
+            since = self._watermark - self.overlap if self.ready and self._watermark is not None else None
+            rows = await run_sync(self._fetch, since)
+            for row in rows:
+                self.put(row["share_code"], row["id"], datetime.fromisoformat(row["share_code_expires_at"]))
+                updated_at = datetime.fromisoformat(row["updated_at"])
+                if self._watermark is None or updated_at > self._watermark:
+                    self._watermark = updated_at
+            self._evict_expired()
+            share_code_syncs.inc(kind)
+            if not self.ready:
+                self.ready = True
+                logger.info("Share code index loaded: %d codes", len(self._codes))
+        except Exception as e:
+            logger.warning("Share code index sync failed: %s", e)
+        finally:
+            self._last_sync = time.monotonic()
+            self._sync = None
+
+    def _fetch(self, since: Optional[datetime]) -> list:
+        supabase = get_supabase_client()
+        rows, offset = [], 0
+        while True:
+            query = supabase.table("quests").select("id, share_code, share_code_expires_at, updated_at")
+            if since is None:
+                cutoff = datetime.now(timezone.utc) - self.retention
+                query = query.gte("share_code_expires_at", cutoff.isoformat())
+            else:
+                query = query.gte("updated_at", since.isoformat())
+            page = query.order("updated_at").range(offset, offset + _PAGE_SIZE - 1).execute()
+            rows.extend(page.data)
+            if len(page.data) < _PAGE_SIZE:
+                return rows
+            offset += _PAGE_SIZE
+
+    def _evict_expired(self):
+        cutoff = datetime.now(timezone.utc) - self.retention
+        expired = [code for code, (_, expires_at) in self._codes.items() if expires_at < cutoff]
+        for code in expired:
+            del self._codes[code]
+
+
+share_code_index = ShareCodeIndex(
+    settings.SHARE_CODE_INDEX_SYNC_INTERVAL,
+    timedelta(hours=settings.SHARE_CODE_INDEX_RETENTION_HOURS),
+    timedelta(seconds=settings.SHARE_CODE_INDEX_SYNC_OVERLAP_SECONDS),
+)
+
+registry.gauge("share_code_index_size", "Share codes held in the in-memory index", fn=lambda: len(share_code_index))
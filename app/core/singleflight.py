@@ -0,0 +1,66 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable, Iterable, TypeVar
+
+from app.core.metrics import registry
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Collapses concurrent identical calls into one in-flight future.
+
+    The first caller for a key starts the work; callers arriving before it
+    finishes await the same result (or exception). Results are shared, so
+    callers must treat them as read-only. Nothing is cached once the call
+    completes.
+    """
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.collapsed = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._done(key, f))
+        else:
+            self.collapsed += 1
+        # Shielded so a caller that disconnects does not cancel the shared work
+        return await asyncio.shield(future)
+
+    def forget(self, keys: Iterable[Hashable]):
+        """Make the next call for each key start fresh work instead of joining the one in flight.
+
+        For data written while it was loading. Callers already waiting still get
+        the in-flight result.
+        """
+        for key in keys:
+            self._inflight.pop(key, None)
+
+    def forget_matching(self, predicate: Callable[[Hashable], bool]):
+        self.forget([key for key in self._inflight if predicate(key)])
+
+    def _done(self, key: Hashable, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.cancelled():
+            # Mark the exception retrieved in case every waiter went away
+            future.exception()
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "collapsed": self.collapsed, "in_flight": len(self._inflight)}
+
+
+# Shared by read paths that hit Supabase; keys are namespaced tuples like ("quest", quest_id)
+upstream_reads = SingleFlight()
+
+registry.counter_func(
+    "singleflight_calls_total", "Upstream reads requested through single-flight", lambda: upstream_reads.calls
+)
+registry.counter_func(
+    "singleflight_collapsed_total", "Upstream reads that joined an in-flight call", lambda: upstream_reads.collapsed
+)
@@ -1,18 +1,96 @@
-from supabase import create_client, Client as _SupabaseClient
+import threading
+from typing import TYPE_CHECKING, Any, Optional
 
 from app.core.config import settings
+from app.core.logging import logger
+from app.core.resilience import apply_operation_timeout
+from app.core.upstream import TracedClient
+
+if TYPE_CHECKING:
+    import httpx
+    from supabase import Client as _SupabaseClient
+else:
+    # The SDK is imported when the clients are built so importing the app stays fast
+    _SupabaseClient = Any
 
 # Type alias for Supabase Client - import this instead of supabase.Client
 SupabaseClient = _SupabaseClient
 
-# Service client (bypasses RLS) - created at module load, thread-safe
-_service_client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+# Built by init_supabase() in the app lifespan (or on first use outside the app, e.g. CLI jobs).
+# One httpx client carries every PostgREST and Auth request, of the service client and of
+# the per-request anon clients. The service client bypasses RLS and is wrapped so every
+# table, RPC and auth call is timed (see app.core.upstream).
+_http_client: Optional["httpx.Client"] = None
+_service_client: Optional[TracedClient] = None
+_clients_lock = threading.Lock()
+
+
+def _create_http_client() -> "httpx.Client":
+    import httpx
+
+    # The per-kind timeout of the call being made replaces this default (see app.core.resilience)
+    timeout = max(settings.SUPABASE_READ_TIMEOUT, settings.SUPABASE_WRITE_TIMEOUT, settings.SUPABASE_AUTH_TIMEOUT)
+    return httpx.Client(
+        timeout=timeout,
+        follow_redirects=True,
+        http2=True,
+        event_hooks={"request": [apply_operation_timeout]},
+    )
+
+
+def _create_client(key: str) -> TracedClient:
+    from supabase import create_client
+    from supabase.lib.client_options import SyncClientOptions
+
+    client = create_client(settings.SUPABASE_URL, key, SyncClientOptions(httpx_client=_http_client))
+    return TracedClient(client)
+
+
+def init_supabase():
+    """Build the shared HTTP client and the service client. Blocking (imports the SDK); run it in a thread."""
+    global _http_client, _service_client
+    with _clients_lock:
+        if _service_client is None:
+            _http_client = _create_http_client()
+            _service_client = _create_client(settings.SUPABASE_SERVICE_KEY)
 
 
 def get_supabase_client() -> SupabaseClient:
     """Get Supabase service client (bypasses RLS)."""
+    if _service_client is None:
+        init_supabase()
     return _service_client
 
+
 def get_anon_client() -> SupabaseClient:
     """Get Supabase user client (enabled RLS)."""
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
\ No newline at end of file
+    if _service_client is None:
+        init_supabase()
+    return _create_client(settings.SUPABASE_KEY)
+
+
+def warm_up_supabase():
+    """Open the shared client's PostgREST and Auth connections.
+
+    Blocking; run it in a thread. Failures are logged, not raised, so a
+    Supabase outage does not stop the app from starting.
+    """
+    supabase = get_supabase_client()
+    try:
+        supabase.table("quests").select("id").limit(1).execute()
+        supabase.auth.admin.list_users(page=1, per_page=1)
+    except Exception as e:
+        logger.warning("Supabase warm-up failed: %s", e)
+
+
+def close_supabase():
+    """Close the shared HTTP connection pool."""
+    global _http_client, _service_client
+    with _clients_lock:
+        http_client, _http_client, _service_client = _http_client, None, None
+    if http_client is None:
+        return
+    try:
+        http_client.close()
+    except Exception as e:
+        logger.warning("Error closing Supabase connection pool: %s", e)
@@ -0,0 +1,176 @@
+import time
+from collections import Counter as _Tally
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any, Optional
+
+from app.core.metrics import registry
+from app.core.resilience import supabase_guard
+
+_QUERY_OPERATIONS = {"select", "insert", "update", "delete", "upsert"}
+# RPCs are read-only functions, sharing the read timeout and bulkhead, except these
+_READ_OPERATIONS = {"select", "rpc"}
+_WRITE_RPCS = {"add_participant_points", "apply_points_corrections"}
+
+supabase_call_duration = registry.histogram(
+    "supabase_call_duration_seconds",
+    "Latency of Supabase calls by table (or RPC/auth) and operation",
+    ("table", "operation"),
+)
+supabase_call_errors = registry.counter(
+    "supabase_call_errors_total",
+    "Supabase calls that raised",
+    ("table", "operation"),
+)
+request_upstream_calls = registry.histogram(
+    "http_request_supabase_calls",
+    "Supabase calls made while serving one request",
+    ("route",),
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+call_budget_exceeded = registry.counter(
+    "supabase_call_budget_exceeded_total",
+    "Requests that made more Supabase calls than SUPABASE_CALL_BUDGET",
+    ("route",),
+)
+
+
+class UpstreamCalls:
+    """Supabase calls made on behalf of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.by_call: _Tally = _Tally()
+        # Calls may be recorded from threadpool workers running the same request
+        self._lock = Lock()
+
+    def add(self, table: str, operation: str, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            self.by_call[f"{table}.{operation}"] += 1
+
+    def summary(self, limit: int = 5) -> str:
+        return ", ".join(f"{call} x{n}" for call, n in self.by_call.most_common(limit))
+
+
+_current_calls: ContextVar[Optional[UpstreamCalls]] = ContextVar("upstream_calls", default=None)
+
+
+def track_request() -> UpstreamCalls:
+    """Start collecting upstream calls for the current request context."""
+    calls = UpstreamCalls()
+    _current_calls.set(calls)
+    return calls
+
+
+def current_calls() -> Optional[UpstreamCalls]:
+    return _current_calls.get()
+
+
+def record(table: str, operation: str, seconds: float, failed: bool = False):
+    supabase_call_duration.observe(seconds, table, operation)
+    if failed:
+        supabase_call_errors.inc(table, operation)
+    calls = _current_calls.get()
+    if calls is not None:
+        calls.add(table, operation, seconds)
+
+
+class TracedQuery:
+    """Wraps a postgrest request builder so the eventual `.execute()` is recorded."""
+
+    __slots__ = ("_query", "_table", "_operation")
+
+    def __init__(self, query: Any, table: str, operation: str):
+        self._query = query
+        self._table = table
+        self._operation = operation
+
+    def execute(self):
+        read = self._operation in _READ_OPERATIONS and self._table not in _WRITE_RPCS
+        kind = "read" if read else "write"
+        return supabase_guard.call(kind, self._execute)
+
+    def _execute(self):
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = self._query.execute()
+            failed = False
+            return result
+        finally:
+            record(self._table, self._operation, time.perf_counter() - start, failed)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._query, name)
+        if not callable(attr):
+            return attr
+        operation = name if name in _QUERY_OPERATIONS else self._operation
+
+        def chain(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, "execute"):
+                return TracedQuery(result, self._table, operation)
+            return result
+
+        return chain
+
+
+class TracedAuth:
+    """Wraps the auth client (and its `admin` API) so each method call is recorded."""
+
+    __slots__ = ("_auth", "_prefix")
+
+    def __init__(self, auth: Any, prefix: str = ""):
+        self._auth = auth
+        self._prefix = prefix
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._auth, name)
+        if name == "admin":
+            return TracedAuth(attr, "admin.")
+        if name.startswith("_") or not callable(attr):
+            return attr
+        operation = self._prefix + name
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = attr(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                record("auth", operation, time.perf_counter() - start, failed)
+
+        def call(*args, **kwargs):
+            return supabase_guard.call("auth", lambda: timed(*args, **kwargs))
+
+        return call
+
+
+class TracedClient:
+    """Drop-in wrapper for a supabase Client that traces table, RPC and auth calls.
+
+    Every `.execute()` on a table/RPC query and every `auth.*` / `auth.admin.*`
+    call is timed, recorded in the metrics registry and, while a request is
+    being tracked, added to that request's UpstreamCalls. Calls also go
+    through the timeouts, bulkheads and circuit breakers in app.core.resilience.
+    """
+
+    def __init__(self, client: Any):
+        self._client = client
+        self.auth = TracedAuth(client.auth)
+
+    def table(self, table_name: str) -> TracedQuery:
+        return TracedQuery(self._client.table(table_name), table_name, "select")
+
+    from_ = table
+
+    def rpc(self, fn: str, params: Optional[dict] = None, *args, **kwargs) -> TracedQuery:
+        return TracedQuery(self._client.rpc(fn, params or {}, *args, **kwargs), fn, "rpc")
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
@@ -1,10 +1,80 @@
+import time
+
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-import time
+from fastapi.responses import ORJSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 
 from app.core.config import settings
-from app.core.logging import logger
-from app.api.routes import auth_router, quests_router, checkins_router, profile_router, connection_router
+from app.core.admission import AdmissionControlMiddleware
+from app.core.concurrency import limit_request_concurrency
+from app.core.connection_manager import manager
+from app.core.logging import access_logger, logger, shutdown_logging
+from app.core.loop_monitor import loop_monitor
+from app.core.metrics import http_request_duration, registry
+from app.core.upstream import UpstreamCalls, call_budget_exceeded, request_upstream_calls, track_request
+from app.core.profiling import RequestProfilingMiddleware
+from app.core.rate_limit import rate_limiter
+from app.core.share_codes import share_code_index
+from app.services.account_deletion import account_deletion_jobs
+from app.services.quest_snapshots import quest_snapshots
+from app.core.supabase import close_supabase, init_supabase, warm_up_supabase
+from app.repositories import close_repository, open_repository
+from app.api.routes import (
+    auth_router, quests_router, checkins_router, profile_router, connection_router, admin_router
+)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _observe_request(request: Request, status_code: int, elapsed: float, calls: UpstreamCalls):
+    """Record request latency and upstream calls under the matched route template, not the raw path."""
+    route = request.scope.get("route")
+    route_path = route.path if route is not None else "unmatched"
+    http_request_duration.observe(elapsed, request.method, route_path, str(status_code))
+    request_upstream_calls.observe(calls.count, route_path)
+    if calls.count > settings.SUPABASE_CALL_BUDGET:
+        call_budget_exceeded.inc(route_path)
+        logger.warning(
+            "%s %s made %d Supabase calls (budget %d): %s",
+            request.method, route_path, calls.count, settings.SUPABASE_CALL_BUDGET, calls.summary(),
+        )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    await run_in_threadpool(init_supabase)
+    if settings.SUPABASE_WARMUP:
+        await run_in_threadpool(warm_up_supabase)
+    await open_repository()
+    if settings.SHARE_CODE_INDEX_ENABLED:
+        share_code_index.start()
+    account_deletion_jobs.start_sweeper()
+    if settings.QUEST_ARCHIVE_ENABLED:
+        quest_snapshots.start_sweeper()
+    quest_snapshots.start_sync()
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    logger.info(
+        "Startup completed in %.0fms (%.0fms since import)",
+        (time.perf_counter() - started) * 1000, (time.perf_counter() - _import_started) * 1000,
+    )
+    yield
+    await manager.close_all()
+    await account_deletion_jobs.stop()
+    await quest_snapshots.stop()
+    if settings.LOOP_MONITOR_ENABLED:
+        await loop_monitor.stop()
+    await close_repository()
+    await rate_limiter.store.close()
+    await run_in_threadpool(close_supabase)
+    logger.info("Shutdown complete")
+    shutdown_logging()
 
 
 def create_app() -> FastAPI:
@@ -16,7 +86,9 @@ def create_app() -> FastAPI:
         debug=settings.DEBUG,
         docs_url=f"{settings.API_PREFIX}/docs",
         redoc_url=f"{settings.API_PREFIX}/redoc",
-        openapi_url=f"{settings.API_PREFIX}/openapi.json"
+        openapi_url=f"{settings.API_PREFIX}/openapi.json",
+        default_response_class=ORJSONResponse,
+        lifespan=lifespan,
     )
 
     # Configure CORS
@@ -34,15 +106,37 @@ def create_app() -> FastAPI:
     app.include_router(checkins_router, prefix=settings.API_PREFIX)
     app.include_router(profile_router, prefix=settings.API_PREFIX)
     app.include_router(connection_router, prefix=settings.API_PREFIX)
+    app.include_router(admin_router, prefix=settings.API_PREFIX)
+
+    # Pass-through unless ADMIN_TOKEN is set and a request asks to be profiled
+    app.add_middleware(RequestProfilingMiddleware)
+
+    # Sheds low-priority requests with 503 when the worker is overloaded
+    app.add_middleware(AdmissionControlMiddleware, router=app.router)
 
     @app.middleware("http")
     async def log_requests(request: Request, call_next):
         start = time.perf_counter()
-        response = await call_next(request)
-        elapsed_ms = (time.perf_counter() - start) * 1000
-        logger.info(
-            "%s %s -> %d (%.1fms)",
-            request.method, request.url.path, response.status_code, elapsed_ms,
+        calls = track_request()
+        limit_request_concurrency(settings.REQUEST_CONCURRENCY_LIMIT)
+        try:
+            response = await call_next(request)
+        except Exception:
+            _observe_request(request, 500, time.perf_counter() - start, calls)
+            raise
+        elapsed = time.perf_counter() - start
+        _observe_request(request, response.status_code, elapsed, calls)
+        access_logger.info(
+            "%s %s -> %d (%.1fms, %d upstream calls in %.1fms)",
+            request.method, request.url.path, response.status_code, elapsed * 1000,
+            calls.count, calls.seconds * 1000,
+            extra={
+                "method": request.method,
+                "path": request.url.path,
+                "status": response.status_code,
+                "duration_ms": round(elapsed * 1000, 1),
+                "upstream_calls": calls.count,
+            },
         )
         return response
 
@@ -58,8 +152,13 @@ def create_app() -> FastAPI:
     async def health_check():
         return {"status": "healthy"}
 
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
     logger.info("CherriesService %s started (debug=%s)", settings.APP_VERSION, settings.DEBUG)
     return app
 
 
 app = create_app()
+logger.info("Imported app in %.0fms", (time.perf_counter() - _import_started) * 1000)
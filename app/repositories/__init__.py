@@ -0,0 +1,55 @@
+from typing import Optional
+
+from fastapi import Depends
+
+from app.core.config import settings
+from app.core.supabase import SupabaseClient, get_supabase_client
+from app.repositories.base import CheckInNotFound, Repository
+from app.repositories.supabase import SupabaseRepository
+
+# Created on first use; the asyncpg import only happens with DATA_BACKEND=postgres
+_postgres_repository: Optional[Repository] = None
+
+
+def _get_postgres_repository() -> Repository:
+    global _postgres_repository
+    if _postgres_repository is None:
+        if not settings.DATABASE_URL:
+            raise RuntimeError("DATABASE_URL must be set when DATA_BACKEND=postgres")
+        from app.repositories.postgres import PostgresRepository
+
+        _postgres_repository = PostgresRepository(
+            settings.DATABASE_URL,
+            min_size=settings.DATABASE_POOL_MIN_SIZE,
+            max_size=settings.DATABASE_POOL_MAX_SIZE,
+            statement_cache_size=settings.DATABASE_STATEMENT_CACHE_SIZE,
+        )
+    return _postgres_repository
+
+
+def get_repository(supabase: SupabaseClient = Depends(get_supabase_client)) -> Repository:
+    """Repository for the configured DATA_BACKEND."""
+    if settings.DATA_BACKEND == "postgres":
+        return _get_postgres_repository()
+    return SupabaseRepository(supabase)
+
+
+async def open_repository():
+    """Open the Postgres pool at startup instead of on the first request."""
+    if settings.DATA_BACKEND == "postgres":
+        await _get_postgres_repository().open()
+
+
+async def close_repository():
+    if _postgres_repository is not None:
+        await _postgres_repository.close()
+
+
+__all__ = [
+    "CheckInNotFound",
+    "Repository",
+    "SupabaseRepository",
+    "get_repository",
+    "open_repository",
+    "close_repository",
+]
@@ -0,0 +1,73 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.schemas import CheckInCreate
+
+
+class CheckInNotFound(LookupError):
+    """Raised when decrementing a check-in that does not exist."""
+
+
+class Repository(ABC):
+    """Data access for the hot paths, independent of how the database is reached.
+
+    Rows are returned as plain dicts shaped like the PostgREST responses the
+    routes were written against (ids as strings; dates may be date objects).
+    """
+
+    @abstractmethod
+    async def get_participant(self, quest_id: str, user_id: str) -> Optional[dict]:
+        """The quest_participants row, or None if the user is not in the quest."""
+
+    @abstractmethod
+    async def get_quest(self, quest_id: str) -> Optional[dict]:
+        """A quest with its `daily_tasks`, or None."""
+
+    @abstractmethod
+    async def list_user_quests(
+        self,
+        user_id: str,
+        status: Optional[str],
+        after: Optional[Tuple[datetime, str]],
+        limit: Optional[int],
+    ) -> List[dict]:
+        """The user's quests, most recently active first, each with its `daily_tasks` and the
+        user's `last_activity_at`.
+
+        `status` is "active", "finished" or None for both; `after` is the
+        (last_activity_at, quest id) of the previous page's last quest, and a
+        `limit` of None returns every quest.
+        """
+
+    @abstractmethod
+    async def list_quest_summaries(
+        self,
+        user_id: str,
+        status: Optional[str],
+        after: Optional[Tuple[datetime, str]],
+        limit: Optional[int],
+    ) -> List[dict]:
+        """The same page as list_user_quests, shaped like QuestSummary, in one query."""
+
+    @abstractmethod
+    async def load_quest_participants(self, quest_id: str) -> List[dict]:
+        """Participants shaped like ParticipantUserResponse (username and avatar from auth metadata)."""
+
+    @abstractmethod
+    async def load_participants(self, quest_ids: List[str]) -> Dict[str, List[dict]]:
+        """load_quest_participants for many quests in a fixed number of queries, keyed by quest id."""
+
+    @abstractmethod
+    async def increment_checkin(self, participant: dict, checkin_data: CheckInCreate) -> dict:
+        """Add one to the user's check-in for the task and date and credit the task's points."""
+
+    @abstractmethod
+    async def decrement_checkin(self, participant: dict, checkin_data: CheckInCreate) -> Optional[dict]:
+        """Take one off the check-in (deleting it at zero, then returning None) and debit the points.
+
+        Raises CheckInNotFound if there is nothing to decrement.
+        """
+
+    async def close(self):
+        pass
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import asyncpg
+
+from app.core.logging import logger
+from app.core.upstream import record
+from app.repositories.base import CheckInNotFound, Repository
+from app.schemas import CheckInCreate
+
+# Tasks are aggregated in the same statement so a quest is one round trip
+_QUEST_COLUMNS = """
+    q.*,
+    COALESCE(
+        (SELECT json_agg(t ORDER BY t.created_at) FROM daily_tasks t WHERE t.quest_id = q.id),
+        '[]'::json
+    ) AS daily_tasks
+"""
+
+
+def _row(record: Optional[asyncpg.Record]) -> Optional[dict]:
+    """Record to dict with UUIDs as strings, matching what PostgREST returns."""
+    if record is None:
+        return None
+    return {k: str(v) if isinstance(v, uuid.UUID) else v for k, v in record.items()}
+
+
+async def _init_connection(conn: asyncpg.Connection):
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+class PostgresRepository(Repository):
+    """Repository over a direct, pooled Postgres connection (DATA_BACKEND=postgres).
+
+    Skips the PostgREST HTTP hop for the hot paths: one query per read, and
+    check-in writes as a single transaction with atomic point updates. The
+    connection role must be able to read auth.users (the Supabase `postgres`
+    role can). Queries are recorded like Supabase calls for the call budget.
+    """
+
+    def __init__(self, dsn: str, min_size: int, max_size: int, statement_cache_size: int):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.statement_cache_size = statement_cache_size
+        self._pool: Optional[asyncpg.Pool] = None
+        self._lock = asyncio.Lock()
+
+    async def open(self):
+        async with self._lock:
+            if self._pool is None:
+                self._pool = await asyncpg.create_pool(
+                    self.dsn,
+                    min_size=self.min_size,
+                    max_size=self.max_size,
+                    statement_cache_size=self.statement_cache_size,
+                    init=_init_connection,
+                )
+                logger.info("Postgres pool opened (min=%d, max=%d)", self.min_size, self.max_size)
+
+    async def close(self):
+        async with self._lock:
+            if self._pool is not None:
+                await self._pool.close()
+                self._pool = None
+
+    async def _query(self, conn: Optional[asyncpg.Connection], method: str, table: str,
+                     operation: str, sql: str, *args) -> Any:
+        if conn is None:
+            if self._pool is None:
+                await self.open()
+            conn = self._pool
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = await getattr(conn, method)(sql, *args)
+            failed = False
+            return result
+        finally:
+            record(table, operation, time.perf_counter() - start, failed)
+
+    async def get_participant(self, quest_id: str, user_id: str) -> Optional[dict]:
+        return _row(await self._query(
+            None, "fetchrow", "quest_participants", "select",
+            "SELECT * FROM quest_participants WHERE quest_id = $1 AND user_id = $2",
+            quest_id, user_id,
+        ))
+
+    async def get_quest(self, quest_id: str) -> Optional[dict]:
+        return _row(await self._query(
+            None, "fetchrow", "quests", "select",
+            f"SELECT {_QUEST_COLUMNS} FROM quests q WHERE q.id = $1",
+            quest_id,
+        ))
+
+    async def list_user_quests(
+        self,
+        user_id: str,
+        status: Optional[str],
+        after: Optional[Tuple[datetime, str]],
+        limit: Optional[int],
+    ) -> List[dict]:
+        rows = await self._query(
+            None, "fetch", "quests", "select",
+            f"""
+            SELECT {_QUEST_COLUMNS}, pg.last_activity_at
+            FROM user_quest_page($1, $2, $3, $4, $5) pg
+            JOIN quests q ON q.id = pg.quest_id
+            ORDER BY pg.last_activity_at DESC, pg.quest_id DESC
+            """,
+            user_id, status, after[0] if after else None, after[1] if after else None, limit,
+        )
+        return [_row(r) for r in rows]
+
+    async def list_quest_summaries(
+        self,
+        user_id: str,
+        status: Optional[str],
+        after: Optional[Tuple[datetime, str]],
+        limit: Optional[int],
+    ) -> List[dict]:
+        rows = await self._query(
+            None, "fetch", "quests", "select",
+            "SELECT * FROM quest_summaries($1, $2, $3, $4, $5)",
+            user_id, status, after[0] if after else None, after[1] if after else None, limit,
+        )
+        return [_row(r) for r in rows]
+
+    async def load_quest_participants(self, quest_id: str) -> List[dict]:
+        return (await self.load_participants([quest_id])).get(quest_id, [])
+
+    async def load_participants(self, quest_ids: List[str]) -> Dict[str, List[dict]]:
+        # One join instead of a get_user_metadata RPC per participant
+        rows = await self._query(
+            None, "fetch", "quest_participants", "select",
+            """
+            SELECT p.quest_id,
+                   p.user_id,
+                   u.raw_user_meta_data->>'username' AS username,
+                   u.raw_user_meta_data->'avatar' AS avatar,
+                   p.joined_at,
+                   p.total_points
+            FROM quest_participants p
+            LEFT JOIN auth.users u ON u.id = p.user_id
+            WHERE p.quest_id = ANY($1::uuid[])
+            ORDER BY p.joined_at
+            """,
+            quest_ids,
+        )
+        by_quest: Dict[str, List[dict]] = {quest_id: [] for quest_id in quest_ids}
+        for row in rows:
+            participant = _row(row)
+            by_quest[participant.pop("quest_id")].append(participant)
+        return by_quest
+
+    async def increment_checkin(self, participant: dict, checkin_data: CheckInCreate) -> dict:
+        user_id = participant["user_id"]
+        if self._pool is None:
+            await self.open()
+        async with self._pool.acquire() as conn, conn.transaction():
+            points = await self._task_points(conn, checkin_data.daily_task_id)
+            checkin = await self._query(
+                conn, "fetchrow", "check_ins", "upsert",
+                """
+                INSERT INTO check_ins (user_id, quest_id, daily_task_id, check_in_date, count, notes)
+                VALUES ($1, $2, $3, $4, 1, $5)
+                ON CONFLICT (user_id, daily_task_id, check_in_date)
+                DO UPDATE SET count = check_ins.count + 1
+                RETURNING *
+                """,
+                user_id, checkin_data.quest_id, checkin_data.daily_task_id,
+                checkin_data.check_in_date, checkin_data.notes,
+            )
+            await self._query(
+                conn, "execute", "quest_participants", "update",
+                """
+                UPDATE quest_participants SET total_points = total_points + $3, last_activity_at = NOW()
+                WHERE quest_id = $1 AND user_id = $2
+                """,
+                checkin_data.quest_id, user_id, points,
+            )
+        return _row(checkin)
+
+    async def decrement_checkin(self, participant: dict, checkin_data: CheckInCreate) -> Optional[dict]:
+        user_id = participant["user_id"]
+        if self._pool is None:
+            await self.open()
+        async with self._pool.acquire() as conn, conn.transaction():
+            points = await self._task_points(conn, checkin_data.daily_task_id)
+            existing = await self._query(
+                conn, "fetchrow", "check_ins", "select",
+                """
+                SELECT id, count FROM check_ins
+                WHERE user_id = $1 AND daily_task_id = $2 AND check_in_date = $3
+                FOR UPDATE
+                """,
+                user_id, checkin_data.daily_task_id, checkin_data.check_in_date,
+            )
+            if existing is None:
+                raise CheckInNotFound("Check-in not found")
+
+            if existing["count"] > 1:
+                result = _row(await self._query(
+                    conn, "fetchrow", "check_ins", "update",
+                    "UPDATE check_ins SET count = count - 1 WHERE id = $1 RETURNING *",
+                    existing["id"],
+                ))
+            else:
+                await self._query(
+                    conn, "execute", "check_ins", "delete",
+                    "DELETE FROM check_ins WHERE id = $1",
+                    existing["id"],
+                )
+                result = None
+
+            await self._query(
+                conn, "execute", "quest_participants", "update",
+                """
+                UPDATE quest_participants
+                SET total_points = GREATEST(0, total_points - $3), last_activity_at = NOW()
+                WHERE quest_id = $1 AND user_id = $2
+                """,
+                checkin_data.quest_id, user_id, points,
+            )
+        return result
+
+    async def _task_points(self, conn: asyncpg.Connection, daily_task_id: str) -> int:
+        points = await self._query(
+            conn, "fetchval", "daily_tasks", "select",
+            "SELECT points FROM daily_tasks WHERE id = $1",
+            daily_task_id,
+        )
+        if points is None:
+            raise LookupError("Daily task not found")
+        return points
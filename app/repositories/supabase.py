@@ -0,0 +1,229 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.core.concurrency import run_sync
+from app.core.resilience import retry_read
+from app.core.supabase import SupabaseClient
+from app.repositories.base import CheckInNotFound, Repository
+from app.schemas import CheckInCreate
+
+
+def _page_params(
+    user_id: str,
+    status: Optional[str],
+    after: Optional[Tuple[datetime, str]],
+    limit: Optional[int],
+) -> dict:
+    """Arguments for the user_quest_page and quest_summaries RPCs."""
+    return {
+        "p_user_id": user_id,
+        "p_status": status,
+        "p_after_activity": after[0].isoformat() if after else None,
+        "p_after_id": after[1] if after else None,
+        "p_limit": limit,
+    }
+
+
+class SupabaseRepository(Repository):
+    """Repository over PostgREST via the Supabase SDK (the default backend).
+
+    The SDK is synchronous, so every method runs its calls in the threadpool
+    (see run_sync). Reads are retried on transient upstream failures.
+    """
+
+    def __init__(self, supabase: SupabaseClient):
+        self.supabase = supabase
+
+    async def get_participant(self, quest_id: str, user_id: str) -> Optional[dict]:
+        return await retry_read(lambda: run_sync(self._get_participant, quest_id, user_id))
+
+    async def get_quest(self, quest_id: str) -> Optional[dict]:
+        quest = await retry_read(lambda: run_sync(
+            self.supabase.table("quests")
+            .select("*, daily_tasks(*)")
+            .eq("id", quest_id)
+            .maybe_single()
+            .execute
+        ))
+        return quest.data if quest is not None else None
+
+    async def list_user_quests(
+        self,
+        user_id: str,
+        status: Optional[str],
+        after: Optional[Tuple[datetime, str]],
+        limit: Optional[int],
+    ) -> List[dict]:
+        return await retry_read(lambda: run_sync(self._list_user_quests, user_id, status, after, limit))
+
+    async def list_quest_summaries(
+        self,
+        user_id: str,
+        status: Optional[str],
+        after: Optional[Tuple[datetime, str]],
+        limit: Optional[int],
+    ) -> List[dict]:
+        summaries = await retry_read(lambda: run_sync(
+            self.supabase.rpc("quest_summaries", _page_params(user_id, status, after, limit)).execute
+        ))
+        return summaries.data
+
+    async def load_quest_participants(self, quest_id: str) -> List[dict]:
+        return (await self.load_participants([quest_id]))[quest_id]
+
+    async def load_participants(self, quest_ids: List[str]) -> Dict[str, List[dict]]:
+        return await retry_read(lambda: run_sync(self._load_participants, quest_ids))
+
+    async def increment_checkin(self, participant: dict, checkin_data: CheckInCreate) -> dict:
+        return await run_sync(self._increment_checkin, participant, checkin_data)
+
+    async def decrement_checkin(self, participant: dict, checkin_data: CheckInCreate) -> Optional[dict]:
+        return await run_sync(self._decrement_checkin, participant, checkin_data)
+
+    def _get_participant(self, quest_id: str, user_id: str) -> Optional[dict]:
+        participant = self.supabase.table("quest_participants")\
+            .select("*")\
+            .eq("quest_id", quest_id)\
+            .eq("user_id", user_id)\
+            .execute()
+        return participant.data[0] if participant.data else None
+
+    def _list_user_quests(
+        self,
+        user_id: str,
+        status: Optional[str],
+        after: Optional[Tuple[datetime, str]],
+        limit: Optional[int],
+    ) -> List[dict]:
+        page = self.supabase.rpc("user_quest_page", _page_params(user_id, status, after, limit)).execute()
+        if not page.data:
+            return []
+
+        quests = self.supabase.table("quests")\
+            .select("*, daily_tasks(*)")\
+            .in_("id", [row["quest_id"] for row in page.data])\
+            .execute()
+        by_id = {quest["id"]: quest for quest in quests.data}
+
+        # Keep the page's order; a quest deleted in between is skipped
+        result = []
+        for row in page.data:
+            quest = by_id.get(row["quest_id"])
+            if quest is not None:
+                quest["last_activity_at"] = row["last_activity_at"]
+                result.append(quest)
+        return result
+
+    def _load_participants(self, quest_ids: List[str]) -> Dict[str, List[dict]]:
+        by_quest: Dict[str, List[dict]] = {quest_id: [] for quest_id in quest_ids}
+        if not quest_ids:
+            return by_quest
+
+        # Get participants for these quests
+        participants_response = self.supabase.table("quest_participants")\
+            .select("quest_id, user_id, joined_at, total_points")\
+            .in_("quest_id", quest_ids)\
+            .order("joined_at")\
+            .execute()
+
+        if not participants_response.data:
+            return by_quest
+
+        # Get user metadata from auth.users, for every participant in one call
+        user_ids = list({p["user_id"] for p in participants_response.data})
+        users_response = self.supabase.rpc("get_users_metadata", {"p_user_ids": user_ids}).execute()
+        metadata_by_user = {u["id"]: u.get("raw_user_meta_data") or {} for u in users_response.data or []}
+
+        for p in participants_response.data:
+            metadata = metadata_by_user.get(p["user_id"], {})
+            by_quest[p["quest_id"]].append({
+                "user_id": p["user_id"],
+                "username": metadata.get("username"),
+                "avatar": metadata.get("avatar"),
+                "joined_at": p["joined_at"],
+                "total_points": p.get("total_points", 0)
+            })
+
+        return by_quest
+
+    def _get_task_points(self, daily_task_id: str) -> int:
+        task = self.supabase.table("daily_tasks")\
+            .select("points")\
+            .eq("id", daily_task_id)\
+            .single()\
+            .execute()
+        return task.data["points"]
+
+    def _get_existing_checkin(self, user_id: str, checkin_data: CheckInCreate) -> Optional[dict]:
+        existing = self.supabase.table("check_ins")\
+            .select("*")\
+            .eq("user_id", user_id)\
+            .eq("daily_task_id", checkin_data.daily_task_id)\
+            .eq("check_in_date", checkin_data.check_in_date.isoformat())\
+            .execute()
+        return existing.data[0] if existing.data else None
+
+    def _add_points(self, quest_id: str, user_id: str, delta: int):
+        self.supabase.rpc("add_participant_points", {
+            "p_quest_id": quest_id,
+            "p_user_id": user_id,
+            "p_delta": delta,
+        }).execute()
+
+    def _increment_checkin(self, participant: dict, checkin_data: CheckInCreate) -> dict:
+        user_id = participant["user_id"]
+        points_to_add = self._get_task_points(checkin_data.daily_task_id)
+
+        # Check if check-in already exists for this user/task/date
+        existing = self._get_existing_checkin(user_id, checkin_data)
+
+        if existing:
+            # Increment existing check-in count
+            checkin = self.supabase.table("check_ins")\
+                .update({"count": existing["count"] + 1})\
+                .eq("id", existing["id"])\
+                .execute()
+        else:
+            # Create new check-in with count=1
+            checkin = self.supabase.table("check_ins").insert({
+                "user_id": user_id,
+                "quest_id": checkin_data.quest_id,
+                "daily_task_id": checkin_data.daily_task_id,
+                "check_in_date": checkin_data.check_in_date.isoformat(),
+                "count": 1,
+                "notes": checkin_data.notes
+            }).execute()
+
+        # Add to the participant's total points in the database, not from the total read earlier
+        self._add_points(checkin_data.quest_id, user_id, points_to_add)
+
+        return checkin.data[0]
+
+    def _decrement_checkin(self, participant: dict, checkin_data: CheckInCreate) -> Optional[dict]:
+        user_id = participant["user_id"]
+        points_to_subtract = self._get_task_points(checkin_data.daily_task_id)
+
+        # Check if check-in exists for this user/task/date
+        existing = self._get_existing_checkin(user_id, checkin_data)
+        if not existing:
+            raise CheckInNotFound("Check-in not found")
+
+        if existing["count"] > 1:
+            # Decrement count
+            checkin = self.supabase.table("check_ins")\
+                .update({"count": existing["count"] - 1})\
+                .eq("id", existing["id"])\
+                .execute()
+            result = checkin.data[0]
+        else:
+            # Delete the record when count would become 0
+            self.supabase.table("check_ins")\
+                .delete()\
+                .eq("id", existing["id"])\
+                .execute()
+            result = None
+
+        # Subtract points from participant's total (clamped at zero)
+        self._add_points(checkin_data.quest_id, user_id, -points_to_subtract)
+
+        return result
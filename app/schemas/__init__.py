@@ -5,7 +5,8 @@ from .user import (
     UserResponse,
     Token,
     TokenData,
-    RefreshTokenRequest
+    RefreshTokenRequest,
+    AccountDeletionJob
 )
 from .quest import (
     DailyTaskBase,
@@ -14,6 +15,7 @@ from .quest import (
     QuestBase,
     QuestCreate,
     QuestResponse,
+    QuestSummary,
     QuestJoinRequest,
     QuestParticipantResponse,
     ParticipantUserResponse
@@ -21,7 +23,8 @@ from .quest import (
 from .checkin import (
     CheckInCreate,
     CheckInResponse,
-    CheckInStats
+    CheckInStats,
+    CheckInAnalytics
 )
 
 __all__ = [
@@ -32,16 +35,19 @@ __all__ = [
     "Token",
     "TokenData",
     "RefreshTokenRequest",
+    "AccountDeletionJob",
     "DailyTaskBase",
     "DailyTaskCreate",
     "DailyTaskResponse",
     "QuestBase",
     "QuestCreate",
     "QuestResponse",
+    "QuestSummary",
     "QuestJoinRequest",
     "QuestParticipantResponse",
     "ParticipantUserResponse",
     "CheckInCreate",
     "CheckInResponse",
     "CheckInStats",
+    "CheckInAnalytics",
 ]
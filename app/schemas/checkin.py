@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from typing import List, Optional
 from datetime import date, datetime
 
 
@@ -24,6 +24,40 @@ class CheckInResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class TaskCompletion(BaseModel):
+    daily_task_id: str
+    title: str
+    points: int
+    days_completed: int
+    check_ins: int
+    # days_completed / days in the range
+    completion_rate: float
+
+
+class WeekdayCheckIns(BaseModel):
+    # ISO day of week, 1 = Monday
+    day_of_week: int
+    check_ins: int
+
+
+class WeekCheckIns(BaseModel):
+    # Monday of the week
+    week_start: date
+    check_ins: int
+
+
+class CheckInAnalytics(BaseModel):
+    quest_id: str
+    user_id: str
+    from_date: date
+    to_date: date
+    days: int
+    tasks: List[TaskCompletion]
+    weekdays: List[WeekdayCheckIns]
+    weeks: List[WeekCheckIns]
+    best_day_of_week: Optional[int] = None
+
+
 class CheckInStats(BaseModel):
     quest_id: str
     user_id: str
@@ -56,6 +56,17 @@ class QuestResponse(QuestBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class QuestSummary(QuestBase):
+    """A quest card for the home screen (GET /quests?view=summary)"""
+    id: str
+    last_activity_at: datetime
+    participant_count: int
+    total_points: int = 0  # the current user's
+    top_participants: List[ParticipantUserResponse] = []  # highest total_points first, at most three
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 class QuestJoinRequest(BaseModel):
     share_code: str
 
@@ -31,6 +31,18 @@ class UserResponse(UserBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class AccountDeletionJob(BaseModel):
+    id: str
+    status: Literal["pending", "running", "completed", "failed"]
+    stage: Literal["check_ins", "participations", "quests", "auth_user", "done"]
+    deleted_check_ins: int
+    deleted_participations: int
+    deleted_quests: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
 class Token(BaseModel):
     access_token: str
     refresh_token: str
@@ -0,0 +1,269 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+
+from app.core.concurrency import run_sync
+from app.core.config import settings
+from app.core.connection_manager import manager as connection_manager
+from app.core.logging import logger
+from app.core.metrics import registry
+from app.core.response_cache import quest_cache
+from app.core.share_codes import share_code_index
+from app.core.supabase import get_supabase_client
+from app.services.quest_snapshots import quest_snapshots
+
+# Stages in the order they run; a resumed job starts at the stage it recorded
+STAGES = ("check_ins", "participations", "quests", "auth_user", "done")
+_ACTIVE = ("pending", "running")
+
+account_deletions = registry.counter(
+    "account_deletions_total",
+    "Background account deletion jobs by outcome",
+    ("outcome",),
+)
+account_deletion_rows = registry.counter(
+    "account_deletion_rows_total",
+    "Rows removed by account deletion jobs",
+    ("table",),
+)
+
+
+class AccountDeletionJobs:
+    """Deletes accounts in the background, in bounded batches, with progress in account_deletion_jobs.
+
+    Each stage deletes up to ACCOUNT_DELETION_BATCH_SIZE rows per statement
+    (ACCOUNT_DELETION_QUEST_BATCH_SIZE for quests, whose deletes cascade) and
+    records its counts after every batch, which doubles as the job's
+    heartbeat. Every step is a delete, so running one again is harmless:
+    jobs interrupted by a shutdown are put back to pending, and jobs whose
+    worker died are picked up by any worker's sweep once their heartbeat is
+    ACCOUNT_DELETION_STALE_SECONDS old. A conditional update on updated_at
+    makes sure only one worker claims a job. Rows written while a job runs
+    go with the auth user at the end, through the foreign key cascades.
+    """
+
+    def __init__(self):
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    async def start(self, user_id: str) -> dict:
+        """Start deleting `user_id`, or return the job already doing so."""
+        from postgrest.exceptions import APIError
+
+        supabase = get_supabase_client()
+        job = await self._active_job(user_id)
+        if job is None:
+            try:
+                job = (await run_sync(
+                    supabase.table("account_deletion_jobs").insert({"user_id": user_id}).execute
+                )).data[0]
+            except APIError as e:
+                # A concurrent request won the one active job per user (unique index)
+                if e.code != "23505":
+                    raise
+                job = await self._active_job(user_id)
+                if job is None:
+                    raise
+            else:
+                self._spawn(job)
+        if job["status"] == "pending":
+            job = await self._claim(job) or job
+        # Cut the user off right away; the data goes in the background
+        quest_cache.invalidate_user(user_id)
+        await connection_manager.close_user(user_id)
+        return job
+
+    async def _active_job(self, user_id: str) -> Optional[dict]:
+        supabase = get_supabase_client()
+        existing = await run_sync(
+            supabase.table("account_deletion_jobs").select("*")
+            .eq("user_id", user_id).in_("status", list(_ACTIVE)).limit(1).execute
+        )
+        return existing.data[0] if existing.data else None
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        supabase = get_supabase_client()
+        result = await run_sync(
+            supabase.table("account_deletion_jobs").select("*").eq("id", job_id).limit(1).execute
+        )
+        return result.data[0] if result.data else None
+
+    def start_sweeper(self):
+        if self._sweeper is None:
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_forever())
+
+    async def stop(self):
+        """Stop the sweeper and hand running jobs back as pending for the next worker."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _sweep_forever(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.warning("Account deletion sweep failed: %s", e)
+            await asyncio.sleep(settings.ACCOUNT_DELETION_SWEEP_SECONDS)
+
+    async def sweep(self):
+        """Claim pending jobs and running jobs whose worker stopped reporting progress."""
+        supabase = get_supabase_client()
+        stale_before = datetime.now(timezone.utc) - timedelta(seconds=settings.ACCOUNT_DELETION_STALE_SECONDS)
+        pending, stale = await asyncio.gather(
+            run_sync(supabase.table("account_deletion_jobs").select("*").eq("status", "pending").execute),
+            run_sync(
+                supabase.table("account_deletion_jobs").select("*")
+                .eq("status", "running").lt("updated_at", stale_before.isoformat()).execute
+            ),
+        )
+        for job in pending.data + stale.data:
+            if job["id"] not in self._tasks:
+                await self._claim(job)
+
+    async def _claim(self, job: dict) -> Optional[dict]:
+        """Take over `job` unless another worker updated it since it was read."""
+        supabase = get_supabase_client()
+        claimed = await run_sync(
+            supabase.table("account_deletion_jobs")
+            .update({"status": "running", "attempts": job["attempts"] + 1})
+            .eq("id", job["id"]).eq("updated_at", job["updated_at"]).execute
+        )
+        if not claimed.data:
+            return None
+        logger.info("Resuming account deletion: job_id=%s, stage=%s", job["id"], job["stage"])
+        self._spawn(claimed.data[0])
+        return claimed.data[0]
+
+    def _spawn(self, job: dict):
+        task = asyncio.get_running_loop().create_task(self._run(job))
+        self._tasks[job["id"]] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job["id"], None))
+
+    async def _run(self, job: dict):
+        supabase = get_supabase_client()
+        user_id = job["user_id"]
+        try:
+            for stage in STAGES[STAGES.index(job["stage"]):-1]:
+                if stage != job["stage"]:
+                    job = await self._update(job, stage=stage)
+                await getattr(self, f"_delete_{stage}")(job)
+            job = await self._update(job, status="completed", stage="done", error=None)
+            account_deletions.inc("completed")
+            logger.info(
+                "Account deleted: user_id=%s, job_id=%s, check_ins=%d, participations=%d, quests=%d",
+                user_id, job["id"], job["deleted_check_ins"], job["deleted_participations"], job["deleted_quests"],
+            )
+        except asyncio.CancelledError:
+            # Shutting down: leave the job for the next worker to pick up straight away
+            try:
+                await asyncio.shield(run_sync(
+                    supabase.table("account_deletion_jobs").update({"status": "pending"}).eq("id", job["id"]).execute
+                ))
+            except Exception as e:
+                # Still running with a stale heartbeat, so a sweep takes it over later
+                logger.warning("Could not hand back account deletion job_id=%s: %s", job["id"], e)
+            raise
+        except Exception as e:
+            failed = job["attempts"] >= settings.ACCOUNT_DELETION_MAX_ATTEMPTS
+            logger.error(
+                "Account deletion failed: user_id=%s, job_id=%s, stage=%s, attempt=%d: %s",
+                user_id, job["id"], job["stage"], job["attempts"], e,
+            )
+            account_deletions.inc("failed" if failed else "retried")
+            try:
+                # Pending jobs are retried by the next sweep
+                await self._update(job, status="failed" if failed else "pending", error=str(e))
+            except Exception as update_error:
+                logger.warning("Could not record account deletion failure for job_id=%s: %s", job["id"], update_error)
+        finally:
+            quest_cache.invalidate_user(user_id)
+
+    async def _update(self, job: dict, **changes) -> dict:
+        supabase = get_supabase_client()
+        result = await run_sync(
+            supabase.table("account_deletion_jobs").update(changes).eq("id", job["id"]).execute
+        )
+        return result.data[0]
+
+    async def _delete_check_ins(self, job: dict):
+        supabase = get_supabase_client()
+        while True:
+            batch = await run_sync(
+                supabase.table("check_ins").select("id")
+                .eq("user_id", job["user_id"]).limit(settings.ACCOUNT_DELETION_BATCH_SIZE).execute
+            )
+            if not batch.data:
+                return
+            await run_sync(
+                supabase.table("check_ins").delete().in_("id", [row["id"] for row in batch.data]).execute
+            )
+            account_deletion_rows.inc("check_ins", amount=len(batch.data))
+            job.update(await self._update(job, deleted_check_ins=job["deleted_check_ins"] + len(batch.data)))
+
+    async def _delete_participations(self, job: dict):
+        supabase = get_supabase_client()
+        while True:
+            batch = await run_sync(
+                supabase.table("quest_participants").select("quest_id")
+                .eq("user_id", job["user_id"]).limit(settings.ACCOUNT_DELETION_BATCH_SIZE).execute
+            )
+            if not batch.data:
+                return
+            quest_ids = [row["quest_id"] for row in batch.data]
+            # Before the rows go, so an interrupted batch is found and rewritten again
+            await quest_snapshots.remove_participant(quest_ids, job["user_id"])
+            await run_sync(
+                supabase.table("quest_participants").delete()
+                .eq("user_id", job["user_id"]).in_("quest_id", quest_ids).execute
+            )
+            for quest_id in quest_ids:
+                quest_cache.invalidate(quest_id)
+            account_deletion_rows.inc("quest_participants", amount=len(quest_ids))
+            job.update(await self._update(job, deleted_participations=job["deleted_participations"] + len(quest_ids)))
+
+    async def _delete_quests(self, job: dict):
+        supabase = get_supabase_client()
+        while True:
+            batch = await run_sync(
+                supabase.table("quests").select("id, share_code")
+                .eq("creator_id", job["user_id"]).limit(settings.ACCOUNT_DELETION_QUEST_BATCH_SIZE).execute
+            )
+            if not batch.data:
+                return
+            # Cascades to the quests' tasks, participants and check-ins
+            await run_sync(
+                supabase.table("quests").delete().in_("id", [row["id"] for row in batch.data]).execute
+            )
+            for quest in batch.data:
+                quest_cache.invalidate(quest["id"])
+                quest_snapshots.evict(quest["id"])
+                share_code_index.discard(quest["share_code"])
+                await connection_manager.close_quest(quest["id"])
+            account_deletion_rows.inc("quests", amount=len(batch.data))
+            job.update(await self._update(job, deleted_quests=job["deleted_quests"] + len(batch.data)))
+
+    async def _delete_auth_user(self, job: dict):
+        from supabase_auth.errors import AuthApiError
+
+        supabase = get_supabase_client()
+        try:
+            await run_sync(supabase.auth.admin.delete_user, job["user_id"])
+        except AuthApiError as e:
+            # Already gone: an earlier attempt got this far before it was interrupted
+            if e.status != 404:
+                raise
+
+
+account_deletion_jobs = AccountDeletionJobs()
+
+registry.gauge("account_deletion_jobs_running", "Account deletion jobs running in this worker", fn=lambda: len(account_deletion_jobs))
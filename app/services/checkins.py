@@ -0,0 +1,140 @@
+from collections import OrderedDict
+from datetime import date, timedelta
+from fastapi import HTTPException, status
+from typing import Iterable, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.connection_manager import manager as connection_manager
+from app.core.response_cache import analytics_cache, quest_cache
+from app.repositories import CheckInNotFound, Repository
+from app.schemas import CheckInCreate
+
+# Quest end dates remembered per worker; they never change once a quest is created
+_END_DATE_CACHE_SIZE = 10000
+_end_dates: OrderedDict[str, date] = OrderedDict()
+
+
+def checkin_streaks(checkin_dates: Iterable[date], today: date) -> Tuple[int, int]:
+    """(current_streak, longest_streak) over check-in dates in ascending order."""
+    current_streak = 0
+    longest_streak = 0
+    temp_streak = 0
+    last_date = None
+
+    for checkin_date in checkin_dates:
+        if last_date is None:
+            temp_streak = 1
+        elif (checkin_date - last_date).days == 1:
+            temp_streak += 1
+        else:
+            temp_streak = 1
+
+        longest_streak = max(longest_streak, temp_streak)
+        last_date = checkin_date
+
+    # Check current streak
+    if last_date is not None and (last_date == today or last_date == today - timedelta(days=1)):
+        current_streak = temp_streak
+
+    return current_streak, longest_streak
+
+
+def archive_cutoff() -> date:
+    """Quests that ended before this date are archived and closed to check-ins."""
+    return date.today() - timedelta(days=settings.QUEST_ARCHIVE_GRACE_DAYS)
+
+
+async def _check_open(repo: Repository, quest_id: str):
+    """Raise 409 for a quest that is archived or due to be; its snapshot would never show the write."""
+    end_date = _end_dates.get(quest_id)
+    if end_date is None:
+        quest = await repo.get_quest(quest_id)
+        if quest is None:
+            return
+        end_date = quest["end_date"]
+        if isinstance(end_date, str):
+            end_date = date.fromisoformat(end_date)
+        if quest.get("archived_at"):
+            end_date = date.min
+        _end_dates[quest_id] = end_date
+        if len(_end_dates) > _END_DATE_CACHE_SIZE:
+            _end_dates.popitem(last=False)
+    else:
+        _end_dates.move_to_end(quest_id)
+    if end_date < archive_cutoff():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Quest has ended"
+        )
+
+
+async def _get_participant(repo: Repository, quest_id: str, user_id: str) -> dict:
+    """Return the participant row or raise 403 if the user is not in the quest."""
+    participant = await repo.get_participant(quest_id, user_id)
+    if participant is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not a participant of this quest"
+        )
+    return participant
+
+
+async def increment_checkin(
+    repo: Repository,
+    user_id: str,
+    checkin_data: CheckInCreate,
+    exclude_user_id: Optional[str] = None,
+) -> dict:
+    """Increment check-in count. Creates new record if not exists, otherwise increments count.
+
+    The scoreboard update is broadcast to the quest's sockets, skipping
+    ``exclude_user_id`` when the caller delivers the result itself.
+    """
+    logger.info("Checkin increment: user_id=%s, quest=%s, task=%s, date=%s",
+                user_id, checkin_data.quest_id, checkin_data.daily_task_id, checkin_data.check_in_date)
+
+    participant = await _get_participant(repo, checkin_data.quest_id, user_id)
+    await _check_open(repo, checkin_data.quest_id)
+    checkin = await repo.increment_checkin(participant, checkin_data)
+
+    quest_cache.invalidate(checkin_data.quest_id)
+    analytics_cache.invalidate(checkin_data.quest_id, user_id)
+    await connection_manager.broadcast(
+        checkin_data.quest_id,
+        {"type": "scoreboard_update", "quest_id": checkin_data.quest_id},
+        exclude_user_id=exclude_user_id,
+    )
+
+    return checkin
+
+
+async def decrement_checkin(
+    repo: Repository,
+    user_id: str,
+    checkin_data: CheckInCreate,
+    exclude_user_id: Optional[str] = None,
+) -> Optional[dict]:
+    """Decrement check-in count. If count becomes 0, deletes the record. Returns None if deleted."""
+    logger.info("Checkin decrement: user_id=%s, quest=%s, task=%s, date=%s",
+                user_id, checkin_data.quest_id, checkin_data.daily_task_id, checkin_data.check_in_date)
+
+    participant = await _get_participant(repo, checkin_data.quest_id, user_id)
+    await _check_open(repo, checkin_data.quest_id)
+    try:
+        result = await repo.decrement_checkin(participant, checkin_data)
+    except CheckInNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Check-in not found"
+        )
+
+    quest_cache.invalidate(checkin_data.quest_id)
+    analytics_cache.invalidate(checkin_data.quest_id, user_id)
+    await connection_manager.broadcast(
+        checkin_data.quest_id,
+        {"type": "scoreboard_update", "quest_id": checkin_data.quest_id},
+        exclude_user_id=exclude_user_id,
+    )
+
+    return result
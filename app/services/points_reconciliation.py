@@ -0,0 +1,155 @@
+"""Recompute quest_participants.total_points from check-ins and correct drift.
+
+total_points is kept up to date by an in-place add in the check-in
+handlers (the add_participant_points RPC, or the UPDATE in the Postgres
+repository), clamped at zero on decrement. It can still disagree with
+sum(count x points) over the participant's check-ins: the check-in row and
+the total are separate writes, task points can be edited afterwards, and
+the clamp loses points that were already missing. This job walks quests
+in id order, BATCH at a time: the points_drift RPC aggregates a whole batch in
+one set-based query and returns only the participants that disagree, and
+apply_points_corrections fixes them in one UPDATE that skips rows changed in
+the meantime.
+
+    python -m app.services.points_reconciliation [--dry-run] [--processes 4] [--batch-size 200]
+
+With --processes N the quest id space is split into N ranges, each handled
+by its own process. POST /admin/reconcile/points runs it inside a worker and
+records the drift metrics.
+"""
+import argparse
+import asyncio
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from app.core.concurrency import run_sync
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.metrics import registry
+from app.core.response_cache import quest_cache
+from app.core.supabase import get_supabase_client
+
+# Drifted participants kept in a report, for eyeballing; the counts cover all of them
+_REPORT_SAMPLE = 20
+
+points_drift_participants = registry.gauge(
+    "points_drift_participants",
+    "Participants whose total_points disagreed with their check-ins in the last reconciliation",
+)
+points_drift_points = registry.gauge(
+    "points_drift_points",
+    "Sum of |total_points - recomputed points| over drifted participants in the last reconciliation",
+)
+points_corrections = registry.counter(
+    "points_corrections_total",
+    "total_points values corrected by reconciliation",
+)
+points_reconciliations = registry.counter(
+    "points_reconciliations_total",
+    "Points reconciliation runs",
+    ("mode",),
+)
+
+
+def shard_bounds(shard: int, shards: int) -> tuple[str, Optional[str]]:
+    """The [lower, upper) quest id range of `shard` out of `shards` equal slices of the UUID space."""
+    lower = str(uuid.UUID(int=shard * 2**128 // shards))
+    upper = str(uuid.UUID(int=(shard + 1) * 2**128 // shards)) if shard + 1 < shards else None
+    return lower, upper
+
+
+def _quest_ids_page(lower: str, upper: Optional[str], after: Optional[str], limit: int) -> list[str]:
+    query = get_supabase_client().table("quests").select("id")
+    query = query.gt("id", after) if after is not None else query.gte("id", lower)
+    if upper is not None:
+        query = query.lt("id", upper)
+    return [row["id"] for row in query.order("id").limit(limit).execute().data]
+
+
+async def reconcile_points(
+    dry_run: bool = False,
+    shard: int = 0,
+    shards: int = 1,
+    batch_size: Optional[int] = None,
+) -> dict:
+    """Reconcile the quests in `shard` and return a report (counts plus a sample of drifted rows)."""
+    batch_size = batch_size or settings.POINTS_RECONCILE_BATCH_SIZE
+    supabase = get_supabase_client()
+    lower, upper = shard_bounds(shard, shards)
+    report = {"dry_run": dry_run, "quests": 0, "drifted": 0, "drift_points": 0, "corrected": 0, "sample": []}
+    after = None
+    while True:
+        quest_ids = await run_sync(_quest_ids_page, lower, upper, after, batch_size)
+        if not quest_ids:
+            break
+        after = quest_ids[-1]
+        report["quests"] += len(quest_ids)
+
+        drift = (await run_sync(supabase.rpc("points_drift", {"p_quest_ids": quest_ids}).execute)).data
+        if not drift:
+            continue
+        report["drifted"] += len(drift)
+        report["drift_points"] += sum(abs(row["expected"] - row["stored"]) for row in drift)
+        report["sample"].extend(drift[:_REPORT_SAMPLE - len(report["sample"])])
+        if dry_run:
+            continue
+
+        corrected = (await run_sync(supabase.rpc("apply_points_corrections", {"p_corrections": drift}).execute)).data
+        report["corrected"] += corrected
+        for quest_id in {row["quest_id"] for row in drift}:
+            quest_cache.invalidate(quest_id)
+
+    logger.info(
+        "Points reconciliation%s (shard %d/%d): %d quests, %d drifted participants (%d points), %d corrected",
+        " dry run" if dry_run else "", shard + 1, shards,
+        report["quests"], report["drifted"], report["drift_points"], report["corrected"],
+    )
+    return report
+
+
+def record_report(report: dict):
+    """Publish a finished run's drift in this process's metrics."""
+    points_reconciliations.inc("dry_run" if report["dry_run"] else "apply")
+    points_drift_participants.set(report["drifted"])
+    points_drift_points.set(report["drift_points"])
+    points_corrections.inc(amount=report["corrected"])
+
+
+def merge_reports(reports: list[dict]) -> dict:
+    merged = {"dry_run": reports[0]["dry_run"], "quests": 0, "drifted": 0, "drift_points": 0, "corrected": 0, "sample": []}
+    for report in reports:
+        for key in ("quests", "drifted", "drift_points", "corrected"):
+            merged[key] += report[key]
+        merged["sample"].extend(report["sample"])
+    merged["sample"] = merged["sample"][:_REPORT_SAMPLE]
+    return merged
+
+
+def _run_shard(dry_run: bool, shard: int, shards: int, batch_size: Optional[int]) -> dict:
+    return asyncio.run(reconcile_points(dry_run, shard, shards, batch_size))
+
+
+def main(args: argparse.Namespace) -> dict:
+    if args.processes == 1:
+        return _run_shard(args.dry_run, 0, 1, args.batch_size)
+    with ProcessPoolExecutor(max_workers=args.processes) as pool:
+        futures = [
+            pool.submit(_run_shard, args.dry_run, shard, args.processes, args.batch_size)
+            for shard in range(args.processes)
+        ]
+        return merge_reports([future.result() for future in futures])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="report drift without correcting it")
+    parser.add_argument("--processes", type=int, default=1, help="split the quests across this many processes")
+    parser.add_argument("--batch-size", type=int, default=None, help="quests per query (POINTS_RECONCILE_BATCH_SIZE)")
+    report = main(parser.parse_args())
+    print(
+        f"{'Dry run: ' if report['dry_run'] else ''}{report['quests']} quests, "
+        f"{report['drifted']} drifted participants ({report['drift_points']} points), {report['corrected']} corrected"
+    )
+    for row in report["sample"]:
+        print(f"  quest {row['quest_id']} user {row['user_id']}: {row['stored']} -> {row['expected']}")
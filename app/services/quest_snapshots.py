@@ -0,0 +1,328 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import Response, status
+
+from app.core.concurrency import run_sync
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.metrics import registry
+from app.core.response_cache import quest_cache
+from app.core.responses import encode_response
+from app.core.singleflight import upstream_reads
+from app.core.supabase import get_supabase_client
+from app.repositories import get_repository
+from app.schemas import CheckInResponse, CheckInStats, QuestResponse
+from app.services.checkins import archive_cutoff, checkin_streaks
+
+# Rows per PostgREST page when reading a quest's check-ins
+_PAGE_SIZE = 1000
+
+quests_archived = registry.counter(
+    "quests_archived_total",
+    "Finished quests frozen into a snapshot",
+)
+snapshot_reads = registry.counter(
+    "quest_snapshot_reads_total",
+    "Reads of finished quests served from a snapshot",
+    ("endpoint",),
+)
+
+
+class QuestSnapshot:
+    """A loaded quest_snapshots row, with the quest body pre-encoded."""
+
+    def __init__(self, row: dict):
+        self.quest: dict = row["quest"]
+        self.stats: Dict[str, dict] = row["stats"]
+        self.calendar: Dict[str, List[dict]] = row["calendar"]
+        self.quest_body = encode_response(self.quest, QuestResponse)
+
+
+def snapshot_response(body: bytes, if_none_match: Optional[str]) -> Response:
+    """A response for archived data: revalidated by ETag, with 304 when it still matches."""
+    etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+    max_age = settings.QUEST_SNAPSHOT_MAX_AGE
+    headers = {
+        "Cache-Control": f"private, max-age={max_age}" if max_age > 0 else "private, no-cache",
+        "ETag": etag,
+    }
+    if if_none_match is not None and etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+class QuestSnapshots:
+    """Archives finished quests and serves their snapshots.
+
+    Once a quest ended more than QUEST_ARCHIVE_GRACE_DAYS ago (the grace
+    covers participants in later timezones), a sweep stores its final
+    state in quest_snapshots and sets quests.archived_at. Snapshots never
+    change, so each worker keeps up to QUEST_SNAPSHOT_CACHE_SIZE of them in
+    memory; quests known to have none are remembered for
+    QUEST_SNAPSHOT_MISS_TTL_SECONDS so live quests do not pay a lookup
+    per read. The one exception is a participant who leaves or deletes their
+    account: remove_participant rewrites the snapshots they appear in, and
+    every worker's sync drops its copy within QUEST_SNAPSHOT_SYNC_SECONDS.
+    """
+
+    def __init__(self, max_entries: int, miss_ttl: float):
+        self.max_entries = max_entries
+        self.miss_ttl = miss_ttl
+        # {quest_id: QuestSnapshot}, least recently used first
+        self._snapshots: OrderedDict[str, QuestSnapshot] = OrderedDict()
+        # {quest_id: monotonic time until which the quest is taken to have no snapshot}
+        self._missing: Dict[str, float] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+        self._syncer: Optional[asyncio.Task] = None
+        # Latest quest_snapshots.updated_at seen, kept as the database's string for the next query
+        self._revised_at: Optional[str] = None
+        self._revised_at_parsed: Optional[datetime] = None
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
+
+    def cached(self, quest_id: str) -> Optional[QuestSnapshot]:
+        snapshot = self._snapshots.get(quest_id)
+        if snapshot is not None:
+            self._snapshots.move_to_end(quest_id)
+        return snapshot
+
+    def note_quest(self, quest: dict):
+        """Record what a freshly read quest row says about its snapshot."""
+        if quest.get("archived_at") is None:
+            self._mark_missing(quest["id"])
+
+    async def get(self, quest_id: str) -> Optional[QuestSnapshot]:
+        """The quest's snapshot, or None while it is not archived."""
+        snapshot = self.cached(quest_id)
+        if snapshot is not None:
+            return snapshot
+        if self._missing.get(quest_id, 0.0) > time.monotonic():
+            return None
+        found = await upstream_reads.do(("quest_snapshot", quest_id), lambda: self._fetch([quest_id]))
+        return found.get(quest_id)
+
+    async def get_many(self, quest_ids: Iterable[str]) -> Dict[str, QuestSnapshot]:
+        """Snapshots of archived quests, fetching the ones not in memory in one query."""
+        found, missing = {}, []
+        for quest_id in quest_ids:
+            snapshot = self.cached(quest_id)
+            if snapshot is not None:
+                found[quest_id] = snapshot
+            else:
+                missing.append(quest_id)
+        if missing:
+            found.update(await self._fetch(missing))
+        return found
+
+    async def _fetch(self, quest_ids: List[str]) -> Dict[str, QuestSnapshot]:
+        supabase = get_supabase_client()
+        rows = (await run_sync(
+            supabase.table("quest_snapshots").select("quest_id, quest, stats, calendar")
+            .in_("quest_id", quest_ids).execute
+        )).data
+        found = {row["quest_id"]: QuestSnapshot(row) for row in rows}
+        for quest_id in quest_ids:
+            if quest_id in found:
+                self._store(quest_id, found[quest_id])
+            else:
+                self._mark_missing(quest_id)
+        return found
+
+    def evict(self, quest_id: str):
+        """Forget what this worker knows about the quest's snapshot."""
+        self._snapshots.pop(quest_id, None)
+        self._missing.pop(quest_id, None)
+
+    def _store(self, quest_id: str, snapshot: QuestSnapshot):
+        self._missing.pop(quest_id, None)
+        self._snapshots[quest_id] = snapshot
+        self._snapshots.move_to_end(quest_id)
+        while len(self._snapshots) > self.max_entries:
+            self._snapshots.popitem(last=False)
+
+    def _mark_missing(self, quest_id: str):
+        now = time.monotonic()
+        if len(self._missing) >= self.max_entries:
+            self._missing = {k: v for k, v in self._missing.items() if v > now}
+        self._missing[quest_id] = now + self.miss_ttl
+
+    async def archive(self, quest_id: str) -> bool:
+        """Freeze a finished quest into quest_snapshots; False if the quest no longer exists."""
+        supabase = get_supabase_client()
+        repo = get_repository(supabase)
+        quest = await repo.get_quest(quest_id)
+        if quest is None:
+            return False
+        quest["participants"] = await repo.load_quest_participants(quest_id)
+        checkins = await run_sync(self._fetch_checkins, quest_id)
+
+        today = date.today()
+        stats, calendar = {}, {}
+        for participant in quest["participants"]:
+            user_id = participant["user_id"]
+            rows = checkins.get(user_id, [])
+            current_streak, longest_streak = checkin_streaks(
+                (date.fromisoformat(c["check_in_date"]) for c in rows), today
+            )
+            stats[user_id] = CheckInStats(
+                quest_id=quest_id,
+                user_id=user_id,
+                total_check_ins=sum(c.get("count", 1) for c in rows),
+                total_points=participant["total_points"],
+                current_streak=current_streak,
+                longest_streak=longest_streak,
+            ).model_dump(mode="json")
+            # Newest first, like GET /checkins/quest/{quest_id}
+            calendar[user_id] = [
+                CheckInResponse.model_validate(c).model_dump(mode="json") for c in reversed(rows)
+            ]
+
+        row = {
+            "quest_id": quest_id,
+            "quest": QuestResponse.model_validate(quest).model_dump(mode="json"),
+            "stats": stats,
+            "calendar": calendar,
+        }
+        await run_sync(supabase.table("quest_snapshots").upsert(row, on_conflict="quest_id").execute)
+        await run_sync(
+            supabase.table("quests").update({"archived_at": datetime.now(timezone.utc).isoformat()})
+            .eq("id", quest_id).execute
+        )
+        self._store(quest_id, QuestSnapshot(row))
+        quest_cache.invalidate(quest_id)
+        quests_archived.inc()
+        logger.info("Quest archived: quest_id=%s, participants=%d", quest_id, len(stats))
+        return True
+
+    async def remove_participant(self, quest_ids: List[str], user_id: str):
+        """Take a departed or deleted user off the quests' snapshots: leaderboard entry, stats and calendar."""
+        if not quest_ids:
+            return
+        supabase = get_supabase_client()
+        rows = (await run_sync(
+            supabase.table("quest_snapshots").select("quest_id, quest, stats, calendar")
+            .in_("quest_id", quest_ids).execute
+        )).data
+        for row in rows:
+            participants = row["quest"].get("participants", [])
+            if user_id not in row["stats"] and not any(p["user_id"] == user_id for p in participants):
+                continue
+            row["quest"]["participants"] = [p for p in participants if p["user_id"] != user_id]
+            row["stats"].pop(user_id, None)
+            row["calendar"].pop(user_id, None)
+            await run_sync(
+                supabase.table("quest_snapshots")
+                .update({"quest": row["quest"], "stats": row["stats"], "calendar": row["calendar"]})
+                .eq("quest_id", row["quest_id"]).execute
+            )
+            logger.info("Removed user_id=%s from the snapshot of quest_id=%s", user_id, row["quest_id"])
+        for quest_id in quest_ids:
+            self.evict(quest_id)
+            quest_cache.invalidate(quest_id)
+
+    async def sync(self):
+        """Evict snapshots revised (or created) by any worker since the last sync."""
+        supabase = get_supabase_client()
+        if self._revised_at is None:
+            # Nothing is in memory before the first sync, so only later revisions matter
+            self._revised_at_parsed = datetime.now(timezone.utc)
+            self._revised_at = self._revised_at_parsed.isoformat()
+            return
+        rows = (await run_sync(
+            supabase.table("quest_snapshots").select("quest_id, updated_at")
+            .gt("updated_at", self._revised_at)
+            .order("updated_at").execute
+        )).data
+        for row in rows:
+            self.evict(row["quest_id"])
+            updated_at = datetime.fromisoformat(row["updated_at"])
+            if updated_at > self._revised_at_parsed:
+                self._revised_at, self._revised_at_parsed = row["updated_at"], updated_at
+
+    def _fetch_checkins(self, quest_id: str) -> Dict[str, List[dict]]:
+        """The quest's check-ins by user, oldest first."""
+        supabase = get_supabase_client()
+        by_user: Dict[str, List[dict]] = {}
+        offset = 0
+        while True:
+            page = supabase.table("check_ins").select("*")\
+                .eq("quest_id", quest_id)\
+                .order("check_in_date")\
+                .order("id")\
+                .range(offset, offset + _PAGE_SIZE - 1)\
+                .execute()
+            for row in page.data:
+                by_user.setdefault(row["user_id"], []).append(row)
+            if len(page.data) < _PAGE_SIZE:
+                return by_user
+            offset += _PAGE_SIZE
+
+    async def sweep(self) -> int:
+        """Archive every quest that ended before the grace period; returns how many were archived."""
+        supabase = get_supabase_client()
+        cutoff = archive_cutoff()
+        archived = 0
+        while True:
+            quests = (await run_sync(
+                supabase.table("quests").select("id")
+                .lt("end_date", cutoff.isoformat())
+                .is_("archived_at", "null")
+                .order("end_date")
+                .limit(settings.QUEST_ARCHIVE_BATCH_SIZE).execute
+            )).data
+            if not quests:
+                return archived
+            progressed = False
+            for quest in quests:
+                try:
+                    await self.archive(quest["id"])
+                except Exception as e:
+                    logger.warning("Archiving quest_id=%s failed: %s", quest["id"], e)
+                    continue
+                archived += 1
+                progressed = True
+            # A batch of failures would come back unchanged; leave them for the next sweep
+            if not progressed:
+                return archived
+
+    def start_sweeper(self):
+        if self._sweeper is None:
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_forever())
+
+    def start_sync(self):
+        if self._syncer is None:
+            self._syncer = asyncio.get_running_loop().create_task(self._sync_forever())
+
+    async def stop(self):
+        tasks = [task for task in (self._sweeper, self._syncer) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._sweeper = self._syncer = None
+
+    async def _sync_forever(self):
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.warning("Quest snapshot sync failed: %s", e)
+            await asyncio.sleep(settings.QUEST_SNAPSHOT_SYNC_SECONDS)
+
+    async def _sweep_forever(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.warning("Quest archive sweep failed: %s", e)
+            await asyncio.sleep(settings.QUEST_ARCHIVE_INTERVAL_SECONDS)
+
+
+quest_snapshots = QuestSnapshots(settings.QUEST_SNAPSHOT_CACHE_SIZE, settings.QUEST_SNAPSHOT_MISS_TTL_SECONDS)
+
+registry.gauge("quest_snapshots_cached", "Finished quest snapshots held in memory", fn=lambda: len(quest_snapshots))
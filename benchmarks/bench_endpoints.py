@@ -0,0 +1,396 @@
+"""Latency, throughput and upstream calls for every HTTP route, against a local Supabase stand-in.
+
+Starts benchmarks.supabase_stub in a subprocess (or uses --stub-url), seeds it
+with users, quests, tasks, participants and check-ins, then sends --requests
+requests per route through the ASGI app at --concurrency. Upstream calls are
+counted by the stand-in, so they include auth lookups and RPCs, and a route
+whose calls grow with the data (e.g. one RPC per participant) stands out.
+
+    python -m benchmarks.bench_endpoints [--requests 200] [--concurrency 10]
+        [--latency-ms 20] [--users 40] [--quests 20] [--participants 8]
+        [--only quests] [--json results.json]
+
+Routes that change data get fixtures prepared before they are timed (fresh
+users to delete, quests to join or leave, refresh tokens to spend). The
+WebSocket and /admin routes are not covered.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+# JWT-shaped placeholders; the stand-in accepts any key
+_STUB_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.c3R1Yg"
+_PASSWORD = "bench-password"
+_AVATAR = {"type": "emoji", "value": "🐶"}
+
+
+@dataclass
+class Seed:
+    """What the stand-in was seeded with, as seen by benchmark clients."""
+    users: list[dict] = field(default_factory=list)  # id, email, access_token, refresh_token
+    quests: list[dict] = field(default_factory=list)  # id, share_code, task_ids
+    memberships: list[tuple[int, int]] = field(default_factory=list)  # (user index, quest index)
+
+
+@dataclass
+class Scenario:
+    route: str
+    send: Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+    # Builds per-request fixtures before timing starts; gets the request count
+    prepare: Optional[Callable[[int], Awaitable[None]]] = None
+
+
+@dataclass
+class Result:
+    route: str
+    requests: int
+    errors: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    throughput: float
+    upstream_per_request: float
+
+
+def _percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub(latency_ms: float, jitter_ms: float) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    process = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.supabase_stub", "--port", str(port),
+        "--latency-ms", str(latency_ms), "--jitter-ms", str(jitter_ms),
+    ])
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"{url}/_stub/stats", timeout=0.5)
+            return process, url
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Supabase stand-in did not start")
+
+
+class StubAdmin:
+    """Talks to the stand-in directly to seed data and read call counts."""
+
+    def __init__(self, url: str):
+        self.http = httpx.AsyncClient(base_url=url, headers={"apikey": _STUB_KEY}, timeout=30)
+
+    async def create_user(self, email: str) -> dict:
+        r = await self.http.post("/auth/v1/admin/users", json={
+            "email": email, "password": _PASSWORD,
+            "user_metadata": {"username": email.split("@")[0], "avatar": _AVATAR},
+        })
+        r.raise_for_status()
+        session = await self.sign_in(email)
+        return {"id": r.json()["id"], "email": email, **session}
+
+    async def sign_in(self, email: str) -> dict:
+        r = await self.http.post("/auth/v1/token", params={"grant_type": "password"},
+                                 json={"email": email, "password": _PASSWORD})
+        r.raise_for_status()
+        return {"access_token": r.json()["access_token"], "refresh_token": r.json()["refresh_token"]}
+
+    async def insert(self, table: str, rows: list[dict]) -> list[dict]:
+        r = await self.http.post(f"/rest/v1/{table}", json=rows)
+        r.raise_for_status()
+        return r.json()
+
+    async def create_quests(self, creators: list[str], tasks: int) -> list[dict]:
+        today = date.today()
+        expires_at = (datetime.now(timezone.utc) + timedelta(days=3)).isoformat()
+        quests = await self.insert("quests", [{
+            "name": f"Bench quest {i}",
+            "description": "Seeded by benchmarks.bench_endpoints",
+            "start_date": (today - timedelta(days=14)).isoformat(),
+            "end_date": (today + timedelta(days=14)).isoformat(),
+            "creator_id": creator,
+            "share_code": uuid.uuid4().hex[:9],
+            "share_code_expires_at": expires_at,
+        } for i, creator in enumerate(creators)])
+        task_rows = await self.insert("daily_tasks", [
+            {"quest_id": q["id"], "title": f"Task {t}", "points": 10 * (t + 1)}
+            for q in quests for t in range(tasks)
+        ])
+        task_ids: dict[str, list[str]] = {}
+        for task in task_rows:
+            task_ids.setdefault(task["quest_id"], []).append(task["id"])
+        return [{"id": q["id"], "share_code": q["share_code"], "task_ids": task_ids[q["id"]]} for q in quests]
+
+    async def calls(self) -> int:
+        return (await self.http.get("/_stub/stats")).json()["total"]
+
+    async def reset_calls(self):
+        await self.http.delete("/_stub/stats")
+
+
+async def seed(stub: StubAdmin, users: int, quests: int, participants: int, run: str) -> Seed:
+    data = Seed()
+    data.users = list(await asyncio.gather(*(
+        stub.create_user(f"bench{i}-{run}@cherries.dev") for i in range(users)
+    )))
+    data.quests = await stub.create_quests([data.users[q % users]["id"] for q in range(quests)], tasks=5)
+
+    members, checkins = [], []
+    for q, quest in enumerate(data.quests):
+        for k in range(min(participants, users)):
+            u = (q * participants + k) % users
+            data.memberships.append((u, q))
+            members.append({"quest_id": quest["id"], "user_id": data.users[u]["id"],
+                            "total_points": 10 * len(quest["task_ids"])})
+            for d in range(7):
+                checkins.append({
+                    "user_id": data.users[u]["id"], "quest_id": quest["id"],
+                    "daily_task_id": quest["task_ids"][d % len(quest["task_ids"])],
+                    "check_in_date": (date.today() - timedelta(days=d)).isoformat(),
+                })
+    await stub.insert("quest_participants", members)
+    await stub.insert("check_ins", checkins)
+    return data
+
+
+def build_scenarios(data: Seed, stub: StubAdmin, prefix: str, run: str) -> list[Scenario]:
+    users, quests, memberships = data.users, data.quests, data.memberships
+
+    def auth(u: int) -> dict:
+        return {"Authorization": f"Bearer {users[u % len(users)]['access_token']}"}
+
+    def member(i: int) -> tuple[int, dict]:
+        u, q = memberships[i % len(memberships)]
+        return u, quests[q]
+
+    # Fixtures filled in by `prepare` hooks
+    fresh_users: list[dict] = []
+    refresh_tokens: list[str] = []
+    join_quests: list[dict] = []
+    leave_quests: list[dict] = []
+
+    async def prepare_fresh_users(n: int):
+        fresh_users[:] = await asyncio.gather(*(
+            stub.create_user(f"doomed{i}-{run}@cherries.dev") for i in range(n)
+        ))
+
+    async def prepare_refresh_tokens(n: int):
+        sessions = await asyncio.gather(*(stub.sign_in(users[i % len(users)]["email"]) for i in range(n)))
+        refresh_tokens[:] = [s["refresh_token"] for s in sessions]
+
+    async def prepare_join(n: int):
+        # Created by another user so the joiner is never already a participant
+        join_quests[:] = await stub.create_quests([users[(i + 1) % len(users)]["id"] for i in range(n)], tasks=5)
+        await stub.insert("quest_participants", [
+            {"quest_id": q["id"], "user_id": users[(i + 1) % len(users)]["id"]} for i, q in enumerate(join_quests)
+        ])
+
+    async def prepare_leave(n: int):
+        leave_quests[:] = await stub.create_quests([users[(i + 1) % len(users)]["id"] for i in range(n)], tasks=5)
+        await stub.insert("quest_participants", [
+            {"quest_id": q["id"], "user_id": users[(i + u) % len(users)]["id"]}
+            for i, q in enumerate(leave_quests) for u in (0, 1)
+        ])
+
+    def checkin_body(i: int) -> tuple[int, dict]:
+        u, quest = member(i)
+        return u, {
+            "quest_id": quest["id"],
+            "daily_task_id": quest["task_ids"][i % len(quest["task_ids"])],
+            "check_in_date": date.today().isoformat(),
+        }
+
+    async def increment(c: httpx.AsyncClient, i: int) -> httpx.Response:
+        u, body = checkin_body(i)
+        return await c.post(f"{prefix}/checkins/increment", json=body, headers=auth(u))
+
+    async def decrement(c: httpx.AsyncClient, i: int) -> httpx.Response:
+        u, body = checkin_body(i)
+        return await c.post(f"{prefix}/checkins/decrement", json=body, headers=auth(u))
+
+    async def create_quest(c: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await c.post(f"{prefix}/quests", headers=auth(i), json={
+            "name": f"Created {i}",
+            "start_date": date.today().isoformat(),
+            "end_date": (date.today() + timedelta(days=30)).isoformat(),
+            "daily_tasks": [{"title": f"Task {t}", "points": 10} for t in range(3)],
+        })
+
+    async def get_quest(c: httpx.AsyncClient, i: int) -> httpx.Response:
+        u, quest = member(i)
+        return await c.get(f"{prefix}/quests/{quest['id']}", headers=auth(u))
+
+    async def list_checkins(c: httpx.AsyncClient, i: int) -> httpx.Response:
+        u, quest = member(i)
+        return await c.get(f"{prefix}/checkins/quest/{quest['id']}", headers=auth(u))
+
+    async def checkin_stats(c: httpx.AsyncClient, i: int) -> httpx.Response:
+        u, quest = member(i)
+        return await c.get(f"{prefix}/checkins/stats/{quest['id']}", headers=auth(u))
+
+    async def checkin_analytics(c: httpx.AsyncClient, i: int) -> httpx.Response:
+        u, quest = member(i)
+        return await c.get(f"{prefix}/checkins/analytics/{quest['id']}", headers=auth(u))
+
+    return [
+        Scenario("POST /auth/register", lambda c, i: c.post(f"{prefix}/auth/register", json={
+            "email": f"new{i}-{run}@cherries.dev", "username": f"new{i}", "password": _PASSWORD,
+        })),
+        Scenario("POST /auth/login", lambda c, i: c.post(f"{prefix}/auth/login", json={
+            "email": users[i % len(users)]["email"], "password": _PASSWORD,
+        })),
+        Scenario("POST /auth/refresh", lambda c, i: c.post(f"{prefix}/auth/refresh", json={
+            "refresh_token": refresh_tokens[i],
+        }), prepare_refresh_tokens),
+        Scenario("POST /auth/logout", lambda c, i: c.post(f"{prefix}/auth/logout", headers=auth(i))),
+        Scenario("GET /profile", lambda c, i: c.get(f"{prefix}/profile", headers=auth(i))),
+        Scenario("PATCH /profile", lambda c, i: c.patch(f"{prefix}/profile", headers=auth(i), json={
+            "username": f"renamed{i}",
+        })),
+        Scenario("POST /quests", create_quest),
+        Scenario("GET /quests", lambda c, i: c.get(f"{prefix}/quests", headers=auth(i))),
+        Scenario("GET /quests?view=summary", lambda c, i: c.get(f"{prefix}/quests", headers=auth(i), params={
+            "view": "summary", "limit": 20,
+        })),
+        Scenario("GET /quests/{quest_id}", get_quest),
+        Scenario("POST /quests/join", lambda c, i: c.post(f"{prefix}/quests/join", headers=auth(i), json={
+            "share_code": join_quests[i]["share_code"],
+        }), prepare_join),
+        Scenario("DELETE /quests/{quest_id}", lambda c, i: c.delete(
+            f"{prefix}/quests/{leave_quests[i]['id']}", headers=auth(i),
+        ), prepare_leave),
+        # Decrement runs right after increment with the same arguments, undoing it
+        Scenario("POST /checkins/increment", increment),
+        Scenario("POST /checkins/decrement", decrement),
+        Scenario("GET /checkins/quest/{quest_id}", list_checkins),
+        Scenario("GET /checkins/stats/{quest_id}", checkin_stats),
+        Scenario("GET /checkins/analytics/{quest_id}", checkin_analytics),
+        Scenario("DELETE /auth/account", lambda c, i: c.delete(f"{prefix}/auth/account", headers={
+            "Authorization": f"Bearer {fresh_users[i]['access_token']}",
+        }), prepare_fresh_users),
+    ]
+
+
+async def run_scenario(client: httpx.AsyncClient, stub: StubAdmin, scenario: Scenario,
+                       requests: int, concurrency: int) -> Result:
+    if scenario.prepare is not None:
+        await scenario.prepare(requests)
+    await stub.reset_calls()
+
+    latencies: list[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await scenario.send(client, i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+                if errors == 1:
+                    print(f"  {scenario.route}: {response.status_code} {response.text[:200]}", file=sys.stderr)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - start
+    upstream = await stub.calls()
+
+    latencies.sort()
+    return Result(
+        route=scenario.route,
+        requests=requests,
+        errors=errors,
+        p50_ms=_percentile(latencies, 50) * 1000,
+        p95_ms=_percentile(latencies, 95) * 1000,
+        p99_ms=_percentile(latencies, 99) * 1000,
+        throughput=requests / wall,
+        upstream_per_request=upstream / requests,
+    )
+
+
+async def main(args: argparse.Namespace):
+    process = None
+    stub_url = args.stub_url
+    if stub_url is None:
+        process, stub_url = start_stub(args.latency_ms, args.jitter_ms)
+
+    # Settings are read when the app is imported, so configure it first
+    os.environ.update({
+        "SUPABASE_URL": stub_url, "SUPABASE_KEY": _STUB_KEY, "SUPABASE_SERVICE_KEY": _STUB_KEY,
+        "DEBUG": "False", "LOG_ACCESS_SAMPLE_RATE": "0",
+        # Every scenario reuses the same few users; measure the routes, not the limits
+        "RATE_LIMIT_ENABLED": "False", "LOAD_SHED_ENABLED": "False",
+    })
+    os.environ.setdefault("SECRET_KEY", "bench")
+    import logging
+
+    from app.core.config import settings
+    from app.main import app
+
+    # Call-budget warnings would fire on every hydrating request
+    logging.getLogger("cherries").setLevel(logging.ERROR)
+
+    stub = StubAdmin(stub_url)
+    run = uuid.uuid4().hex[:6]
+    try:
+        data = await seed(stub, args.users, args.quests, args.participants, run)
+        scenarios = [s for s in build_scenarios(data, stub, settings.API_PREFIX, run)
+                     if not args.only or args.only in s.route]
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            print(f"{args.requests} requests per route, concurrency {args.concurrency}, "
+                  f"upstream latency {args.latency_ms}±{args.jitter_ms}ms, {args.users} users, "
+                  f"{args.quests} quests x {args.participants} participants")
+            print(f"  {'route':<34} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} {'upstream':>9} {'errors':>7}")
+            results = []
+            for scenario in scenarios:
+                result = await run_scenario(client, stub, scenario, args.requests, args.concurrency)
+                results.append(result)
+                print(f"  {result.route:<34} {result.p50_ms:8.1f} {result.p95_ms:8.1f} {result.p99_ms:8.1f} "
+                      f"{result.throughput:8.1f} {result.upstream_per_request:9.1f} {result.errors:7d}")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump([r.__dict__ for r in results], f, indent=2)
+    finally:
+        await stub.http.aclose()
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="stand-in delay per upstream call")
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--quests", type=int, default=20)
+    parser.add_argument("--participants", type=int, default=8, help="participants per quest")
+    parser.add_argument("--only", help="only run routes containing this text")
+    parser.add_argument("--stub-url", help="use a stand-in that is already running")
+    parser.add_argument("--json", help="also write results to this file")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,137 @@
+"""CPU cost per request of the GET /quests response path.
+
+Compares the old path (response_model validation + stdlib JSONResponse) with
+orjson and with SKIP_RESPONSE_VALIDATION on a 50-quest payload. The ASGI app
+is driven directly, so the numbers cover routing, serialization and encoding
+but no sockets.
+
+    python -m benchmarks.bench_serialization [--quests 50] [--requests 2000]
+"""
+import argparse
+import asyncio
+import copy
+import os
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import List
+
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_KEY", "bench")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "bench")
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("DEBUG", "False")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.responses import trusted_response  # noqa: E402
+from app.schemas import QuestResponse  # noqa: E402
+
+
+def make_payload(quests: int, tasks: int = 5, participants: int = 8) -> list:
+    """Rows shaped like get_user_quests output (strings straight from PostgREST)."""
+    now = datetime.now(timezone.utc)
+    rows = []
+    for q in range(quests):
+        quest_id = str(uuid.uuid4())
+        rows.append({
+            "id": quest_id,
+            "name": f"Quest {q}",
+            "description": "Daily habits for the whole family",
+            "start_date": date.today().isoformat(),
+            "end_date": (date.today() + timedelta(days=30)).isoformat(),
+            "creator_id": str(uuid.uuid4()),
+            "share_code": f"{q:09d}",
+            "share_code_expires_at": (now + timedelta(days=3)).isoformat(),
+            "created_at": now.isoformat(),
+            "updated_at": now.isoformat(),
+            "daily_tasks": [{
+                "id": str(uuid.uuid4()),
+                "quest_id": quest_id,
+                "title": f"Task {t}",
+                "description": "Do the thing",
+                "points": 10,
+                "created_at": now.isoformat(),
+            } for t in range(tasks)],
+            "participants": [{
+                "user_id": str(uuid.uuid4()),
+                "username": f"user{p}",
+                "avatar": {"type": "emoji", "value": "🐶"},
+                "joined_at": now.isoformat(),
+                "total_points": p * 10,
+            } for p in range(participants)],
+        })
+    return rows
+
+
+def build_app(payload: list, response_class) -> FastAPI:
+    app = FastAPI(default_response_class=response_class)
+
+    @app.get("/quests", response_model=List[QuestResponse])
+    async def get_user_quests():
+        # Handlers hand over freshly built dicts, never a shared object
+        return trusted_response(copy.deepcopy(payload))
+
+    return app
+
+
+async def call(app: FastAPI) -> bytes:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/quests", "raw_path": b"/quests",
+        "root_path": "", "query_string": b"", "headers": [],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def measure(app: FastAPI, requests: int) -> tuple[float, int]:
+    size = len(await call(app))  # warm-up, also checks the route works
+    start = time.process_time()
+    for _ in range(requests):
+        await call(app)
+    return (time.process_time() - start) / requests, size
+
+
+async def main(quests: int, requests: int):
+    payload = make_payload(quests)
+    # The deepcopy in the handler is shared by every mode; measure it to subtract
+    start = time.process_time()
+    for _ in range(requests):
+        copy.deepcopy(payload)
+    copy_cost = (time.process_time() - start) / requests
+
+    modes = [
+        ("stdlib json + validation", JSONResponse, False),
+        ("orjson + validation", ORJSONResponse, False),
+        ("orjson, validation skipped", ORJSONResponse, True),
+    ]
+    baseline = None
+    print(f"{quests} quests, {requests} requests per mode")
+    for name, response_class, skip in modes:
+        settings.SKIP_RESPONSE_VALIDATION = skip
+        per_request, size = await measure(build_app(payload, response_class), requests)
+        per_request -= copy_cost
+        baseline = baseline or per_request
+        print(f"  {name:<28} {per_request * 1000:8.3f} ms CPU/request  "
+              f"{baseline / per_request:5.1f}x  ({size} bytes)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quests", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.quests, args.requests))
@@ -0,0 +1,287 @@
+"""Check-in burst load generator with WebSocket listeners.
+
+Simulates the morning peak: --users users spread over --quests quests log in,
+open /ws/quests/{quest_id} for each of their quests, then tap increment or
+decrement for --duration seconds while refetching GET /quests/{quest_id}
+whenever a `scoreboard_update` arrives (one refetch in flight per socket;
+updates that land meanwhile trigger one more). Reports latency percentiles and error
+rates for login, taps and refetches, and how long broadcasts take to reach
+the other participants.
+
+By default it starts benchmarks.supabase_stub and a uvicorn server for the
+app on free local ports; pass --base-url and --stub-url to use running ones.
+
+    python -m benchmarks.loadgen [--users 200] [--quests 40] [--participants 5]
+        [--duration 30] [--ramp 5] [--think-ms 1000] [--decrement-ratio 0.3]
+
+Broadcasts are matched to taps per quest in the order the taps were sent, so
+with overlapping taps in one quest single samples may pair up with the wrong
+tap; the distribution is still representative.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Optional
+
+import httpx
+from websockets.asyncio.client import connect
+
+from benchmarks.bench_endpoints import _PASSWORD, _STUB_KEY, StubAdmin, _free_port, _percentile, seed, start_stub
+
+
+@dataclass
+class Samples:
+    """Latencies and outcomes for one kind of operation."""
+    latencies: list[float] = field(default_factory=list)
+    outcomes: Counter = field(default_factory=Counter)
+
+    def add(self, seconds: float, outcome: str):
+        self.latencies.append(seconds)
+        self.outcomes[outcome] += 1
+
+    def line(self, name: str) -> str:
+        values = sorted(self.latencies)
+        total = sum(self.outcomes.values())
+        server_errors = sum(n for o, n in self.outcomes.items() if o.startswith("5") or o == "failed")
+        client_errors = sum(n for o, n in self.outcomes.items() if o.startswith("4"))
+        return (f"  {name:<20} {total:7d} {_percentile(values, 50) * 1000:8.1f} "
+                f"{_percentile(values, 95) * 1000:8.1f} {_percentile(values, 99) * 1000:8.1f} "
+                f"{100 * server_errors / max(total, 1):7.2f}% {100 * client_errors / max(total, 1):7.2f}%")
+
+
+class LoadRun:
+    def __init__(self, base_url: str, prefix: str):
+        self.base_url = base_url
+        self.ws_url = base_url.replace("http", "ws", 1) + prefix
+        self.prefix = prefix
+        self.login = Samples()
+        self.taps = Samples()
+        self.refetches = Samples()
+        self.deliveries = Samples()
+        self.ws_connects = Samples()
+        self.ws_closes: Counter = Counter()
+        # quest_id -> (tapper id, start time) of every tap, in the order sent
+        self.tap_log: dict[str, list[tuple[str, float]]] = defaultdict(list)
+        self.expected_deliveries = 0
+        self.listeners_per_quest: Counter = Counter()
+        # (user_id, daily_task_id) -> today's count, so decrements always have something to undo
+        self.counts: Counter = Counter()
+        self.stopping = asyncio.Event()
+
+    async def log_in(self, http: httpx.AsyncClient, user: dict):
+        start = time.perf_counter()
+        try:
+            r = await http.post(f"{self.prefix}/auth/login", json={"email": user["email"], "password": _PASSWORD})
+        except httpx.HTTPError:
+            self.login.add(time.perf_counter() - start, "failed")
+            return
+        self.login.add(time.perf_counter() - start, str(r.status_code))
+        if r.status_code == 200:
+            user["access_token"] = r.json()["access_token"]
+
+    async def listen(self, http: httpx.AsyncClient, user: dict, quest_id: str, ready: asyncio.Event):
+        url = f"{self.ws_url}/ws/quests/{quest_id}?token={user['access_token']}"
+        start = time.perf_counter()
+        try:
+            async with connect(url, open_timeout=30, max_queue=None) as ws:
+                snapshot = json.loads(await ws.recv())
+                self.ws_connects.add(time.perf_counter() - start, snapshot.get("type", "unknown"))
+                self.listeners_per_quest[quest_id] += 1
+                ready.set()
+                seen = len(self.tap_log[quest_id])
+                stop = asyncio.ensure_future(self.stopping.wait())
+                refetching: Optional[asyncio.Task] = None
+                stale = [False]
+                try:
+                    while True:
+                        receive = asyncio.ensure_future(ws.recv())
+                        done, _ = await asyncio.wait({receive, stop}, return_when=asyncio.FIRST_COMPLETED)
+                        if receive not in done:
+                            receive.cancel()
+                            break
+                        message = json.loads(receive.result())
+                        if message.get("type") != "scoreboard_update":
+                            continue
+                        received = time.perf_counter()
+                        # Broadcasts skip the tapper, so skip this user's own taps
+                        log = self.tap_log[quest_id]
+                        while seen < len(log) and log[seen][0] == user["id"]:
+                            seen += 1
+                        if seen < len(log):
+                            self.deliveries.add(received - log[seen][1], "200")
+                            seen += 1
+                        stale[0] = True
+                        if refetching is None or refetching.done():
+                            refetching = asyncio.create_task(self.refetch_while_stale(http, user, quest_id, stale))
+                finally:
+                    stop.cancel()
+                    if refetching is not None:
+                        await refetching
+        except Exception as e:
+            code = getattr(getattr(e, "rcvd", None), "code", None)
+            self.ws_closes[str(code) if code is not None else type(e).__name__] += 1
+            if not ready.is_set():
+                self.ws_connects.add(time.perf_counter() - start, "failed")
+                ready.set()
+
+    async def refetch_while_stale(self, http: httpx.AsyncClient, user: dict, quest_id: str, stale: list[bool]):
+        """Refetch in the background, once more if updates arrived meanwhile, like a coalescing client."""
+        while stale[0]:
+            stale[0] = False
+            await self.refetch(http, user, quest_id)
+
+    async def refetch(self, http: httpx.AsyncClient, user: dict, quest_id: str):
+        start = time.perf_counter()
+        try:
+            r = await http.get(f"{self.prefix}/quests/{quest_id}",
+                               headers={"Authorization": f"Bearer {user['access_token']}"})
+            self.refetches.add(time.perf_counter() - start, str(r.status_code))
+        except httpx.HTTPError:
+            self.refetches.add(time.perf_counter() - start, "failed")
+
+    async def tap(self, http: httpx.AsyncClient, user: dict, quest: dict, decrement: bool):
+        task_id = random.choice(quest["task_ids"])
+        key = (user["id"], task_id)
+        decrement = decrement and self.counts[key] > 0
+        body = {"quest_id": quest["id"], "daily_task_id": task_id, "check_in_date": date.today().isoformat()}
+        start = time.perf_counter()
+        self.tap_log[quest["id"]].append((user["id"], start))
+        self.expected_deliveries += self.listeners_per_quest[quest["id"]] - 1
+        try:
+            r = await http.post(f"{self.prefix}/checkins/{'decrement' if decrement else 'increment'}", json=body,
+                                headers={"Authorization": f"Bearer {user['access_token']}"})
+            self.taps.add(time.perf_counter() - start, str(r.status_code))
+        except httpx.HTTPError:
+            self.taps.add(time.perf_counter() - start, "failed")
+            return
+        if r.status_code == 200:
+            self.counts[key] += -1 if decrement else 1
+
+    async def tapper(self, http: httpx.AsyncClient, user: dict, quests: list[dict],
+                     ramp: float, think: float, decrement_ratio: float):
+        await asyncio.sleep(random.uniform(0, ramp))
+        while not self.stopping.is_set():
+            await self.tap(http, user, random.choice(quests), random.random() < decrement_ratio)
+            try:
+                await asyncio.wait_for(self.stopping.wait(), random.expovariate(1 / think))
+            except asyncio.TimeoutError:
+                pass
+
+
+def start_server(stub_url: str, log_file) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = {
+        **os.environ,
+        "SUPABASE_URL": stub_url, "SUPABASE_KEY": _STUB_KEY, "SUPABASE_SERVICE_KEY": _STUB_KEY,
+        "DEBUG": "False", "LOG_ACCESS_SAMPLE_RATE": "0.01",
+    }
+    env.setdefault("SECRET_KEY", "loadgen")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=log_file, stderr=subprocess.STDOUT,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"{url}/health", timeout=0.5)
+            return process, url
+        except httpx.TransportError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("App server did not start")
+
+
+async def main(args: argparse.Namespace):
+    processes = []
+    stub_url, base_url = args.stub_url, args.base_url
+    if stub_url is None:
+        process, stub_url = start_stub(args.latency_ms, args.jitter_ms)
+        processes.append(process)
+    if base_url is None:
+        server_log = tempfile.NamedTemporaryFile("w", prefix="loadgen-server-", suffix=".log", delete=False)
+        print(f"App server log: {server_log.name}")
+        process, base_url = start_server(stub_url, server_log)
+        processes.append(process)
+
+    stub = StubAdmin(stub_url)
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    try:
+        print(f"Seeding {args.users} users, {args.quests} quests x {args.participants} participants")
+        data = await seed(stub, args.users, args.quests, args.participants, uuid.uuid4().hex[:6])
+        quests_of: dict[int, list[dict]] = defaultdict(list)
+        for u, q in data.memberships:
+            quests_of[u].append(data.quests[q])
+
+        run = LoadRun(base_url, args.prefix)
+        async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as http:
+            await asyncio.gather(*(run.log_in(http, user) for user in data.users))
+            active = [u for u, user in enumerate(data.users) if "access_token" in user and quests_of[u]]
+
+            listeners, ready = [], []
+            for u in active:
+                for quest in quests_of[u]:
+                    event = asyncio.Event()
+                    ready.append(event)
+                    listeners.append(asyncio.create_task(run.listen(http, data.users[u], quest["id"], event)))
+            await asyncio.gather(*(event.wait() for event in ready))
+            print(f"{len(active)} users logged in, {sum(run.listeners_per_quest.values())} sockets open; "
+                  f"tapping for {args.duration}s")
+
+            started = time.perf_counter()
+            tappers = [asyncio.create_task(run.tapper(
+                http, data.users[u], quests_of[u], args.ramp, args.think_ms / 1000, args.decrement_ratio,
+            )) for u in active]
+            await asyncio.sleep(args.duration)
+            run.stopping.set()
+            await asyncio.gather(*tappers)
+            elapsed = time.perf_counter() - started
+            # Let in-flight broadcasts and refetches land before closing sockets
+            await asyncio.sleep(args.drain)
+            await asyncio.gather(*listeners)
+
+        print(f"  {'operation':<20} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'5xx':>8} {'4xx':>8}")
+        for name, samples in [("login", run.login), ("ws connect", run.ws_connects), ("tap", run.taps),
+                              ("broadcast delivery", run.deliveries), ("refetch", run.refetches)]:
+            print(samples.line(name))
+        taps = sum(run.taps.outcomes.values())
+        delivered = len(run.deliveries.latencies)
+        print(f"  {taps / elapsed:.1f} taps/s; {delivered}/{run.expected_deliveries} broadcasts delivered "
+              f"({100 * delivered / max(run.expected_deliveries, 1):.1f}%)")
+        print(f"  tap outcomes: {dict(run.taps.outcomes)}")
+        if run.ws_closes:
+            print(f"  sockets closed early: {dict(run.ws_closes)}")
+    finally:
+        await stub.http.aclose()
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--quests", type=int, default=40)
+    parser.add_argument("--participants", type=int, default=5, help="participants per quest")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of tapping")
+    parser.add_argument("--ramp", type=float, default=5, help="users start tapping within this many seconds")
+    parser.add_argument("--think-ms", type=float, default=1000, help="mean pause between a user's taps")
+    parser.add_argument("--decrement-ratio", type=float, default=0.3)
+    parser.add_argument("--drain", type=float, default=2, help="seconds to wait for late broadcasts")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="stand-in delay per upstream call")
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--max-connections", type=int, default=500, help="HTTP connection pool size")
+    parser.add_argument("--prefix", default="/api/v1")
+    parser.add_argument("--base-url", help="app server to load, e.g. http://127.0.0.1:8000")
+    parser.add_argument("--stub-url", help="stand-in the app server uses (needed for seeding)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,621 @@
+"""In-memory stand-in for the Supabase REST (PostgREST) and Auth APIs.
+
+Serves the tables in database/schema.sql with the PostgREST query surface the
+app uses (eq/neq/gt/gte/lt/lte/in/is filters, `select` with embedded
+resources, order/limit/offset, single-object responses via the Accept header,
+insert/upsert/update/delete), the user metadata, checkin_analytics, quest list
+and points reconciliation RPCs, and the Auth token/user/logout/admin endpoints.
+Every request can be delayed to mimic the round trip to a hosted project, and
+every request is counted so benchmarks can report upstream calls.
+
+    python -m benchmarks.supabase_stub [--port 54321] [--latency-ms 20] [--jitter-ms 5]
+
+Point the app at it with SUPABASE_URL=http://127.0.0.1:54321 and any
+JWT-shaped SUPABASE_KEY / SUPABASE_SERVICE_KEY. GET /_stub/stats returns the
+request counts; DELETE /_stub/stats resets them.
+
+Not modelled: RLS (every key acts as the service role), password checks
+beyond equality, and PostgREST features the app does not use.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import random
+import time
+import uuid
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+# Column defaults from database/schema.sql
+_DEFAULTS: dict[str, dict[str, Callable[[], Any]]] = {
+    "quests": {"id": lambda: str(uuid.uuid4()), "description": lambda: None, "archived_at": lambda: None,
+               "created_at": lambda: _now(), "updated_at": lambda: _now()},
+    "quest_snapshots": {"created_at": lambda: _now(), "updated_at": lambda: _now()},
+    "daily_tasks": {"id": lambda: str(uuid.uuid4()), "description": lambda: None,
+                    "points": lambda: 10, "created_at": lambda: _now()},
+    "quest_participants": {"joined_at": lambda: _now(), "total_points": lambda: 0,
+                           "last_activity_at": lambda: _now()},
+    "check_ins": {"id": lambda: str(uuid.uuid4()), "count": lambda: 1, "notes": lambda: None,
+                  "created_at": lambda: _now(), "updated_at": lambda: _now()},
+    "account_deletion_jobs": {"id": lambda: str(uuid.uuid4()), "status": lambda: "running",
+                              "stage": lambda: "check_ins", "deleted_check_ins": lambda: 0,
+                              "deleted_participations": lambda: 0, "deleted_quests": lambda: 0,
+                              "attempts": lambda: 1, "error": lambda: None,
+                              "created_at": lambda: _now(), "updated_at": lambda: _now()},
+}
+# Primary keys and UNIQUE constraints
+_UNIQUE: dict[str, list[tuple[str, ...]]] = {
+    "quests": [("id",), ("share_code",)],
+    "daily_tasks": [("id",)],
+    "quest_participants": [("quest_id", "user_id")],
+    "check_ins": [("id",), ("user_id", "daily_task_id", "check_in_date")],
+    "account_deletion_jobs": [("id",)],
+    "quest_snapshots": [("quest_id",)],
+}
+# Partial UNIQUE indexes: columns, and which rows the index covers
+_PARTIAL_UNIQUE: dict[str, list[tuple[tuple[str, ...], Callable[[dict], bool]]]] = {
+    "account_deletion_jobs": [(("user_id",), lambda row: row["status"] in ("pending", "running"))],
+}
+# (table, embedded) -> (local column, remote column, to-many)
+_RELATIONS: dict[tuple[str, str], tuple[str, str, bool]] = {
+    ("quests", "daily_tasks"): ("id", "quest_id", True),
+    ("quests", "quest_participants"): ("id", "quest_id", True),
+    ("quests", "check_ins"): ("id", "quest_id", True),
+    ("daily_tasks", "quests"): ("quest_id", "id", False),
+    ("daily_tasks", "check_ins"): ("id", "daily_task_id", True),
+    ("quest_participants", "quests"): ("quest_id", "id", False),
+    ("check_ins", "quests"): ("quest_id", "id", False),
+    ("check_ins", "daily_tasks"): ("daily_task_id", "id", False),
+}
+# ON DELETE CASCADE children: table -> [(child table, child column, parent column)]
+_CASCADES: dict[str, list[tuple[str, str, str]]] = {
+    "quests": [("daily_tasks", "quest_id", "id"), ("quest_participants", "quest_id", "id"),
+               ("check_ins", "quest_id", "id"), ("quest_snapshots", "quest_id", "id")],
+    "daily_tasks": [("check_ins", "daily_task_id", "id")],
+}
+_RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+_OBJECT_MEDIA_TYPE = "application/vnd.pgrst.object+json"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _b64(data: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+
+
+def _error(status: int, code: str, message: str, details: Optional[str] = None) -> JSONResponse:
+    return JSONResponse({"code": code, "message": message, "details": details, "hint": None}, status)
+
+
+def _auth_error(status: int, code: str, message: str) -> JSONResponse:
+    return JSONResponse({"code": status, "error_code": code, "msg": message}, status)
+
+
+class PostgrestError(Exception):
+    def __init__(self, status: int, code: str, message: str, details: Optional[str] = None):
+        super().__init__(message)
+        self.response = _error(status, code, message, details)
+
+
+# ---------------------------------------------------------------------------
+# Query helpers
+# ---------------------------------------------------------------------------
+
+def _split_top_level(text: str) -> list[str]:
+    """Split on commas that are not inside parentheses."""
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        depth += char == "("
+        depth -= char == ")"
+        current.append(char)
+    if current:
+        parts.append("".join(current).strip())
+    return [p for p in parts if p]
+
+
+def _coerce(value: str, like: Any) -> Any:
+    """Convert a filter operand to the type of the stored value it is compared with."""
+    if isinstance(like, bool):
+        return value == "true"
+    if isinstance(like, int):
+        return int(value)
+    if isinstance(like, float):
+        return float(value)
+    return value
+
+
+def _matches(row: dict, column: str, expression: str) -> bool:
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    op, _, operand = expression.partition(".")
+    value = row.get(column)
+    if op == "is":
+        result = value is {"null": None, "true": True, "false": False}[operand]
+    elif op == "in":
+        options = [o.strip().strip('"') for o in operand.strip("()").split(",") if o.strip()]
+        result = value is not None and value in [_coerce(o, value) for o in options]
+    elif value is None:
+        result = False
+    else:
+        operand = _coerce(operand, value)
+        result = {
+            "eq": value == operand, "neq": value != operand,
+            "gt": value > operand, "gte": value >= operand,
+            "lt": value < operand, "lte": value <= operand,
+        }[op]
+    return result != negate
+
+
+def _order_rows(rows: list[dict], order: str) -> list[dict]:
+    for term in reversed(order.split(",")):
+        column, *modifiers = term.split(".")
+        desc = "desc" in modifiers
+        nulls_first = "nullsfirst" in modifiers or ("nullslast" not in modifiers and desc)
+        present = [r for r in rows if r.get(column) is not None]
+        missing = [r for r in rows if r.get(column) is None]
+        present.sort(key=lambda r: r[column], reverse=desc)
+        rows = missing + present if nulls_first else present + missing
+    return rows
+
+
+class StubDatabase:
+    """Rows and auth users for the stand-in, plus the request counter."""
+
+    def __init__(self):
+        self.tables: dict[str, list[dict]] = {table: [] for table in _DEFAULTS}
+        self.users: dict[str, dict] = {}
+        self.passwords: dict[str, str] = {}
+        self.refresh_tokens: dict[str, str] = {}
+        self.calls: Counter = Counter()
+        self.rpc_functions: dict[str, Callable[[dict], Any]] = {
+            "get_user_metadata": self._get_user_metadata,
+            "get_users_metadata": self._get_users_metadata,
+            "checkin_analytics": self._checkin_analytics,
+            "user_quest_page": self._user_quest_page,
+            "quest_summaries": self._quest_summaries,
+            "add_participant_points": self._add_participant_points,
+            "points_drift": self._points_drift,
+            "apply_points_corrections": self._apply_points_corrections,
+        }
+
+    # -- tables -------------------------------------------------------------
+
+    def table(self, name: str) -> list[dict]:
+        if name not in self.tables:
+            raise PostgrestError(404, "42P01", f'relation "public.{name}" does not exist')
+        return self.tables[name]
+
+    def filter(self, table: str, params: list[tuple[str, str]]) -> list[dict]:
+        rows = self.table(table)
+        for column, expression in params:
+            if column in _RESERVED_PARAMS:
+                continue
+            rows = [r for r in rows if _matches(r, column, expression)]
+        return rows
+
+    def project(self, table: str, row: dict, select: str) -> dict:
+        result = {}
+        for item in _split_top_level(select or "*"):
+            if "(" in item:
+                name, inner = item[:-1].split("(", 1)
+                alias, _, name = name.rpartition(":")
+                name = name.split("!")[0].strip()
+                relation = _RELATIONS.get((table, name))
+                if relation is None:
+                    raise PostgrestError(400, "PGRST200",
+                                         f"Could not find a relationship between '{table}' and '{name}'")
+                local, remote, to_many = relation
+                related = [self.project(name, r, inner) for r in self.table(name)
+                           if r.get(remote) == row.get(local)]
+                result[alias.strip() or name] = related if to_many else (related[0] if related else None)
+            elif item == "*":
+                result.update(row)
+            else:
+                alias, _, column = item.rpartition(":")
+                result[alias.strip() or column.strip()] = row.get(column.strip())
+        return result
+
+    def insert(self, table: str, records: list[dict], upsert_on: Optional[tuple[str, ...]] = None) -> list[dict]:
+        rows = self.table(table)
+        inserted = []
+        for record in records:
+            row = {column: make() for column, make in _DEFAULTS[table].items()}
+            row.update(record)
+            conflict = self._conflict(table, row)
+            if conflict is None:
+                self._check_partial_unique(table, row)
+            if conflict is not None:
+                existing, columns = conflict
+                if upsert_on is None or (upsert_on and tuple(upsert_on) != columns):
+                    raise PostgrestError(
+                        409, "23505", "duplicate key value violates unique constraint",
+                        f"Key ({', '.join(columns)}) already exists.",
+                    )
+                existing.update(record)
+                inserted.append(existing)
+                continue
+            rows.append(row)
+            inserted.append(row)
+        return inserted
+
+    def _conflict(self, table: str, row: dict) -> Optional[tuple[dict, tuple[str, ...]]]:
+        for columns in _UNIQUE[table]:
+            key = tuple(row.get(c) for c in columns)
+            for existing in self.tables[table]:
+                if tuple(existing.get(c) for c in columns) == key:
+                    return existing, columns
+        return None
+
+    def _check_partial_unique(self, table: str, row: dict):
+        for columns, covers in _PARTIAL_UNIQUE.get(table, ()):
+            if not covers(row):
+                continue
+            key = tuple(row.get(c) for c in columns)
+            if any(covers(existing) and tuple(existing.get(c) for c in columns) == key
+                   for existing in self.tables[table]):
+                raise PostgrestError(
+                    409, "23505", "duplicate key value violates unique constraint",
+                    f"Key ({', '.join(columns)}) already exists.",
+                )
+
+    def update(self, table: str, rows: list[dict], changes: dict) -> list[dict]:
+        for row in rows:
+            row.update(changes)
+            if "updated_at" in row and "updated_at" not in changes:
+                row["updated_at"] = _now()
+        return rows
+
+    def delete(self, table: str, rows: list[dict]) -> list[dict]:
+        doomed = {id(r) for r in rows}
+        self.tables[table] = [r for r in self.tables[table] if id(r) not in doomed]
+        for child, child_column, parent_column in _CASCADES.get(table, []):
+            keys = {r[parent_column] for r in rows}
+            self.delete(child, [r for r in self.tables[child] if r.get(child_column) in keys])
+        return rows
+
+    # -- auth ---------------------------------------------------------------
+
+    def create_user(self, email: str, password: str, user_metadata: Optional[dict] = None) -> dict:
+        now = _now()
+        user = {
+            "id": str(uuid.uuid4()), "aud": "authenticated", "role": "authenticated",
+            "email": email, "email_confirmed_at": now, "confirmed_at": now,
+            "app_metadata": {"provider": "email", "providers": ["email"]},
+            "user_metadata": user_metadata or {},
+            "identities": [], "created_at": now, "updated_at": now, "is_anonymous": False,
+        }
+        self.users[user["id"]] = user
+        self.passwords[email] = password
+        return user
+
+    def user_by_email(self, email: str) -> Optional[dict]:
+        return next((u for u in self.users.values() if u["email"] == email), None)
+
+    def issue_session(self, user: dict) -> dict:
+        expires_at = int(time.time()) + 3600
+        access_token = ".".join([
+            _b64({"alg": "HS256", "typ": "JWT"}),
+            _b64({"sub": user["id"], "email": user["email"], "role": "authenticated",
+                  "aud": "authenticated", "exp": expires_at, "iat": int(time.time())}),
+            _b64({"stub": uuid.uuid4().hex}),
+        ])
+        refresh_token = uuid.uuid4().hex
+        self.refresh_tokens[refresh_token] = user["id"]
+        return {
+            "access_token": access_token, "token_type": "bearer", "expires_in": 3600,
+            "expires_at": expires_at, "refresh_token": refresh_token, "user": user,
+        }
+
+    def user_for_token(self, authorization: Optional[str]) -> Optional[dict]:
+        if not authorization or not authorization.startswith("Bearer "):
+            return None
+        try:
+            payload = authorization.removeprefix("Bearer ").split(".")[1]
+            claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        except (IndexError, ValueError):
+            return None
+        if claims.get("exp", 0) < time.time():
+            return None
+        return self.users.get(claims.get("sub"))
+
+    def _get_user_metadata(self, params: dict) -> list[dict]:
+        user = self.users.get(params.get("p_user_id"))
+        return [{"id": user["id"], "raw_user_meta_data": user["user_metadata"]}] if user else []
+
+    def _get_users_metadata(self, params: dict) -> list[dict]:
+        users = (self.users.get(user_id) for user_id in params.get("p_user_ids") or [])
+        return [{"id": user["id"], "raw_user_meta_data": user["user_metadata"]} for user in users if user]
+
+    def _checkin_analytics(self, params: dict) -> Optional[dict]:
+        quest = next((q for q in self.tables["quests"] if q["id"] == params["p_quest_id"]), None)
+        if quest is None:
+            return None
+        from_date = date.fromisoformat(params.get("p_from") or quest["start_date"])
+        to_date = date.fromisoformat(params.get("p_to") or min(quest["end_date"], date.today().isoformat()))
+        rows = [c for c in self.tables["check_ins"]
+                if c["quest_id"] == quest["id"] and c["user_id"] == params["p_user_id"]
+                and from_date <= date.fromisoformat(c["check_in_date"]) <= to_date]
+        days: Counter = Counter()
+        totals: Counter = Counter()
+        weekdays: Counter = Counter()
+        weeks: Counter = Counter()
+        for c in rows:
+            day = date.fromisoformat(c["check_in_date"])
+            days[c["daily_task_id"]] += 1
+            totals[c["daily_task_id"]] += c["count"]
+            weekdays[day.isoweekday()] += c["count"]
+            weeks[(day - timedelta(days=day.weekday())).isoformat()] += c["count"]
+        tasks = sorted((t for t in self.tables["daily_tasks"] if t["quest_id"] == quest["id"]), key=lambda t: t["created_at"])
+        return {
+            "from_date": from_date.isoformat(),
+            "to_date": to_date.isoformat(),
+            "days": max((to_date - from_date).days + 1, 0),
+            "tasks": [{"daily_task_id": t["id"], "title": t["title"], "points": t["points"],
+                       "days_completed": days[t["id"]], "check_ins": totals[t["id"]]} for t in tasks],
+            "weekdays": [{"day_of_week": d, "check_ins": n} for d, n in sorted(weekdays.items())],
+            "weeks": [{"week_start": w, "check_ins": n} for w, n in sorted(weeks.items())],
+        }
+
+    def _user_quest_page(self, params: dict) -> list[dict]:
+        quests = {q["id"]: q for q in self.tables["quests"]}
+        today = date.today().isoformat()
+        status = params.get("p_status")
+        after = None
+        if params.get("p_after_activity"):
+            after = (datetime.fromisoformat(params["p_after_activity"]), params["p_after_id"])
+        rows = []
+        for p in self.tables["quest_participants"]:
+            quest = quests.get(p["quest_id"])
+            if p["user_id"] != params["p_user_id"] or quest is None:
+                continue
+            if (status == "active" and quest["end_date"] < today) or (status == "finished" and quest["end_date"] >= today):
+                continue
+            key = (datetime.fromisoformat(p["last_activity_at"]), p["quest_id"])
+            if after is None or key < after:
+                rows.append((key, p))
+        rows.sort(key=lambda row: row[0], reverse=True)
+        if params.get("p_limit") is not None:
+            rows = rows[:params["p_limit"]]
+        return [{"quest_id": p["quest_id"], "last_activity_at": p["last_activity_at"]} for _, p in rows]
+
+    def _quest_summaries(self, params: dict) -> list[dict]:
+        quests = {q["id"]: q for q in self.tables["quests"]}
+        summaries = []
+        for row in self._user_quest_page(params):
+            quest = quests[row["quest_id"]]
+            participants = [p for p in self.tables["quest_participants"] if p["quest_id"] == quest["id"]]
+            me = next(p for p in participants if p["user_id"] == params["p_user_id"])
+            top = sorted(participants, key=lambda p: p["joined_at"])
+            top.sort(key=lambda p: p["total_points"], reverse=True)
+            top_participants = []
+            for p in top[:3]:
+                metadata = self.users.get(p["user_id"], {}).get("user_metadata") or {}
+                top_participants.append({
+                    "user_id": p["user_id"], "username": metadata.get("username"), "avatar": metadata.get("avatar"),
+                    "joined_at": p["joined_at"], "total_points": p["total_points"],
+                })
+            summaries.append({
+                "id": quest["id"], "name": quest["name"], "description": quest["description"],
+                "start_date": quest["start_date"], "end_date": quest["end_date"],
+                "last_activity_at": row["last_activity_at"], "participant_count": len(participants),
+                "total_points": me["total_points"], "top_participants": top_participants,
+            })
+        return summaries
+
+    def _points_drift(self, params: dict) -> list[dict]:
+        quest_ids = set(params.get("p_quest_ids") or [])
+        task_points = {t["id"]: t["points"] for t in self.tables["daily_tasks"] if t["quest_id"] in quest_ids}
+        expected: Counter = Counter()
+        for c in self.tables["check_ins"]:
+            if c["quest_id"] in quest_ids and c["daily_task_id"] in task_points:
+                expected[(c["quest_id"], c["user_id"])] += c["count"] * task_points[c["daily_task_id"]]
+        return [
+            {"quest_id": p["quest_id"], "user_id": p["user_id"], "stored": p["total_points"],
+             "expected": expected[(p["quest_id"], p["user_id"])]}
+            for p in self.tables["quest_participants"]
+            if p["quest_id"] in quest_ids and p["total_points"] != expected[(p["quest_id"], p["user_id"])]
+        ]
+
+    def _add_participant_points(self, params: dict) -> None:
+        for p in self.tables["quest_participants"]:
+            if p["quest_id"] == params["p_quest_id"] and p["user_id"] == params["p_user_id"]:
+                p["total_points"] = max(0, p["total_points"] + params["p_delta"])
+                p["last_activity_at"] = _now()
+
+    def _apply_points_corrections(self, params: dict) -> int:
+        corrections = {(c["quest_id"], c["user_id"]): c for c in params.get("p_corrections") or []}
+        updated = 0
+        for p in self.tables["quest_participants"]:
+            c = corrections.get((p["quest_id"], p["user_id"]))
+            if c is not None and p["total_points"] == c["stored"]:
+                p["total_points"] = c["expected"]
+                updated += 1
+        return updated
+
+
+# ---------------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------------
+
+def create_stub_app(latency_ms: float = 0.0, jitter_ms: float = 0.0, db: Optional[StubDatabase] = None) -> Starlette:
+    db = db or StubDatabase()
+
+    async def delay():
+        seconds = (latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+    async def rest(request: Request) -> Response:
+        table = request.path_params["table"]
+        db.calls[f"rest {request.method} {table}"] += 1
+        await delay()
+        params = list(request.query_params.multi_items())
+        prefer = request.headers.get("prefer", "")
+        single = request.headers.get("accept", "") == _OBJECT_MEDIA_TYPE
+        try:
+            if request.method == "GET" or request.method == "HEAD":
+                rows = db.filter(table, params)
+                order = request.query_params.get("order")
+                if order:
+                    rows = _order_rows(rows, order)
+                total = len(rows)
+                offset = int(request.query_params.get("offset", 0))
+                limit = request.query_params.get("limit")
+                rows = rows[offset:offset + int(limit)] if limit is not None else rows[offset:]
+                body = [db.project(table, r, request.query_params.get("select", "*")) for r in rows]
+                status = 200
+            elif request.method == "POST":
+                payload = await request.json()
+                records = payload if isinstance(payload, list) else [payload]
+                upsert_on = None
+                if "resolution=merge-duplicates" in prefer:
+                    on_conflict = request.query_params.get("on_conflict")
+                    upsert_on = tuple(c.strip() for c in on_conflict.split(",")) if on_conflict else ()
+                rows = db.insert(table, records, upsert_on)
+                total = len(rows)
+                body = [db.project(table, r, request.query_params.get("select", "*")) for r in rows]
+                status = 201
+            elif request.method == "PATCH":
+                rows = db.update(table, db.filter(table, params), await request.json())
+                total = len(rows)
+                body = [dict(r) for r in rows]
+                status = 200
+            else:
+                rows = db.delete(table, db.filter(table, params))
+                total = len(rows)
+                body = [dict(r) for r in rows]
+                status = 200
+        except PostgrestError as e:
+            return e.response
+
+        headers = {}
+        if "count=" in prefer:
+            headers["Content-Range"] = f"0-{max(len(body) - 1, 0)}/{total}" if body else f"*/{total}"
+        if single:
+            if len(body) != 1:
+                return _error(406, "PGRST116", "JSON object requested, multiple (or no) rows returned",
+                              f"The result contains {len(body)} rows")
+            return JSONResponse(body[0], status, headers=headers)
+        if "return=minimal" in prefer:
+            return Response(status_code=204 if status == 200 else status, headers=headers)
+        return JSONResponse(body, status, headers=headers)
+
+    async def rpc(request: Request) -> Response:
+        name = request.path_params["fn"]
+        db.calls[f"rpc {name}"] += 1
+        await delay()
+        fn = db.rpc_functions.get(name)
+        if fn is None:
+            return _error(404, "PGRST202", f"Could not find the function public.{name}")
+        body = await request.body()
+        return JSONResponse(fn(json.loads(body) if body else {}))
+
+    async def token(request: Request) -> Response:
+        grant_type = request.query_params.get("grant_type")
+        db.calls[f"auth token {grant_type}"] += 1
+        await delay()
+        payload = await request.json()
+        if grant_type == "password":
+            user = db.user_by_email(payload.get("email", ""))
+            if user is None or db.passwords.get(user["email"]) != payload.get("password"):
+                return _auth_error(400, "invalid_credentials", "Invalid login credentials")
+        elif grant_type == "refresh_token":
+            user = db.users.get(db.refresh_tokens.pop(payload.get("refresh_token", ""), None))
+            if user is None:
+                return _auth_error(400, "refresh_token_not_found", "Invalid Refresh Token: Refresh Token Not Found")
+        else:
+            return _auth_error(400, "unsupported_grant_type", "Unsupported grant type")
+        return JSONResponse(db.issue_session(user))
+
+    async def current_user(request: Request) -> Response:
+        db.calls["auth user"] += 1
+        await delay()
+        user = db.user_for_token(request.headers.get("authorization"))
+        if user is None:
+            return _auth_error(403, "bad_jwt", "invalid JWT: unable to parse or verify signature")
+        return JSONResponse(user)
+
+    async def logout(request: Request) -> Response:
+        db.calls["auth logout"] += 1
+        await delay()
+        return Response(status_code=204)
+
+    async def admin_users(request: Request) -> Response:
+        db.calls[f"auth admin {request.method} users"] += 1
+        await delay()
+        if request.method == "GET":
+            page = int(request.query_params.get("page", 1))
+            per_page = int(request.query_params.get("per_page", 50))
+            users = list(db.users.values())[(page - 1) * per_page:page * per_page]
+            return JSONResponse({"users": users, "aud": "authenticated"})
+        payload = await request.json()
+        if db.user_by_email(payload.get("email", "")) is not None:
+            return _auth_error(422, "email_exists", "A user with this email address has already been registered")
+        user = db.create_user(payload["email"], payload.get("password", ""), payload.get("user_metadata"))
+        return JSONResponse(user)
+
+    async def admin_user(request: Request) -> Response:
+        db.calls[f"auth admin {request.method} user"] += 1
+        await delay()
+        user = db.users.get(request.path_params["user_id"])
+        if user is None:
+            return _auth_error(404, "user_not_found", "User not found")
+        if request.method == "GET":
+            return JSONResponse(user)
+        if request.method == "DELETE":
+            del db.users[user["id"]]
+            db.passwords.pop(user["email"], None)
+            return JSONResponse(user)
+        payload = await request.json()
+        if "user_metadata" in payload:
+            user["user_metadata"] = {**user["user_metadata"], **payload["user_metadata"]}
+        if "email" in payload:
+            user["email"] = payload["email"]
+        user["updated_at"] = _now()
+        return JSONResponse(user)
+
+    async def stats(request: Request) -> Response:
+        if request.method == "DELETE":
+            db.calls.clear()
+            return Response(status_code=204)
+        return JSONResponse({"total": sum(db.calls.values()), "calls": dict(db.calls)})
+
+    app = Starlette(routes=[
+        Route("/rest/v1/rpc/{fn}", rpc, methods=["POST"]),
+        Route("/rest/v1/{table}", rest, methods=["GET", "HEAD", "POST", "PATCH", "DELETE"]),
+        Route("/auth/v1/token", token, methods=["POST"]),
+        Route("/auth/v1/user", current_user, methods=["GET"]),
+        Route("/auth/v1/logout", logout, methods=["POST"]),
+        Route("/auth/v1/admin/users", admin_users, methods=["GET", "POST"]),
+        Route("/auth/v1/admin/users/{user_id}", admin_user, methods=["GET", "PUT", "DELETE"]),
+        Route("/_stub/stats", stats, methods=["GET", "DELETE"]),
+    ])
+    app.state.db = db
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="delay added to every request")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="uniform +/- jitter on the delay")
+    args = parser.parse_args()
+    uvicorn.run(create_stub_app(args.latency_ms, args.jitter_ms), host=args.host, port=args.port,
+                log_level="warning")
@@ -14,10 +14,14 @@ CREATE TABLE IF NOT EXISTS quests (
     creator_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
     share_code TEXT NOT NULL UNIQUE,
     share_code_expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    -- Set once the quest has ended and its snapshot is stored in quest_snapshots
+    archived_at TIMESTAMP WITH TIME ZONE,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     CONSTRAINT valid_dates CHECK (end_date >= start_date)
 );
+-- For databases created before archived_at existed
+ALTER TABLE quests ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP WITH TIME ZONE;
 
 -- Daily tasks table
 CREATE TABLE IF NOT EXISTS daily_tasks (
@@ -35,8 +39,12 @@ CREATE TABLE IF NOT EXISTS quest_participants (
     user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
     joined_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     total_points INTEGER NOT NULL DEFAULT 0 CHECK (total_points >= 0),
+    -- When the participant joined or last checked in; orders GET /quests
+    last_activity_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
     PRIMARY KEY (quest_id, user_id)
 );
+-- For databases created before last_activity_at existed
+ALTER TABLE quest_participants ADD COLUMN IF NOT EXISTS last_activity_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW();
 
 -- Check-ins table
 CREATE TABLE IF NOT EXISTS check_ins (
@@ -52,15 +60,59 @@ CREATE TABLE IF NOT EXISTS check_ins (
     UNIQUE (user_id, daily_task_id, check_in_date)
 );
 
+-- Frozen, pre-aggregated state of finished quests (app/services/quest_snapshots.py):
+-- the GET /quests/{quest_id} body with the final leaderboard, and each participant's
+-- check-in stats and calendar, keyed by user id
+CREATE TABLE IF NOT EXISTS quest_snapshots (
+    quest_id UUID PRIMARY KEY REFERENCES quests(id) ON DELETE CASCADE,
+    quest JSONB NOT NULL,
+    stats JSONB NOT NULL,
+    calendar JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    -- Bumped when a departed or deleted participant is removed; workers evict their
+    -- in-memory copy of snapshots revised since their last sync
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+-- For databases created before updated_at existed
+ALTER TABLE quest_snapshots ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+
+-- Background account deletions (app/services/account_deletion.py). user_id is
+-- deliberately not a foreign key: the job row has to outlive the account it deletes.
+CREATE TABLE IF NOT EXISTS account_deletion_jobs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID NOT NULL,
+    status TEXT NOT NULL DEFAULT 'running'
+        CHECK (status IN ('pending', 'running', 'completed', 'failed')),
+    stage TEXT NOT NULL DEFAULT 'check_ins'
+        CHECK (stage IN ('check_ins', 'participations', 'quests', 'auth_user', 'done')),
+    deleted_check_ins INTEGER NOT NULL DEFAULT 0,
+    deleted_participations INTEGER NOT NULL DEFAULT 0,
+    deleted_quests INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 1,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
 -- Indexes for better query performance
+CREATE INDEX IF NOT EXISTS idx_check_ins_quest_user_date ON check_ins(quest_id, user_id, check_in_date);
 CREATE INDEX IF NOT EXISTS idx_quests_creator ON quests(creator_id);
 CREATE INDEX IF NOT EXISTS idx_quests_share_code ON quests(share_code);
+CREATE INDEX IF NOT EXISTS idx_quests_unarchived_end ON quests(end_date) WHERE archived_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_quest_snapshots_updated ON quest_snapshots(updated_at);
 CREATE INDEX IF NOT EXISTS idx_daily_tasks_quest ON daily_tasks(quest_id);
 CREATE INDEX IF NOT EXISTS idx_quest_participants_user ON quest_participants(user_id);
 CREATE INDEX IF NOT EXISTS idx_quest_participants_quest ON quest_participants(quest_id);
+-- Keyset pages of a user's quests, most recently active first
+CREATE INDEX IF NOT EXISTS idx_quest_participants_user_activity
+    ON quest_participants(user_id, last_activity_at DESC, quest_id DESC);
 CREATE INDEX IF NOT EXISTS idx_check_ins_user ON check_ins(user_id);
 CREATE INDEX IF NOT EXISTS idx_check_ins_quest ON check_ins(quest_id);
 CREATE INDEX IF NOT EXISTS idx_check_ins_date ON check_ins(check_in_date);
+-- At most one unfinished deletion per user; also serves the resume sweep
+CREATE UNIQUE INDEX IF NOT EXISTS idx_account_deletion_jobs_active
+    ON account_deletion_jobs(user_id) WHERE status IN ('pending', 'running');
+CREATE INDEX IF NOT EXISTS idx_account_deletion_jobs_status ON account_deletion_jobs(status, updated_at);
 
 -- Function to update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -83,11 +135,26 @@ CREATE TRIGGER update_check_ins_updated_at
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
 
+-- Trigger to auto-update updated_at for quest_snapshots (drives the workers' revision sync)
+CREATE TRIGGER update_quest_snapshots_updated_at
+    BEFORE UPDATE ON quest_snapshots
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+-- Trigger to auto-update updated_at for account_deletion_jobs (used as the job heartbeat)
+CREATE TRIGGER update_account_deletion_jobs_updated_at
+    BEFORE UPDATE ON account_deletion_jobs
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
 -- Row Level Security (RLS) Policies
 -- Enable RLS on all tables
 ALTER TABLE quests ENABLE ROW LEVEL SECURITY;
 ALTER TABLE daily_tasks ENABLE ROW LEVEL SECURITY;
 ALTER TABLE quest_participants ENABLE ROW LEVEL SECURITY;
+-- No policies: only the service role reads and writes deletion jobs and snapshots
+ALTER TABLE account_deletion_jobs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE quest_snapshots ENABLE ROW LEVEL SECURITY;
 ALTER TABLE check_ins ENABLE ROW LEVEL SECURITY;
 
 -- Quests policies
@@ -182,9 +249,262 @@ $$;
 GRANT EXECUTE ON FUNCTION get_user_metadata(UUID) TO authenticated;
 GRANT EXECUTE ON FUNCTION get_user_metadata(UUID) TO service_role;
 
+-- get_user_metadata for many users at once, so a page of quests costs one call
+-- for all of its participants. Service role only.
+CREATE OR REPLACE FUNCTION get_users_metadata(p_user_ids UUID[])
+RETURNS TABLE (
+    id UUID,
+    raw_user_meta_data JSONB
+)
+SECURITY DEFINER
+SET search_path = public
+LANGUAGE sql
+AS $$
+    SELECT u.id, u.raw_user_meta_data
+    FROM auth.users u
+    WHERE u.id = ANY(p_user_ids);
+$$;
+
+REVOKE EXECUTE ON FUNCTION get_users_metadata(UUID[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION get_users_metadata(UUID[]) TO service_role;
+
+-- Per-task, per-weekday and per-week check-in totals for one participant of a quest,
+-- aggregated in the database so only a few rows leave it. The range defaults to the
+-- quest's start date through the earlier of its end date and today. Returns NULL
+-- for an unknown quest. Used by GET /checkins/analytics/{quest_id}.
+CREATE OR REPLACE FUNCTION checkin_analytics(
+    p_quest_id UUID,
+    p_user_id UUID,
+    p_from DATE DEFAULT NULL,
+    p_to DATE DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    WITH bounds AS (
+        SELECT COALESCE(p_from, q.start_date) AS from_date,
+               COALESCE(p_to, LEAST(q.end_date, CURRENT_DATE)) AS to_date
+        FROM quests q
+        WHERE q.id = p_quest_id
+    ),
+    c AS (
+        SELECT ci.daily_task_id, ci.check_in_date, ci.count
+        FROM check_ins ci, bounds b
+        WHERE ci.quest_id = p_quest_id
+          AND ci.user_id = p_user_id
+          AND ci.check_in_date BETWEEN b.from_date AND b.to_date
+    )
+    SELECT jsonb_build_object(
+        'from_date', b.from_date,
+        'to_date', b.to_date,
+        'days', GREATEST(b.to_date - b.from_date + 1, 0),
+        'tasks', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'daily_task_id', t.id,
+                'title', t.title,
+                'points', t.points,
+                'days_completed', COALESCE(s.days, 0),
+                'check_ins', COALESCE(s.total, 0)
+            ) ORDER BY t.created_at)
+            FROM daily_tasks t
+            LEFT JOIN (
+                SELECT daily_task_id, COUNT(*) AS days, SUM(count) AS total
+                FROM c
+                GROUP BY daily_task_id
+            ) s ON s.daily_task_id = t.id
+            WHERE t.quest_id = p_quest_id
+        ), '[]'::jsonb),
+        'weekdays', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object('day_of_week', dow, 'check_ins', total) ORDER BY dow)
+            FROM (
+                SELECT EXTRACT(ISODOW FROM check_in_date)::INTEGER AS dow, SUM(count) AS total
+                FROM c
+                GROUP BY 1
+            ) d
+        ), '[]'::jsonb),
+        'weeks', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object('week_start', week_start, 'check_ins', total) ORDER BY week_start)
+            FROM (
+                SELECT date_trunc('week', check_in_date)::DATE AS week_start, SUM(count) AS total
+                FROM c
+                GROUP BY 1
+            ) w
+        ), '[]'::jsonb)
+    )
+    FROM bounds b;
+$$;
+
+REVOKE EXECUTE ON FUNCTION checkin_analytics(UUID, UUID, DATE, DATE) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION checkin_analytics(UUID, UUID, DATE, DATE) TO service_role;
+
+-- Participants of the given quests whose total_points differs from the sum of
+-- count x points over their check-ins. Aggregated in one pass per batch of quests
+-- by the points reconciliation job (app/services/points_reconciliation.py).
+CREATE OR REPLACE FUNCTION points_drift(p_quest_ids UUID[])
+RETURNS TABLE (
+    quest_id UUID,
+    user_id UUID,
+    stored INTEGER,
+    expected INTEGER
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT p.quest_id, p.user_id, p.total_points, COALESCE(s.points, 0)::INTEGER
+    FROM quest_participants p
+    LEFT JOIN (
+        SELECT c.quest_id, c.user_id, SUM(c.count * t.points) AS points
+        FROM check_ins c
+        JOIN daily_tasks t ON t.id = c.daily_task_id
+        WHERE c.quest_id = ANY(p_quest_ids)
+        GROUP BY c.quest_id, c.user_id
+    ) s ON s.quest_id = p.quest_id AND s.user_id = p.user_id
+    WHERE p.quest_id = ANY(p_quest_ids)
+      AND p.total_points <> COALESCE(s.points, 0);
+$$;
+
+-- Set total_points for many participants in one statement. A row is only changed
+-- while it still holds the `stored` value that was read, so a check-in that lands
+-- in between is not overwritten (the next run picks it up). Returns rows updated.
+CREATE OR REPLACE FUNCTION apply_points_corrections(p_corrections JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    updated INTEGER;
+BEGIN
+    UPDATE quest_participants p
+    SET total_points = c.expected
+    FROM jsonb_to_recordset(p_corrections) AS c(quest_id UUID, user_id UUID, stored INTEGER, expected INTEGER)
+    WHERE p.quest_id = c.quest_id
+      AND p.user_id = c.user_id
+      AND p.total_points = c.stored;
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    RETURN updated;
+END;
+$$;
+
+-- Add p_delta (negative to subtract) to a participant's total_points in place,
+-- clamped at zero, and mark them active. Check-ins call this instead of writing
+-- back a total read earlier, so concurrent check-ins do not lose each other's points.
+CREATE OR REPLACE FUNCTION add_participant_points(p_quest_id UUID, p_user_id UUID, p_delta INTEGER)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    UPDATE quest_participants
+    SET total_points = GREATEST(0, total_points + p_delta),
+        last_activity_at = NOW()
+    WHERE quest_id = p_quest_id
+      AND user_id = p_user_id;
+$$;
+
+REVOKE EXECUTE ON FUNCTION add_participant_points(UUID, UUID, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION add_participant_points(UUID, UUID, INTEGER) TO service_role;
+
+REVOKE EXECUTE ON FUNCTION points_drift(UUID[]) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION apply_points_corrections(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION points_drift(UUID[]) TO service_role;
+GRANT EXECUTE ON FUNCTION apply_points_corrections(JSONB) TO service_role;
+
+-- One page of the quests a user participates in, most recently active first, for
+-- GET /quests. Keyset-paginated on (last_activity_at, quest_id): pass the last row's
+-- pair to get the next page, so every page costs the same however many quests the
+-- user has. p_status is 'active' (not ended yet), 'finished' or NULL for both;
+-- p_limit NULL returns every row.
+CREATE OR REPLACE FUNCTION user_quest_page(
+    p_user_id UUID,
+    p_status TEXT DEFAULT NULL,
+    p_after_activity TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL,
+    p_limit INTEGER DEFAULT NULL
+)
+RETURNS TABLE (
+    quest_id UUID,
+    last_activity_at TIMESTAMP WITH TIME ZONE
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT p.quest_id, p.last_activity_at
+    FROM quest_participants p
+    JOIN quests q ON q.id = p.quest_id
+    WHERE p.user_id = p_user_id
+      AND (p_after_activity IS NULL OR (p.last_activity_at, p.quest_id) < (p_after_activity, p_after_id))
+      AND (p_status IS NULL
+           OR (p_status = 'active' AND q.end_date >= CURRENT_DATE)
+           OR (p_status = 'finished' AND q.end_date < CURRENT_DATE))
+    ORDER BY p.last_activity_at DESC, p.quest_id DESC
+    LIMIT p_limit;
+$$;
+
+-- The same page as user_quest_page, projected for the home screen in one query: the
+-- quest's name and dates, how many participants it has, the caller's points and the
+-- top three participants with their avatars. Reads auth.users for the avatars, hence
+-- SECURITY DEFINER; only the service role may call it. Used by GET /quests?view=summary.
+CREATE OR REPLACE FUNCTION quest_summaries(
+    p_user_id UUID,
+    p_status TEXT DEFAULT NULL,
+    p_after_activity TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL,
+    p_limit INTEGER DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    name TEXT,
+    description TEXT,
+    start_date DATE,
+    end_date DATE,
+    last_activity_at TIMESTAMP WITH TIME ZONE,
+    participant_count INTEGER,
+    total_points INTEGER,
+    top_participants JSONB
+)
+SECURITY DEFINER
+SET search_path = public
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT q.id, q.name, q.description, q.start_date, q.end_date, pg.last_activity_at,
+           (SELECT COUNT(*) FROM quest_participants c WHERE c.quest_id = q.id)::INTEGER,
+           me.total_points,
+           COALESCE((
+               SELECT jsonb_agg(jsonb_build_object(
+                   'user_id', t.user_id,
+                   'username', u.raw_user_meta_data->>'username',
+                   'avatar', u.raw_user_meta_data->'avatar',
+                   'joined_at', t.joined_at,
+                   'total_points', t.total_points
+               ) ORDER BY t.total_points DESC, t.joined_at)
+               FROM (
+                   SELECT tp.user_id, tp.joined_at, tp.total_points
+                   FROM quest_participants tp
+                   WHERE tp.quest_id = q.id
+                   ORDER BY tp.total_points DESC, tp.joined_at
+                   LIMIT 3
+               ) t
+               LEFT JOIN auth.users u ON u.id = t.user_id
+           ), '[]'::jsonb)
+    FROM user_quest_page(p_user_id, p_status, p_after_activity, p_after_id, p_limit) pg
+    JOIN quests q ON q.id = pg.quest_id
+    JOIN quest_participants me ON me.quest_id = pg.quest_id AND me.user_id = p_user_id
+    ORDER BY pg.last_activity_at DESC, pg.quest_id DESC;
+$$;
+
+REVOKE EXECUTE ON FUNCTION user_quest_page(UUID, TEXT, TIMESTAMP WITH TIME ZONE, UUID, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION quest_summaries(UUID, TEXT, TIMESTAMP WITH TIME ZONE, UUID, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION user_quest_page(UUID, TEXT, TIMESTAMP WITH TIME ZONE, UUID, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION quest_summaries(UUID, TEXT, TIMESTAMP WITH TIME ZONE, UUID, INTEGER) TO service_role;
+
 -- Comments for documentation
 COMMENT ON TABLE quests IS 'Main quests table containing quest information';
 COMMENT ON TABLE daily_tasks IS 'Daily tasks associated with quests';
 COMMENT ON TABLE quest_participants IS 'Users participating in quests';
 COMMENT ON TABLE check_ins IS 'Daily check-ins completed by users';
+COMMENT ON TABLE quest_snapshots IS 'Immutable snapshots of finished quests, served instead of live queries';
+COMMENT ON TABLE account_deletion_jobs IS 'Progress of background account deletions, resumed after restarts';
 COMMENT ON FUNCTION get_user_metadata IS 'Retrieves user metadata from auth.users for displaying participant info';
+COMMENT ON FUNCTION checkin_analytics IS 'Per-task, weekday and week check-in totals for one participant of a quest';
+COMMENT ON FUNCTION add_participant_points IS 'Atomic total_points change for a check-in, clamped at zero';
+COMMENT ON FUNCTION points_drift IS 'Participants whose total_points disagrees with their check-ins, for reconciliation';
+COMMENT ON FUNCTION apply_points_corrections IS 'Bulk total_points corrections, skipping rows changed since they were read';
@@ -0,0 +1,52 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core.connection_manager import ConnectionManager
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, payload: str):
+        self.sent.append(json.loads(payload))
+
+
+def test_connect_returns_events_broadcast_while_priming():
+    manager = ConnectionManager(buffer_size=8)
+    first = manager.snapshot_seq("q", manager.current_seq("q"))
+    socket = FakeSocket()
+    asyncio.run(manager.broadcast("q", {"type": "scoreboard_update"}))
+
+    missed = manager.connect("q", "u", socket, first)
+    assert [event["seq"] for event in missed] == [first + 1]
+    assert socket.sent == []  # not registered yet, so the broadcast did not reach it
+
+    assert manager.connect("q", "u", socket, missed[-1]["seq"]) is None
+    asyncio.run(manager.broadcast("q", {"type": "scoreboard_update"}))
+    assert [event["seq"] for event in socket.sent] == [first + 2]
+
+
+def test_connect_raises_when_buffer_overran():
+    manager = ConnectionManager(buffer_size=2)
+    first = manager.snapshot_seq("q", None)
+    for _ in range(3):
+        asyncio.run(manager.broadcast("q", {"type": "scoreboard_update"}))
+    with pytest.raises(LookupError):
+        manager.connect("q", "u", FakeSocket(), first)
+
+
+def test_late_disconnect_keeps_the_reconnected_socket():
+    manager = ConnectionManager()
+    seq = manager.snapshot_seq("q", None)
+    old, new = FakeSocket(), FakeSocket()
+    manager.connect("q", "u", old, seq)
+    manager.connect("q", "u", new, seq)
+
+    manager.disconnect("q", "u", old)
+    assert manager.active_connections["q"]["u"] is new
+
+    manager.disconnect("q", "u", new)
+    assert "q" not in manager.active_connections
@@ -0,0 +1,103 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import idempotency
+from app.core.idempotency import IdempotencyCache
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(idempotency, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def counting_write():
+    calls = []
+
+    async def write():
+        calls.append(None)
+        return 201, b'{"n": %d}' % len(calls)
+
+    return write, calls
+
+
+def test_retry_gets_stored_response(clock):
+    cache = IdempotencyCache(max_entries=10, ttl=60)
+    write, calls = counting_write()
+    first = asyncio.run(cache.run("k", b"fp", write))
+    again = asyncio.run(cache.run("k", b"fp", write))
+    assert first == (201, b'{"n": 1}', False)
+    assert again == (201, b'{"n": 1}', True)
+    assert len(calls) == 1
+
+
+def test_concurrent_retry_waits_for_first_request(clock):
+    cache = IdempotencyCache(max_entries=10, ttl=60)
+    write, calls = counting_write()
+
+    async def slow_write():
+        await asyncio.sleep(0.01)
+        return await write()
+
+    async def main():
+        return await asyncio.gather(cache.run("k", b"fp", slow_write), cache.run("k", b"fp", slow_write))
+
+    first, retry = asyncio.run(main())
+    assert (first[2], retry[2]) == (False, True)
+    assert first[:2] == retry[:2]
+    assert len(calls) == 1
+
+
+def test_key_reused_for_different_payload_is_422(clock):
+    cache = IdempotencyCache(max_entries=10, ttl=60)
+    write, _ = counting_write()
+    asyncio.run(cache.run("k", b"fp", write))
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(cache.run("k", b"other", write))
+    assert excinfo.value.status_code == 422
+
+
+def test_failed_request_is_not_stored(clock):
+    cache = IdempotencyCache(max_entries=10, ttl=60)
+    write, calls = counting_write()
+
+    async def fail():
+        raise HTTPException(status_code=503)
+
+    with pytest.raises(HTTPException):
+        asyncio.run(cache.run("k", b"fp", fail))
+    assert asyncio.run(cache.run("k", b"fp", write)) == (201, b'{"n": 1}', False)
+    assert len(calls) == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = IdempotencyCache(max_entries=10, ttl=60)
+    write, calls = counting_write()
+    asyncio.run(cache.run("k", b"fp", write))
+    clock.advance(60)
+    assert asyncio.run(cache.run("k", b"fp", write)) == (201, b'{"n": 2}', False)
+    assert len(calls) == 2
+
+
+def test_oldest_entries_dropped_over_max_entries(clock):
+    cache = IdempotencyCache(max_entries=2, ttl=60)
+    write, calls = counting_write()
+    for key in ("a", "b", "c"):
+        asyncio.run(cache.run(key, b"fp", write))
+    assert len(cache) == 2
+    assert asyncio.run(cache.run("a", b"fp", write))[2] is False
@@ -0,0 +1,205 @@
+"""Repository contract for the direct Postgres backend, against the real schema.
+
+Needs TEST_DATABASE_URL (a role that may create databases); skipped otherwise.
+"""
+import asyncio
+import json
+import os
+import uuid
+from datetime import date
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+
+import pytest
+
+asyncpg = pytest.importorskip("asyncpg")
+
+from app.repositories import CheckInNotFound  # noqa: E402
+from app.repositories.postgres import PostgresRepository  # noqa: E402
+from app.schemas import CheckInCreate  # noqa: E402
+
+ADMIN_URL = os.environ.get("TEST_DATABASE_URL")
+DATABASE_DIR = Path(__file__).resolve().parent.parent / "database"
+
+pytestmark = pytest.mark.skipif(not ADMIN_URL, reason="TEST_DATABASE_URL is not set")
+
+
+def _with_database(url: str, name: str) -> str:
+    parts = urlsplit(url)
+    return urlunsplit(parts._replace(path=f"/{name}"))
+
+
+@pytest.fixture(scope="module")
+def database_url():
+    """A throwaway database with local_auth_stub.sql and schema.sql loaded."""
+    name = f"cherries_test_{uuid.uuid4().hex[:12]}"
+
+    async def create():
+        admin = await asyncpg.connect(ADMIN_URL)
+        try:
+            await admin.execute(f'CREATE DATABASE "{name}"')
+        finally:
+            await admin.close()
+        conn = await asyncpg.connect(_with_database(ADMIN_URL, name))
+        try:
+            for script in ("local_auth_stub.sql", "schema.sql"):
+                await conn.execute((DATABASE_DIR / script).read_text())
+        finally:
+            await conn.close()
+
+    async def drop():
+        admin = await asyncpg.connect(ADMIN_URL)
+        try:
+            await admin.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+        finally:
+            await admin.close()
+
+    asyncio.run(create())
+    try:
+        yield _with_database(ADMIN_URL, name)
+    finally:
+        asyncio.run(drop())
+
+
+def run(database_url, scenario):
+    """Run scenario(repo, conn) with a fresh repository and a plain connection for setup."""
+    async def main():
+        repo = PostgresRepository(database_url, min_size=1, max_size=2, statement_cache_size=100)
+        conn = await asyncpg.connect(database_url)
+        try:
+            return await scenario(repo, conn)
+        finally:
+            await conn.close()
+            await repo.close()
+    return asyncio.run(main())
+
+
+async def _user(conn, username: str) -> str:
+    return str(await conn.fetchval(
+        "INSERT INTO auth.users (email, raw_user_meta_data) VALUES ($1, $2::jsonb) RETURNING id",
+        f"{username}-{uuid.uuid4().hex[:8]}@example.com",
+        json.dumps({"username": username, "avatar": {"type": "emoji", "value": "🍒"}}),
+    ))
+
+
+async def _quest(conn, creator_id: str, points: int = 5):
+    """A quest with one task of `points`, with the creator as its only participant."""
+    quest_id = await conn.fetchval(
+        """
+        INSERT INTO quests (name, start_date, end_date, creator_id, share_code, share_code_expires_at)
+        VALUES ('Quest', '2026-01-01', '2026-12-31', $1, $2, NOW() + INTERVAL '1 day')
+        RETURNING id
+        """,
+        uuid.UUID(creator_id), uuid.uuid4().hex[:8],
+    )
+    task_id = await conn.fetchval(
+        "INSERT INTO daily_tasks (quest_id, title, points) VALUES ($1, 'Task', $2) RETURNING id",
+        quest_id, points,
+    )
+    await _join(conn, str(quest_id), creator_id)
+    return str(quest_id), str(task_id)
+
+
+async def _join(conn, quest_id: str, user_id: str):
+    await conn.execute(
+        "INSERT INTO quest_participants (quest_id, user_id) VALUES ($1, $2)",
+        uuid.UUID(quest_id), uuid.UUID(user_id),
+    )
+
+
+async def _points(conn, quest_id: str, user_id: str) -> int:
+    return await conn.fetchval(
+        "SELECT total_points FROM quest_participants WHERE quest_id = $1 AND user_id = $2",
+        uuid.UUID(quest_id), uuid.UUID(user_id),
+    )
+
+
+def test_increment_and_decrement(database_url):
+    async def scenario(repo, conn):
+        user_id = await _user(conn, "alice")
+        quest_id, task_id = await _quest(conn, user_id, points=5)
+        participant = await repo.get_participant(quest_id, user_id)
+        assert participant["user_id"] == user_id
+        checkin = CheckInCreate(quest_id=quest_id, daily_task_id=task_id, check_in_date=date(2026, 3, 1))
+
+        first = await repo.increment_checkin(participant, checkin)
+        second = await repo.increment_checkin(participant, checkin)
+        assert (first["count"], second["count"]) == (1, 2)
+        assert second["id"] == first["id"]
+        assert await _points(conn, quest_id, user_id) == 10
+
+        assert (await repo.decrement_checkin(participant, checkin))["count"] == 1
+        assert await repo.decrement_checkin(participant, checkin) is None
+        assert await _points(conn, quest_id, user_id) == 0
+        with pytest.raises(CheckInNotFound):
+            await repo.decrement_checkin(participant, checkin)
+
+    run(database_url, scenario)
+
+
+def test_decrement_never_takes_points_below_zero(database_url):
+    async def scenario(repo, conn):
+        user_id = await _user(conn, "bob")
+        quest_id, task_id = await _quest(conn, user_id, points=7)
+        participant = await repo.get_participant(quest_id, user_id)
+        checkin = CheckInCreate(quest_id=quest_id, daily_task_id=task_id, check_in_date=date(2026, 3, 1))
+        await repo.increment_checkin(participant, checkin)
+        # Drifted below what the check-ins are worth, as after a lost update
+        await conn.execute(
+            "UPDATE quest_participants SET total_points = 3 WHERE quest_id = $1 AND user_id = $2",
+            uuid.UUID(quest_id), uuid.UUID(user_id),
+        )
+
+        await repo.decrement_checkin(participant, checkin)
+        assert await _points(conn, quest_id, user_id) == 0
+
+    run(database_url, scenario)
+
+
+def test_get_participant_outside_quest(database_url):
+    async def scenario(repo, conn):
+        owner = await _user(conn, "carol")
+        stranger = await _user(conn, "dave")
+        quest_id, _ = await _quest(conn, owner)
+        assert await repo.get_participant(quest_id, stranger) is None
+
+    run(database_url, scenario)
+
+
+def test_load_participants(database_url):
+    async def scenario(repo, conn):
+        alice = await _user(conn, "alice")
+        bob = await _user(conn, "bob")
+        first, _ = await _quest(conn, alice)
+        second, _ = await _quest(conn, bob)
+        empty_owner = await _user(conn, "erin")
+        await _join(conn, first, bob)
+        empty, _ = await _quest(conn, empty_owner)
+        await conn.execute("DELETE FROM quest_participants WHERE quest_id = $1", uuid.UUID(empty))
+
+        by_quest = await repo.load_participants([first, second, empty])
+        assert [p["user_id"] for p in by_quest[first]] == [alice, bob]
+        assert [p["username"] for p in by_quest[first]] == ["alice", "bob"]
+        assert by_quest[first][0]["avatar"] == {"type": "emoji", "value": "🍒"}
+        assert [p["user_id"] for p in by_quest[second]] == [bob]
+        assert by_quest[empty] == []
+        assert await repo.load_quest_participants(first) == by_quest[first]
+
+    run(database_url, scenario)
+
+
+def test_add_participant_points_function(database_url):
+    """The in-place add the Supabase backend calls through RPC."""
+    async def scenario(repo, conn):
+        user_id = await _user(conn, "frank")
+        quest_id, _ = await _quest(conn, user_id)
+        add = "SELECT add_participant_points($1, $2, $3)"
+        async with asyncpg.create_pool(database_url, min_size=4, max_size=4) as pool:
+            await asyncio.gather(*(
+                pool.execute(add, uuid.UUID(quest_id), uuid.UUID(user_id), 5) for _ in range(4)
+            ))
+        assert await _points(conn, quest_id, user_id) == 20
+        await conn.execute(add, uuid.UUID(quest_id), uuid.UUID(user_id), -25)
+        assert await _points(conn, quest_id, user_id) == 0
+
+    run(database_url, scenario)
@@ -0,0 +1,33 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes.quests import _decode_cursor, _encode_cursor
+
+
+def test_cursor_round_trip():
+    quest_id = str(uuid.uuid4())
+    last_activity_at = datetime(2026, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    cursor = _encode_cursor(last_activity_at, quest_id)
+    assert "=" not in cursor
+    assert _decode_cursor(cursor) == (last_activity_at, quest_id)
+
+
+def test_cursor_from_postgrest_timestamp_string():
+    quest_id = str(uuid.uuid4())
+    cursor = _encode_cursor("2026-03-01T12:30:15.123456+00:00", quest_id)
+    assert _decode_cursor(cursor) == (datetime(2026, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc), quest_id)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    "bm8tc2VwYXJhdG9y",  # "no-separator"
+    _encode_cursor("yesterday", str(uuid.uuid4())),
+    _encode_cursor(datetime(2026, 3, 1, tzinfo=timezone.utc), "not-a-uuid"),
+])
+def test_invalid_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as excinfo:
+        _decode_cursor(cursor)
+    assert excinfo.value.status_code == 400
@@ -0,0 +1,129 @@
+import asyncio
+import os
+
+import pytest
+
+from app.core.config import settings
+from app.core.rate_limit import MemoryRateLimitStore, RateLimiter, RateLimitExceeded, RedisRateLimitStore
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+def hit(store, key="k", rate=1.0, burst=3):
+    return asyncio.run(store.hit(key, rate, burst))
+
+
+def test_burst_then_refill():
+    clock = FakeClock()
+    store = MemoryRateLimitStore(evict_interval=60, clock=clock)
+    assert [hit(store) for _ in range(3)] == [0, 0, 0]
+    assert hit(store) == pytest.approx(1.0)
+
+    clock.advance(0.5)
+    # The rejected hit above took nothing, so half a token has refilled
+    assert hit(store) == pytest.approx(0.5)
+    clock.advance(0.5)
+    assert hit(store) == 0
+    assert hit(store) == pytest.approx(1.0)
+
+
+def test_refill_is_capped_at_burst():
+    clock = FakeClock()
+    store = MemoryRateLimitStore(evict_interval=60, clock=clock)
+    hit(store, rate=2.0, burst=2)
+    clock.advance(3600)
+    assert [hit(store, rate=2.0, burst=2) for _ in range(3)] == [0, 0, pytest.approx(0.5)]
+
+
+def test_keys_have_separate_buckets():
+    store = MemoryRateLimitStore(evict_interval=60, clock=FakeClock())
+    assert hit(store, key="a", burst=1) == 0
+    assert hit(store, key="a", burst=1) > 0
+    assert hit(store, key="b", burst=1) == 0
+
+
+def test_idle_buckets_are_evicted_once_full_again():
+    clock = FakeClock()
+    store = MemoryRateLimitStore(evict_interval=10, clock=clock)
+    hit(store, key="slow", rate=0.1, burst=5)  # refills in 50s
+    hit(store, key="fast", rate=1.0, burst=5)  # refills in 5s
+    assert len(store) == 2
+
+    clock.advance(10)
+    hit(store, key="other", rate=1.0, burst=5)
+    assert len(store) == 2  # "fast" dropped, "slow" still refilling
+
+    clock.advance(45)
+    hit(store, key="other", rate=1.0, burst=5)
+    assert len(store) == 1
+
+
+def test_no_eviction_before_interval():
+    clock = FakeClock()
+    store = MemoryRateLimitStore(evict_interval=100, clock=clock)
+    hit(store, key="a", rate=1.0, burst=1)
+    clock.advance(50)
+    hit(store, key="b", rate=1.0, burst=1)
+    assert len(store) == 2
+
+
+def test_limiter_raises_429_with_retry_after_rounded_up(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_JOIN_PER_MINUTE", 12)  # one token per 5s
+    monkeypatch.setattr(settings, "RATE_LIMIT_JOIN_BURST", 1)
+    clock = FakeClock()
+    limiter = RateLimiter(MemoryRateLimitStore(evict_interval=60, clock=clock))
+
+    asyncio.run(limiter.check("join", "user"))
+    clock.advance(0.5)
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        asyncio.run(limiter.check("join", "user"))
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.headers["Retry-After"] == "5"  # 4.5s left
+
+    clock.advance(5)
+    asyncio.run(limiter.check("join", "user"))
+
+
+def test_limiter_lets_requests_through_when_store_fails(monkeypatch):
+    class BrokenStore(MemoryRateLimitStore):
+        async def hit(self, key, rate, burst):
+            raise ConnectionError("store down")
+
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    asyncio.run(RateLimiter(BrokenStore(evict_interval=60)).check("checkin", "user"))
+
+
+REDIS_URL = os.environ.get("TEST_REDIS_URL")
+
+
+@pytest.mark.skipif(not REDIS_URL, reason="TEST_REDIS_URL is not set")
+def test_redis_script_matches_memory_store():
+    pytest.importorskip("redis")
+
+    async def scenario():
+        store = RedisRateLimitStore(REDIS_URL)
+        key = f"test:{os.getpid()}:{id(store)}"
+        try:
+            results = [await store.hit(key, 0.01, 3) for _ in range(4)]
+            ttl = await store._redis.pttl(f"ratelimit:{key}")
+        finally:
+            await store._redis.delete(f"ratelimit:{key}")
+            await store.close()
+        return results, ttl
+
+    results, ttl = asyncio.run(scenario())
+    assert results[:3] == [0, 0, 0]
+    # One token at 0.01/s is about 100s away; Redis time moved slightly since
+    assert 99 < results[3] <= 100
+    # Expires once it would be full again: burst / rate
+    assert 0 < ttl <= 300_000
@@ -0,0 +1,147 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import response_cache
+from app.core.response_cache import AnalyticsCache, QuestResponseCache
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(response_cache, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def fill(cache, quest_id, body, user_ids, during=None):
+    """One begin/put/end fill; `during` runs between begin and put, as a write landing mid-load."""
+    token = cache.begin(quest_id)
+    try:
+        if during is not None:
+            during()
+        cache.put(quest_id, body, user_ids, token)
+    finally:
+        cache.end(quest_id)
+
+
+def test_put_then_get(clock):
+    cache = QuestResponseCache(max_bytes=1024, ttl=30)
+    assert cache.get("q") is None
+    fill(cache, "q", b"body", ["u"])
+    assert cache.get("q") == b"body"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = QuestResponseCache(max_bytes=1024, ttl=30)
+    fill(cache, "q", b"body", ["u"])
+    clock.advance(29)
+    assert cache.get("q") == b"body"
+    clock.advance(1)
+    assert cache.get("q") is None
+    assert cache.bytes_held == 0
+    assert cache.stats()["entries"] == 0
+
+
+def test_zero_ttl_disables(clock):
+    cache = QuestResponseCache(max_bytes=1024, ttl=0)
+    fill(cache, "q", b"body", ["u"])
+    assert cache.get("q") is None
+
+
+def test_invalidate_during_fill_rejects_put(clock):
+    cache = QuestResponseCache(max_bytes=1024, ttl=30)
+    fill(cache, "q", b"stale", ["u"], during=lambda: cache.invalidate("q"))
+    assert cache.get("q") is None
+
+
+def test_invalidate_of_other_quest_keeps_fill(clock):
+    cache = QuestResponseCache(max_bytes=1024, ttl=30)
+    fill(cache, "q", b"body", ["u"], during=lambda: cache.invalidate("other"))
+    assert cache.get("q") == b"body"
+
+
+def test_invalidate_user_during_fill_rejects_put_listing_user(clock):
+    cache = QuestResponseCache(max_bytes=1024, ttl=30)
+    fill(cache, "q", b"stale", ["u", "v"], during=lambda: cache.invalidate_user("v"))
+    assert cache.get("q") is None
+    fill(cache, "q", b"fresh", ["u", "v"])
+    assert cache.get("q") == b"fresh"
+
+
+def test_invalidate_user_during_fill_keeps_quests_without_user(clock):
+    cache = QuestResponseCache(max_bytes=1024, ttl=30)
+    fill(cache, "q", b"body", ["u"], during=lambda: cache.invalidate_user("v"))
+    assert cache.get("q") == b"body"
+
+
+def test_invalidate_user_before_begin_does_not_reject(clock):
+    cache = QuestResponseCache(max_bytes=1024, ttl=30)
+    cache.begin("other")  # a fill in progress keeps the invalidation recorded
+    cache.invalidate_user("u")
+    fill(cache, "q", b"body", ["u"])
+    cache.end("other")
+    assert cache.get("q") == b"body"
+
+
+def test_overlapping_fills_after_invalidation(clock):
+    cache = QuestResponseCache(max_bytes=1024, ttl=30)
+    early = cache.begin("q")
+    cache.invalidate("q")
+    late = cache.begin("q")
+    cache.put("q", b"stale", ["u"], early)
+    assert cache.get("q") is None
+    cache.put("q", b"fresh", ["u"], late)
+    cache.end("q")
+    cache.end("q")
+    assert cache.get("q") == b"fresh"
+
+
+def test_invalidate_user_drops_cached_quests(clock):
+    cache = QuestResponseCache(max_bytes=1024, ttl=30)
+    fill(cache, "a", b"a", ["u", "v"])
+    fill(cache, "b", b"b", ["v"])
+    fill(cache, "c", b"c", ["w"])
+    cache.invalidate_user("v")
+    assert [cache.get(q) for q in ("a", "b", "c")] == [None, None, b"c"]
+    assert cache.bytes_held == 1
+
+
+def test_evicts_least_recently_used_over_max_bytes(clock):
+    cache = QuestResponseCache(max_bytes=10, ttl=30)
+    fill(cache, "a", b"aaaa", ["u"])
+    fill(cache, "b", b"bbbb", ["u"])
+    cache.get("a")
+    fill(cache, "c", b"cccc", ["u"])
+    assert [cache.get(q) for q in ("a", "b", "c")] == [b"aaaa", None, b"cccc"]
+    assert (cache.bytes_held, cache.evictions) == (8, 1)
+    fill(cache, "d", b"d" * 11, ["u"])  # larger than the whole cache
+    assert cache.get("d") is None
+
+
+def test_analytics_invalidate_during_fill_rejects_put(clock):
+    cache = AnalyticsCache(max_entries=10, ttl=30)
+    key = ("q", "u", "2026-01-01", "2026-01-31")
+    generation = cache.begin("q", "u")
+    cache.invalidate("q", "u")
+    cache.put(key, b"stale", generation)
+    cache.end("q", "u")
+    assert cache.get(key) is None
+
+    generation = cache.begin("q", "u")
+    cache.put(key, b"fresh", generation)
+    cache.end("q", "u")
+    assert cache.get(key) == b"fresh"
+    clock.advance(30)
+    assert cache.get(key) is None
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_result():
+    flights = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"n": calls}
+
+    async def main():
+        return await asyncio.gather(*(flights.do("k", load) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+    assert flights.stats() == {"calls": 5, "collapsed": 4, "in_flight": 0}
+
+
+def test_nothing_is_cached_after_completion():
+    flights = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    async def main():
+        return [await flights.do("k", load), await flights.do("k", load)]
+
+    assert asyncio.run(main()) == [1, 2]
+
+
+def test_forget_starts_fresh_work_for_later_callers():
+    flights = SingleFlight()
+    release = []
+
+    async def load(value):
+        gate = asyncio.Event()
+        release.append(gate)
+        await gate.wait()
+        return value
+
+    async def main():
+        before = asyncio.ensure_future(flights.do("k", lambda: load("old")))
+        while not release:
+            await asyncio.sleep(0)
+        flights.forget(["k"])
+        after = asyncio.ensure_future(flights.do("k", lambda: load("new")))
+        while len(release) < 2:
+            await asyncio.sleep(0)
+        for gate in release:
+            gate.set()
+        return await before, await after
+
+    assert asyncio.run(main()) == ("old", "new")
+    assert flights.collapsed == 0
+
+
+def test_forget_matching():
+    flights = SingleFlight()
+
+    async def main():
+        gate = asyncio.Event()
+        futures = [asyncio.ensure_future(flights.do(key, gate.wait)) for key in (("quest", "a"), ("other", "a"))]
+        await asyncio.sleep(0)
+        flights.forget_matching(lambda key: key[0] == "quest")
+        in_flight = flights.stats()["in_flight"]
+        gate.set()
+        await asyncio.gather(*futures)
+        return in_flight
+
+    assert asyncio.run(main()) == 1
+
+
+def test_exception_reaches_every_caller():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def main():
+        return await asyncio.gather(*(flights.do("k", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_cancelled_caller_does_not_cancel_shared_work():
+    flights = SingleFlight()
+
+    async def load():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flights.do("k", load))
+        second = asyncio.ensure_future(flights.do("k", load))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"